@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Compares the throughput of the async crawler with looking items up one after
+another, against the saved store pages served from a local mock store.
+
+Usage: python benchmarks/bench_async_crawl.py [--items 20] [--latency 0.05]
+"""
+
+import argparse
+import pathlib
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT), str(ROOT / "tests")]
+
+from mock_store import MockStoreServer  # noqa: E402
+
+from shopping_list_bot import IDS, AsyncCrawler, HttpFetcher  # noqa: E402
+
+STORES = [
+    "https://www.makro.co.za/",
+    "https://www.game.co.za/",
+    "https://www.pnp.co.za/",
+]
+
+
+def sequential(fetcher, jobs):
+    for url, items in jobs.items():
+        for item in items:
+            fetcher.search_item(item, url)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=20, help="Items per store.")
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="[seconds] Per request."
+    )
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=20.0)
+    args = parser.parse_args()
+
+    with MockStoreServer(delay=args.latency) as server:
+        ids = server.ids(IDS)
+        jobs = {url: [f"oats {count}" for count in range(args.items)] for url in STORES}
+        lookups = sum(len(items) for items in jobs.values())
+
+        fetcher = HttpFetcher(ids=ids)
+        start = time.perf_counter()
+        sequential(fetcher, jobs)
+        sequential_time = time.perf_counter() - start
+        fetcher.close()
+
+        crawler = AsyncCrawler(
+            fetcher=HttpFetcher(ids=ids, workers=args.concurrency * len(STORES)),
+            concurrency=args.concurrency,
+            rate=args.rate,
+            burst=args.concurrency,
+        )
+        start = time.perf_counter()
+        crawler.crawl_all(jobs)
+        async_time = time.perf_counter() - start
+        crawler.close()
+
+    for name, seconds in (("sequential", sequential_time), ("async", async_time)):
+        print(f"{name:<12}{seconds:>8.2f}s{lookups / seconds * 60:>10.0f} items/min")
+    print(f"speed-up    {sequential_time / async_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
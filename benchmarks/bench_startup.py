@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Measures how long importing the package and starting the CLI take, and which
+heavy dependencies they load.
+
+Every command runs in a fresh interpreter, the median of the runs is compared
+with the target and the script exits with 1 when a command is slower, or when it
+imports Selenium, BeautifulSoup or the Google Sheets client without needing them.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--target 0.25]
+"""
+
+import argparse
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+# Only needed to browse, parse pages or talk to Google Sheets.
+HEAVY_MODULES = (
+    "selenium",
+    "bs4",
+    "lxml",
+    "gspread",
+    "oauth2client",
+    "coloredlogs",
+    "numpy",
+)
+
+COMMANDS = {
+    "import": ["-c", "import shopping_list_bot"],
+    "cli --help": [str(ROOT / "scripts" / "price_checker.py"), "--help"],
+}
+
+
+def environment():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [str(ROOT), env.get("PYTHONPATH")])
+    )
+    return env
+
+
+def imported_modules(args):
+    """Returns the top-level packages imported by running `args`, as reported by
+    `python -X importtime`."""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime"] + args,
+        env=environment(),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    ).stderr
+    modules = set()
+    for line in output.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            modules.add(line.rsplit("|", 1)[1].strip().split(".")[0])
+    return modules
+
+
+def startup_time(args, runs):
+    """Returns the median seconds of `runs` fresh interpreters running `args`."""
+    seconds = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable] + args,
+            env=environment(),
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        seconds.append(time.perf_counter() - start)
+    return statistics.median(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Runs per command.")
+    parser.add_argument(
+        "--target", type=float, default=0.25, help="[seconds] Slowest median allowed."
+    )
+    args = parser.parse_args()
+
+    baseline = startup_time(["-c", "pass"], args.runs)
+    print(f"{'command':<14}{'median':>9}{'overhead':>10}  heavy imports")
+    failed = False
+    for name, command in COMMANDS.items():
+        seconds = startup_time(command, args.runs)
+        heavy = sorted(imported_modules(command).intersection(HEAVY_MODULES))
+        print(
+            f"{name:<14}{seconds:>8.3f}s{seconds - baseline:>9.3f}s  "
+            f"{', '.join(heavy) or '-'}"
+        )
+        failed = failed or seconds > args.target or bool(heavy)
+    print(f"target         {args.target:>8.3f}s  (bare interpreter {baseline:.3f}s)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
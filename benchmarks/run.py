@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""Benchmarks the crawlers against recorded store pages served from localhost.
+
+Every store in `IDS` is replayed from `tests/fixtures` by the mock store used in
+the tests, with a configurable delay per request to mimic the real stores. Each
+scenario reports items per minute, the p50/p95 latency of every phase per store
+(see `RunProfiler`) and the peak memory allocated by Python while it ran.
+
+Results are saved as JSON under `benchmarks/results/<label>.json`, the label
+defaulting to `git describe`, so two versions can be compared:
+
+    python benchmarks/run.py run --items 50
+    python benchmarks/run.py compare results/v0.0.4.json results/HEAD.json
+
+The `shopping_bot` scenario drives Firefox and is skipped when Firefox or
+geckodriver is not installed.
+"""
+
+import argparse
+import json
+import logging
+import pathlib
+import platform
+import shutil
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT), str(ROOT / "tests")]
+
+from fake_sheet import FakeWorksheet  # noqa: E402
+from mock_store import MockStoreServer  # noqa: E402
+
+import shopping_list_bot as shopping_bot  # noqa: E402
+
+RESULTS = pathlib.Path(__file__).resolve().parent / "results"
+
+
+class SkipScenario(Exception):
+    """Raised when a scenario cannot run on this machine."""
+
+
+class ReplayPriceUpdater(shopping_bot.PriceUpdater):
+    """A `PriceUpdater` that leaves JavaScript stores empty instead of opening a
+    browser, those are measured by the `shopping_bot` scenario."""
+
+    def _search_with_browser(self, items, url, on_result=None):
+        results = [None] * len(items)
+        if on_result is not None:
+            for count, result in enumerate(results):
+                on_result(count, result)
+        return results
+
+
+class ErrorLog(logging.Handler):
+    """Collects the errors logged during a scenario, as `PriceUpdater` logs stores
+    that failed and carries on with the others."""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def version_label():
+    """Returns `git describe` for the working tree, or "unknown"."""
+    try:
+        return subprocess.check_output(
+            ["git", "describe", "--always", "--dirty", "--tags"],
+            cwd=str(ROOT),
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def shopping_list(count):
+    """Returns `count` distinct items to look up, each sharing a word with the
+    product on every replayed results page so that no lookup ends as not found."""
+    return [f"oats pampers flour lager {number}" for number in range(count)]
+
+
+def measure(scenario, items, *args):
+    """Runs a scenario with a profiler, timing it and tracing its memory.
+
+    Args:
+        scenario (callable): Takes the profiler, the items and `args`, and returns
+            the number of lookups it made.
+        items (list): The items to look up at every store.
+
+    Returns:
+        dict: Lookups made, seconds, lookups per minute, peak memory in MiB and
+            the profiler's summary.
+    """
+    profiler = shopping_bot.RunProfiler()
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        lookups = scenario(profiler, items, *args)
+    finally:
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        "lookups": lookups,
+        "seconds": seconds,
+        "items_per_minute": lookups / seconds * 60,
+        "peak_memory_mib": peak / 2**20,
+        "phases": profiler.summary(),
+    }
+
+
+def run_price_updater(profiler, items, server, async_crawl=False):
+    sheet = FakeWorksheet.shopping_list(items)
+    price_updater = ReplayPriceUpdater.from_worksheet(
+        sheet, log_level="ERROR", profiler=profiler, async_crawl=async_crawl
+    )
+    price_updater.fetcher.ids = server.ids(shopping_bot.IDS)
+    errors = ErrorLog()
+    price_updater.logger.addHandler(errors)
+    try:
+        price_updater.process_item_list()
+    finally:
+        price_updater.logger.removeHandler(errors)
+        price_updater.close()
+    if errors.messages:
+        # The timings of failed stores are not those of a crawl.
+        raise RuntimeError(
+            f"The price_updater scenario failed: {' '.join(errors.messages)}"
+        )
+    stores = [url for url in shopping_bot.URLS if price_updater.fetcher.can_fetch(url)]
+    return len(items) * len(stores)
+
+
+def replay_driver_factory(headless=True):
+    """Returns a factory of Firefox sessions that resolve www.<store>.localhost to
+    the mock store, so `ShoppingBot` can be pointed at it."""
+    from selenium import webdriver
+    from selenium.webdriver.firefox.options import Options
+
+    def factory():
+        profile = shopping_bot.disable_images_firefox_profile()
+        profile.set_preference(
+            "network.dns.localDomains",
+            ",".join(f"www.{store}.localhost" for store in shopping_bot.IDS),
+        )
+        options = Options()
+        options.headless = headless
+        return webdriver.Firefox(firefox_profile=profile, options=options)
+
+    return factory
+
+
+def run_shopping_bot(profiler, items, server):
+    if not (shutil.which("firefox") and shutil.which("geckodriver")):
+        raise SkipScenario("Firefox and geckodriver are needed")
+    port = server.url.rsplit(":", 1)[1]
+    ids = server.ids(shopping_bot.IDS)
+    for store, store_ids in ids.items():
+        # The recorded pages are simpler than the live ones the xpaths were written
+        # for, every result links to /<store>/p/<slug>.
+        store_ids["first_result_xpath"] = f'//a[contains(@href, "/{store}/p/")]'
+    with shopping_bot.WebDriverPool(size=1, factory=replay_driver_factory()) as pool:
+        for store in ids:
+            bot = shopping_bot.ShoppingBot(
+                items,
+                f"http://www.{store}.localhost:{port}/",
+                ids=ids,
+                log_level="ERROR",
+                pool=pool,
+                profiler=profiler,
+            )
+            bot.search_items()
+    return len(items) * len(ids)
+
+
+SCENARIOS = {
+    "price_updater": (run_price_updater, ()),
+    "price_updater_async": (run_price_updater, (True,)),
+    "shopping_bot": (run_shopping_bot, ()),
+}
+
+
+def run(args):
+    items = shopping_list(args.items)
+    results = {
+        "label": args.label,
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "config": {"items": args.items, "latency": args.latency},
+        "scenarios": {},
+    }
+    for name in args.scenarios:
+        runner, extra = SCENARIOS[name]
+        with MockStoreServer(delay=args.latency) as server:
+            try:
+                result = measure(runner, items, server, *extra)
+            except SkipScenario as reason:
+                print(f"{name:<22}skipped: {reason}")
+                continue
+        results["scenarios"][name] = result
+        print(
+            f"{name:<22}{result['items_per_minute']:>9.0f} items/min"
+            f"{result['seconds']:>9.2f}s{result['peak_memory_mib']:>9.1f} MiB"
+        )
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    path = args.output / f"{args.label}.json"
+    path.write_text(json.dumps(results, indent=2))
+    print(f"Saved {path}")
+    return results
+
+
+def compare(baseline, current, threshold=0.1, min_seconds=0.005):
+    """Compares two saved results.
+
+    Args:
+        baseline (dict): The older results.
+        current (dict): The newer results.
+        threshold (float, optional): Fraction by which throughput may drop, or
+            memory and phase p95 may grow, before it counts as a regression.
+        min_seconds (float, optional): Phase p95 changes smaller than this are
+            noise and never count as regressions.
+
+    Returns:
+        tuple: The report lines and the list of regressions.
+    """
+    lines, regressions = [], []
+
+    def line(name, old, new, unit, higher_is_better=False, floor=0.0):
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > threshold and abs(new - old) > floor:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        lines.append(
+            f"{name:<48}{old:>10.2f}{new:>10.2f} {unit:<9}{change:>+8.1%}{flag}"
+        )
+
+    lines.append(f"{baseline['label']} -> {current['label']}")
+    for scenario, new in current["scenarios"].items():
+        old = baseline["scenarios"].get(scenario)
+        if old is None:
+            lines.append(f"{scenario}: not in {baseline['label']}")
+            continue
+        line(
+            f"{scenario} throughput",
+            old["items_per_minute"],
+            new["items_per_minute"],
+            "items/min",
+            higher_is_better=True,
+        )
+        line(
+            f"{scenario} peak memory",
+            old["peak_memory_mib"],
+            new["peak_memory_mib"],
+            "MiB",
+        )
+        old_phases = {(row["phase"], row["store"]): row for row in old["phases"]}
+        for row in new["phases"]:
+            previous = old_phases.get((row["phase"], row["store"]))
+            if previous is not None:
+                label = f"{row['phase']}[{row['store'] or '-'}]"
+                line(
+                    f"  {label} p95",
+                    previous["p95"],
+                    row["p95"],
+                    "s",
+                    floor=min_seconds,
+                )
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command")
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks.")
+    run_parser.add_argument(
+        "--items", type=int, default=20, help="Items per store, default [20]"
+    )
+    run_parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.05,
+        help="[seconds] Delay of each recorded page, default [0.05]",
+    )
+    run_parser.add_argument(
+        "--label", default=None, help="Name of the results, default [git describe]"
+    )
+    run_parser.add_argument(
+        "--output",
+        type=pathlib.Path,
+        default=RESULTS,
+        help=f"Directory the results are saved in, default [{RESULTS}]",
+    )
+    run_parser.add_argument(
+        "--scenario",
+        dest="scenarios",
+        action="append",
+        choices=list(SCENARIOS),
+        help="Scenario to run, may be repeated, default [all]",
+    )
+
+    compare_parser = commands.add_parser("compare", help="Compare two results.")
+    compare_parser.add_argument("baseline", type=pathlib.Path)
+    compare_parser.add_argument("current", type=pathlib.Path)
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Fraction a metric may get worse by, default [0.1]",
+    )
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        lines, regressions = compare(
+            json.loads(args.baseline.read_text()),
+            json.loads(args.current.read_text()),
+            threshold=args.threshold,
+        )
+        print("\n".join(lines))
+        sys.exit(1 if regressions else 0)
+    elif args.command == "run":
+        args.label = args.label or version_label()
+        args.scenarios = args.scenarios or list(SCENARIOS)
+        run(args)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+import argparse
+
+from shopping_list_bot import (
+    HealthMonitor,
+    JobQueue,
+    PriceHistory,
+    ProductCatalog,
+    WebDriverPool,
+    Worker,
+)
+from shopping_list_bot.distributed import DEFAULT_QUEUE_PATH
+from shopping_list_bot.health import DEFAULT_HEALTH_PATH
+from shopping_list_bot.price_history import DEFAULT_HISTORY_PATH
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Looks up the items queued by `price_checker.py --distributed`. "
+        "Run the workers on the same machine as price_checker.py, the queue is a "
+        "SQLite file on a local disk and must not be put on a network share."
+    )
+    parser.add_argument(
+        "--queue-path",
+        dest="queue_path",
+        default=DEFAULT_QUEUE_PATH,
+        help="Job queue shared with the coordinator, on a local disk, default "
+        f"[{DEFAULT_QUEUE_PATH}]",
+    )
+    parser.add_argument(
+        "--name",
+        dest="name",
+        default=None,
+        help="Name of this worker, default [<host name>-<process id>]",
+    )
+    parser.add_argument(
+        "--batch-size",
+        dest="batch_size",
+        type=int,
+        default=5,
+        help="Items of a store searched with one browser session, default [5]",
+    )
+    parser.add_argument(
+        "--lease",
+        dest="lease",
+        type=float,
+        default=300.0,
+        help="[seconds] Hand a batch to another worker when this one reports "
+        "nothing for this long, default [300]",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        dest="idle_timeout",
+        type=float,
+        default=None,
+        help="[seconds] Stop after the queue was empty for this long, default runs "
+        "until interrupted.",
+    )
+    parser.add_argument(
+        "--pool-size",
+        dest="pool_size",
+        type=int,
+        default=1,
+        help="Number of browsers kept open and reused across batches, default [1]",
+    )
+    parser.add_argument(
+        "--max-failures",
+        dest="max_failures",
+        type=int,
+        default=3,
+        help="Stop searching a store after this many selector time-outs in a row, "
+        "default [3]",
+    )
+    parser.add_argument(
+        "--health-path",
+        dest="health_path",
+        default=DEFAULT_HEALTH_PATH,
+        help=f"Wait times learnt per store, default [{DEFAULT_HEALTH_PATH}]",
+    )
+    parser.add_argument(
+        "--history-path",
+        dest="history_path",
+        default=None,
+        help=f"Open the products past runs found, e.g. [{DEFAULT_HISTORY_PATH}], "
+        "instead of searching for them.",
+    )
+    parser.add_argument(
+        "--loglevel",
+        dest="log_level",
+        default="INFO",
+        help="log level to use, default [INFO], options [INFO, DEBUG, ERROR]",
+    )
+    args = vars(parser.parse_args())
+    headless = args.get("log_level", "INFO").lower() != "debug"
+
+    catalog = None
+    if args.get("history_path"):
+        history = PriceHistory(args.get("history_path"))
+        catalog = ProductCatalog.from_history(history)
+        history.close()
+
+    health_path = args.get("health_path")
+    health = HealthMonitor.load(health_path, failure_threshold=args.get("max_failures"))
+    pool_size = args.get("pool_size")
+    worker = Worker(
+        JobQueue(args.get("queue_path")),
+        name=args.get("name"),
+        batch_size=args.get("batch_size"),
+        lease=args.get("lease"),
+        headless=headless,
+        pool=WebDriverPool(size=pool_size, headless=headless) if pool_size else None,
+        catalog=catalog,
+        health=health,
+    )
+    worker.logger.setLevel(args.get("log_level", "INFO").upper())
+    try:
+        worker.run(idle_timeout=args.get("idle_timeout"))
+    except KeyboardInterrupt:
+        worker.logger.info("Interrupted, the unfinished items were handed back.")
+    finally:
+        worker.close()
+        health.save(health_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,40 @@
 #!/usr/bin/env python3
 
 import argparse
+import importlib.util
 import pathlib
 from sys import exit
 
-from shopping_list_bot import PriceUpdater
+from shopping_list_bot import (
+    Coordinator,
+    HealthMonitor,
+    JobQueue,
+    PriceCache,
+    PriceHistory,
+    PriceUpdater,
+    ProductCatalog,
+    RunJournal,
+    RunProfiler,
+    sink_for_path,
+    to_cents,
+)
+from shopping_list_bot.distributed import DEFAULT_QUEUE_PATH
+from shopping_list_bot.health import DEFAULT_HEALTH_PATH
+from shopping_list_bot.journal import DEFAULT_JOURNAL_PATH
+from shopping_list_bot.price_cache import DEFAULT_CACHE_PATH
+from shopping_list_bot.price_history import DEFAULT_HISTORY_PATH
+
+
+def delivery_fee(text):
+    """Parses a STORE=PRICE delivery fee into (store, cents)."""
+    store, _, price = text.partition("=")
+    try:
+        cents = to_cents(price)
+    except ValueError:
+        cents = None
+    if not store or cents is None:
+        raise argparse.ArgumentTypeError(f"expected STORE=PRICE, got {text!r}")
+    return store, cents
 
 
 def main():
@@ -12,15 +42,40 @@ def main():
     parser.add_argument(
         "--json",
         dest="client_secret_file",
-        required=True,
         help="Google Json file containing secrets.",
     )
     parser.add_argument(
         "--spreadsheet_name",
         "-s",
-        dest="spreadsheet_name",
-        required=True,
-        help="Name of the spreadsheet you want to open.",
+        dest="spreadsheet_names",
+        metavar="SPREADSHEET_NAME",
+        action="append",
+        help="Name of the spreadsheet you want to open, repeat it to process "
+        "several shopping lists with a single crawl.",
+    )
+    parser.add_argument(
+        "--items-file",
+        dest="items_file",
+        default=None,
+        help="Search for the items listed one per line in this file instead of "
+        "the ones on a spreadsheet, needs --output.",
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        dest="outputs",
+        metavar="PATH",
+        action="append",
+        default=[],
+        help="Also write the results to a .csv, .parquet or .sqlite file, repeat "
+        "it to write several. Parquet needs pyarrow.",
+    )
+    parser.add_argument(
+        "--all-worksheets",
+        dest="all_worksheets",
+        action="store_true",
+        help="Process every worksheet of the spreadsheets instead of only the "
+        "first one.",
     )
     parser.add_argument(
         "--share-with",
@@ -31,7 +86,182 @@ def main():
         "--update",
         dest="update_spreadsheet",
         action="store_true",
-        help="Update spreadsheet with new prices.",
+        help="Update spreadsheet with new prices, re-reading the product URLs "
+        "already on the spreadsheet instead of searching again.",
+    )
+    parser.add_argument(
+        "--optimize",
+        dest="optimize",
+        action="store_true",
+        help="Compare the prices already on the spreadsheet, or those found for "
+        "--items-file, instead of crawling: the cheapest store for the whole "
+        "list and the cheapest split over --max-stores stores.",
+    )
+    parser.add_argument(
+        "--max-stores",
+        dest="max_stores",
+        type=int,
+        default=2,
+        help="Most stores to split the list over with --optimize, default [2]",
+    )
+    parser.add_argument(
+        "--delivery-fee",
+        dest="delivery_fees",
+        metavar="STORE=PRICE",
+        type=delivery_fee,
+        action="append",
+        default=[],
+        help="Delivery fee of a store in Rand, added when --optimize buys from it, "
+        "repeat it for each store.",
+    )
+    parser.add_argument(
+        "--basket-tab",
+        dest="basket_tab",
+        default="Basket",
+        help="Worksheet --optimize writes its results to, default [Basket]",
+    )
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        type=int,
+        default=1,
+        help="Number of stores to crawl in parallel, default [1]",
+    )
+    parser.add_argument(
+        "--timeout",
+        dest="crawl_timeout",
+        type=float,
+        default=None,
+        help="[seconds] Give up on stores still crawling after this long when "
+        "crawling in parallel, they stop after the item in progress.",
+    )
+    parser.add_argument(
+        "--flush-interval",
+        dest="flush_interval",
+        type=float,
+        default=5.0,
+        help="[seconds] Write the results found so far to the spreadsheet this "
+        "often while crawling, default [5]",
+    )
+    parser.add_argument(
+        "--pool-size",
+        dest="pool_size",
+        type=int,
+        default=0,
+        help="Number of browsers kept open and reused across stores, default [0] "
+        "starts a new browser per store.",
+    )
+    parser.add_argument(
+        "--browser-only",
+        dest="browser_only",
+        action="store_true",
+        help="Search every store with Firefox instead of trying plain HTTP first.",
+    )
+    parser.add_argument(
+        "--async",
+        dest="async_crawl",
+        action="store_true",
+        help="Look items up over HTTP at all stores at once before opening "
+        "browsers for the rest.",
+    )
+    parser.add_argument(
+        "--max-age",
+        dest="max_age",
+        type=float,
+        default=None,
+        help="[seconds] Reuse cached prices up to this old instead of each store's "
+        "default.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="no_cache",
+        action="store_true",
+        help="Crawl every item, without reading or updating the price cache.",
+    )
+    parser.add_argument(
+        "--cache-path",
+        dest="cache_path",
+        default=DEFAULT_CACHE_PATH,
+        help=f"Price cache database, default [{DEFAULT_CACHE_PATH}]",
+    )
+    parser.add_argument(
+        "--history-path",
+        dest="history_path",
+        default=DEFAULT_HISTORY_PATH,
+        help=f"Price history database, default [{DEFAULT_HISTORY_PATH}]",
+    )
+    parser.add_argument(
+        "--no-history",
+        dest="no_history",
+        action="store_true",
+        help="Do not log this run's prices to the price history.",
+    )
+    parser.add_argument(
+        "--max-failures",
+        dest="max_failures",
+        type=int,
+        default=3,
+        help="Stop searching a store after this many selector time-outs in a row, "
+        "default [3]",
+    )
+    parser.add_argument(
+        "--health-path",
+        dest="health_path",
+        default=DEFAULT_HEALTH_PATH,
+        help=f"Wait times learnt per store, default [{DEFAULT_HEALTH_PATH}]",
+    )
+    parser.add_argument(
+        "--no-catalog",
+        dest="no_catalog",
+        action="store_true",
+        help="Search for every item instead of opening the products past runs "
+        "found for it.",
+    )
+    parser.add_argument(
+        "--resume",
+        dest="resume",
+        action="store_true",
+        help="Continue the last run that did not finish, skipping the items it "
+        "already looked up.",
+    )
+    parser.add_argument(
+        "--journal-path",
+        dest="journal_path",
+        default=DEFAULT_JOURNAL_PATH,
+        help=f"Checkpoints of the current run, default [{DEFAULT_JOURNAL_PATH}]",
+    )
+    parser.add_argument(
+        "--distributed",
+        dest="distributed",
+        action="store_true",
+        help="Queue the items that need a browser for crawl_worker.py processes "
+        "on this machine instead of opening browsers here.",
+    )
+    parser.add_argument(
+        "--queue-path",
+        dest="queue_path",
+        default=DEFAULT_QUEUE_PATH,
+        help=f"Job queue shared with the workers, default [{DEFAULT_QUEUE_PATH}]",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        dest="max_attempts",
+        type=int,
+        default=3,
+        help="Times a worker may try an item before it is given up on, default [3]",
+    )
+    parser.add_argument(
+        "--profile",
+        dest="profile",
+        action="store_true",
+        help="Time each phase of the run and print p50/p95 per store at the end.",
+    )
+    parser.add_argument(
+        "--profile-output",
+        dest="profile_output",
+        default=None,
+        help="Save the run's timings to this file, in the Prometheus text format "
+        "for .prom files and as JSON otherwise.",
     )
     parser.add_argument(
         "--loglevel",
@@ -40,11 +270,22 @@ def main():
         help="log level to use, default [INFO], options [INFO, DEBUG, ERROR]",
     )
     args = vars(parser.parse_args())
-    email_list = []
-    client_secret = pathlib.Path(args.get("client_secret_file")).absolute()
+    items_file = args.get("items_file")
+    if items_file is None:
+        if not (args.get("client_secret_file") and args.get("spreadsheet_names")):
+            parser.error("--json and -s are required unless --items-file is given")
+    elif not (args.get("outputs") or args.get("optimize")):
+        parser.error("--items-file needs at least one --output or --optimize")
+    elif args.get("update_spreadsheet"):
+        parser.error("--update needs a spreadsheet, not --items-file")
+    try:
+        sinks = [sink_for_path(path) for path in args.get("outputs")]
+    except (ImportError, ValueError) as error:
+        exit(str(error))
+    if args.get("optimize") and importlib.util.find_spec("numpy") is None:
+        exit("--optimize needs numpy, run `pip install numpy`.")
 
-    if not client_secret.is_file():
-        exit(f"File: {client_secret} could not be found!!!")
+    email_list = []
 
     if args.get("shared", False):
         email_list.append(args.get("shared"))
@@ -56,18 +297,106 @@ def main():
         log_level = args.get("log_level", "INFO")
         headless = True
 
-    price_updater = PriceUpdater(
-        spreadsheet_name=args.get("spreadsheet_name"),
-        secrets_json=client_secret,
-        share=email_list,
+    history = None
+    if not args.get("no_history"):
+        history = PriceHistory(args.get("history_path"))
+    catalog = None
+    if history is not None and not args.get("no_catalog"):
+        catalog = ProductCatalog.from_history(history)
+
+    health_path = args.get("health_path")
+    health = HealthMonitor.load(health_path, failure_threshold=args.get("max_failures"))
+
+    profile_output = args.get("profile_output")
+    profiler = RunProfiler(enabled=args.get("profile") or bool(profile_output))
+    coordinator = None
+    if args.get("distributed"):
+        coordinator = Coordinator(
+            JobQueue(args.get("queue_path")),
+            max_attempts=args.get("max_attempts"),
+            profiler=profiler,
+        )
+    options = dict(
         log_level=log_level,
         headless=headless,
+        workers=args.get("workers"),
+        crawl_timeout=args.get("crawl_timeout"),
+        flush_interval=args.get("flush_interval"),
+        pool_size=args.get("pool_size"),
+        http_first=not args.get("browser_only", False),
+        async_crawl=args.get("async_crawl", False),
+        cache=None if args.get("no_cache") else PriceCache(args.get("cache_path")),
+        max_age=args.get("max_age"),
+        history=history,
+        catalog=catalog,
+        profiler=profiler,
+        journal=RunJournal(args.get("journal_path"), resume=args.get("resume")),
+        health=health,
+        coordinator=coordinator,
     )
-
-    if args.get("update_spreadsheet", False):
-        price_updater.update_spreadsheet()
+    spreadsheet_names = args.get("spreadsheet_names")
+    all_worksheets = args.get("all_worksheets")
+    if items_file is not None:
+        items_path = pathlib.Path(items_file)
+        if not items_path.is_file():
+            exit(f"File: {items_path.absolute()} could not be found!!!")
+        items = [
+            line.strip()
+            for line in items_path.read_text(encoding="utf-8").splitlines()
+            if line.strip()
+        ]
+        price_updater = PriceUpdater.offline(**options)
     else:
-        price_updater.process_item_list()
+        client_secret = pathlib.Path(args.get("client_secret_file")).absolute()
+        if not client_secret.is_file():
+            exit(f"File: {client_secret} could not be found!!!")
+        price_updater = PriceUpdater(
+            spreadsheet_name=spreadsheet_names[0],
+            secrets_json=client_secret,
+            share=email_list,
+            **options,
+        )
+
+    optimize = args.get("optimize")
+    delivery_fees = dict(args.get("delivery_fees"))
+    try:
+        if items_file is not None:
+            shopping_carts = price_updater.export_results(items, sinks)
+            if optimize:
+                matrix, split = price_updater.optimize_basket(
+                    args.get("max_stores"),
+                    delivery_fees,
+                    shopping_carts=shopping_carts,
+                    items=items,
+                )
+                if split is not None:
+                    print(matrix.format_report(split, delivery_fees))
+            return
+        if optimize:
+            matrix, split = price_updater.optimize_basket(
+                args.get("max_stores"), delivery_fees, tab=args.get("basket_tab")
+            )
+            if split is not None:
+                print(matrix.format_report(split, delivery_fees))
+            return
+        worksheets = None
+        if len(spreadsheet_names) > 1 or all_worksheets:
+            worksheets = price_updater.open_worksheets(
+                spreadsheet_names, all_worksheets=all_worksheets
+            )
+        if args.get("update_spreadsheet", False):
+            price_updater.update_spreadsheet_price(worksheets)
+        elif worksheets is not None:
+            price_updater.process_worksheets(worksheets, sinks=sinks)
+        else:
+            price_updater.process_item_list(sinks=sinks)
+    finally:
+        price_updater.close()
+        health.save(health_path)
+        if args.get("profile"):
+            print(profiler.format_report())
+        if profile_output:
+            profiler.save(profile_output)
 
 
 if __name__ == "__main__":
@@ -16,7 +16,7 @@ DESCRIPTION = "Automated shopping list creator."
 URL = "https://github.com/mmphego/shopping_list_bot"
 EMAIL = "mpho112@gmail.com"
 AUTHOR = "Mpho Mphego"
-REQUIRES_PYTHON = ">=3.6.0"
+REQUIRES_PYTHON = ">=3.7.0"
 VERSION = "0.0.4"
 REQUIRED = [
     "requests",
@@ -26,6 +26,8 @@ REQUIRED = [
     "gspread",
     "coloredlogs",
 ]
+# Optional dependencies, e.g. `pip install .[parquet]`.
+EXTRAS = {"optimizer": ["numpy"], "parquet": ["pyarrow"]}
 
 try:
     with io.open(os.path.join(here, "README.md"), encoding="utf-8") as f:
@@ -105,6 +107,7 @@ setup(
     url=URL,
     packages=find_packages(exclude=["tests", "*.tests", "*.tests.*", "tests.*"]),
     install_requires=REQUIRED,
+    extras_require=EXTRAS,
     include_package_data=True,
     scripts=SCRIPTS,
     license="MIT",
@@ -112,7 +115,7 @@ setup(
         "License :: OSI Approved :: MIT License",
         "Programming Language :: Python",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.6",
+        "Programming Language :: Python :: 3.7",
     ],
     project_urls={
         "Bug Reports": f"{URL}/issues",
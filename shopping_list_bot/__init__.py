@@ -1,2 +1,76 @@
-from .shopping_list_bot import *
-from .price_updater import *
+"""Finds the cheapest prices of a Google Sheets shopping list at online stores.
+
+Names are imported from their submodule the first time they are used, so that
+importing the package, or running a command that never opens a browser, parses
+a page or talks to Google Sheets, does not pay for importing Selenium,
+BeautifulSoup or gspread.
+"""
+
+import importlib
+
+# Submodule of every public name, in the order the submodules used to be loaded.
+_SUBMODULES = {
+    "stores": [
+        "StoreAdapter",
+        "UnknownStore",
+        "get_adapter",
+        "register_store",
+        "store_key",
+    ],
+    "common": [
+        "DEFAULT_TIMEOUTS",
+        "IDS",
+        "TIMEOUT",
+        "URLS",
+        "LoggingClass",
+        "ShoppingList",
+        "clean_price",
+        "to_cents",
+    ],
+    "shopping_list_bot": [
+        "ShoppingBot",
+        "WebDriverSetup",
+        "disable_images_firefox_profile",
+        "firefox_driver",
+    ],
+    "profiler": ["PhaseSample", "RunProfiler"],
+    "driver_pool": ["PoolClosedError", "WebDriverPool"],
+    "health": ["HealthMonitor"],
+    "results": ["ResultsExtractor", "match_score"],
+    "http_fetcher": ["HttpFetcher", "NeedsBrowser"],
+    "async_crawler": ["AsyncCrawler", "TokenBucket"],
+    "sheets": ["SheetSnapshot", "SheetWriter"],
+    "sinks": [
+        "CsvSink",
+        "GoogleSheetSink",
+        "ParquetSink",
+        "ResultSink",
+        "SqliteSink",
+        "sink_for_path",
+    ],
+    "pipeline": ["ResultPipeline", "SheetPipeline", "result_cells"],
+    "price_cache": ["PriceCache", "normalize_query"],
+    "price_history": ["PriceChange", "PriceHistory", "PriceRecord"],
+    "journal": ["RunJournal"],
+    "catalog": ["CatalogMatch", "ProductCatalog", "product_tokens", "similarity"],
+    "distributed": ["Coordinator", "Job", "JobQueue", "Worker"],
+    "optimizer": ["PriceMatrix", "Split", "format_cents"],
+    "price_updater": ["PriceUpdater"],
+}
+
+_LAZY_NAMES = {name: module for module, names in _SUBMODULES.items() for name in names}
+
+__all__ = list(_LAZY_NAMES)
+
+
+def __getattr__(name):
+    module = _LAZY_NAMES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
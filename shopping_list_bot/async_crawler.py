@@ -0,0 +1,154 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .common import IDS, URLS, LoggingClass
+from .http_fetcher import HttpFetcher, NeedsBrowser
+
+__all__ = ["AsyncCrawler", "TokenBucket"]
+
+
+class TokenBucket:
+    """
+    An asyncio rate limiter allowing `rate` acquisitions per second on average
+    and bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic):
+        """
+        Args:
+            rate (float): Tokens added per second.
+            capacity (int, optional): Maximum number of tokens saved up.
+            clock (callable, optional): Returns the current time in seconds.
+        """
+        assert rate > 0 and capacity >= 1
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Waits until a token is available and takes it."""
+        async with self._lock:
+            while True:
+                now = self._clock()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncCrawler(LoggingClass):
+    """
+    Looks items up at every store at once on an asyncio event loop, with a cap on
+    concurrent lookups and a rate limit per store so the stores do not block us.
+
+    Lookups go over plain HTTP through an `HttpFetcher`. Stores that need
+    JavaScript, and items whose pages could not be parsed, come back as None to be
+    searched for with a `ShoppingBot`.
+
+    Attributes:
+        fetcher (HttpFetcher): Fetches and parses the store pages.
+        concurrency (int): Maximum concurrent lookups per store.
+        rate (float): Maximum lookups started per second per store.
+    """
+
+    def __init__(self, fetcher=None, ids=IDS, concurrency=4, rate=4.0, burst=2):
+        """
+        Args:
+            fetcher (HttpFetcher, optional): Fetches and parses the store pages.
+            ids (dict, optional): Per store selectors for a new `HttpFetcher`.
+            concurrency (int, optional): Maximum concurrent lookups per store.
+            rate (float, optional): Maximum lookups started per second per store.
+            burst (int, optional): Lookups a store may start at once after idling.
+        """
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        threads = concurrency * len(URLS)
+        self.fetcher = fetcher or HttpFetcher(ids=ids, workers=threads)
+        # A shared fetcher is sized for its own workers, not for these threads.
+        self.fetcher.reserve_connections(threads)
+        self._executor = ThreadPoolExecutor(max_workers=threads)
+
+    async def crawl(self, jobs):
+        """Looks up every item at every store, yielding results as they complete.
+
+        Args:
+            jobs (dict): Store url mapped to the items to look up there.
+
+        Yields:
+            tuple: (store url, item index, item, `ShoppingList` or None).
+        """
+        tasks = []
+        for url, items in jobs.items():
+            if not self.fetcher.can_fetch(url):
+                self.logger.info(f"{url} needs a browser, skipping it.")
+                for count, item in enumerate(items):
+                    tasks.append(self._skip(url, count, item))
+                continue
+            limit = asyncio.Semaphore(self.concurrency)
+            bucket = TokenBucket(self.rate, capacity=self.burst)
+            for count, item in enumerate(items):
+                tasks.append(self._lookup(url, count, item, limit, bucket))
+
+        for task in asyncio.as_completed(tasks):
+            yield await task
+
+    def crawl_all(self, jobs, on_result=None):
+        """Runs `crawl` to completion on a new event loop.
+
+        Args:
+            jobs (dict): Store url mapped to the items to look up there.
+            on_result (callable, optional): Called with each result tuple as soon
+                as it is available.
+
+        Returns:
+            dict: Store url mapped to a `ShoppingList` or None per item, in the
+                order of the items.
+        """
+        results = {url: [None] * len(items) for url, items in jobs.items()}
+
+        async def collect():
+            async for url, count, item, result in self.crawl(jobs):
+                results[url][count] = result
+                if on_result is not None:
+                    on_result(url, count, item, result)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(collect())
+        finally:
+            loop.close()
+        return results
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.fetcher.close()
+
+    async def _skip(self, url, count, item):
+        return url, count, item, None
+
+    async def _lookup(self, url, count, item, limit, bucket):
+        async with limit:
+            await bucket.acquire()
+            result = await asyncio.get_event_loop().run_in_executor(
+                self._executor, self._search, item, url
+            )
+        return url, count, item, result
+
+    def _search(self, item, url):
+        try:
+            return self.fetcher.search_item(item, url)
+        except NeedsBrowser as error:
+            self.logger.info(f"Escalating {item} on {url} to a browser: {error}")
+        except requests.RequestException as error:
+            self.logger.warning(f"Failed to fetch {item} from {url}: {error}")
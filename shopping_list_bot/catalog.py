@@ -0,0 +1,203 @@
+import re
+from collections import defaultdict, namedtuple
+
+from .common import LoggingClass
+from .price_cache import normalize_query
+
+__all__ = ["CatalogMatch", "ProductCatalog", "product_tokens", "similarity"]
+
+CatalogMatch = namedtuple("CatalogMatch", ["item_name", "item_url", "score"])
+
+TOKENS = re.compile(r"[a-z0-9]+")
+SIZES = re.compile(
+    r"(?<![a-z0-9.])(\d+(?:[.,]\d+)?)\s*"
+    r"(kg|g|gr|grams?|mg|l|lt|litres?|liters?|ml|s|pack|pk)(?![a-z])"
+)
+# Unit mapped to the base unit and the factor to convert to it.
+UNITS = {
+    "kg": ("g", 1000),
+    "g": ("g", 1),
+    "gr": ("g", 1),
+    "gram": ("g", 1),
+    "grams": ("g", 1),
+    "mg": ("g", 0.001),
+    "l": ("ml", 1000),
+    "lt": ("ml", 1000),
+    "litre": ("ml", 1000),
+    "litres": ("ml", 1000),
+    "liter": ("ml", 1000),
+    "liters": ("ml", 1000),
+    "ml": ("ml", 1),
+    "s": ("pk", 1),
+    "pack": ("pk", 1),
+    "pk": ("pk", 1),
+}
+
+
+def _size(match):
+    unit, factor = UNITS[match.group(2)]
+    return "%g%s" % (float(match.group(1).replace(",", ".")) * factor, unit)
+
+
+def product_tokens(text):
+    """Splits a product name or query into lower case words, with sizes written
+    the same way whatever the unit, e.g. "1 Kg" and "1000g" both become "1000g".
+
+    Args:
+        text (str): A product name or the item searched for.
+
+    Returns:
+        list: The words, sizes first.
+    """
+    text = (text or "").lower()
+    sizes = [_size(match) for match in SIZES.finditer(text)]
+    return sizes + TOKENS.findall(SIZES.sub(" ", text))
+
+
+def trigrams(tokens):
+    """Returns the character trigrams of the words, padded at word boundaries."""
+    grams = set()
+    for token in tokens:
+        padded = f"  {token} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(item, name):
+    """Scores how similar a product name is to the item searched for.
+
+    Half of the score is the share of the item's words found in the name (with
+    a little weight on the name having no extra words), the other half is the
+    overlap of their character trigrams, which forgives typos and plurals. Names
+    of a different size than the item asks for score half as much.
+
+    Args:
+        item (str): The item searched for, e.g. "jungle oats 1kg".
+        name (str): A product name.
+
+    Returns:
+        float: From 0 for nothing in common to 1 for the same words.
+    """
+    wanted, found = product_tokens(item), product_tokens(name)
+    if not wanted or not found:
+        return 0.0
+    wanted_set, found_set = set(wanted), set(found)
+    common = len(wanted_set & found_set)
+    words = 0.8 * common / len(wanted_set) + 0.2 * common / len(found_set)
+    wanted_grams, found_grams = trigrams(wanted), trigrams(found)
+    letters = len(wanted_grams & found_grams) / len(wanted_grams | found_grams)
+    score = (words + letters) / 2
+    wanted_sizes = {token for token in wanted_set if token[0].isdigit()}
+    found_sizes = {token for token in found_set if token[0].isdigit()}
+    if wanted_sizes and found_sizes and not wanted_sizes & found_sizes:
+        score /= 2
+    return score
+
+
+class ProductCatalog(LoggingClass):
+    """
+    An in-memory index of the products found by past runs, per store, to go
+    straight to a product's page instead of searching for it.
+
+    Items searched for before resolve to the product they found, as long as its
+    name still resembles the item. Other items resolve to the most similar
+    product, looked up through a trigram index, when its `similarity` is at least
+    `threshold` and no other product comes within `margin` of it.
+
+    Attributes:
+        threshold (float): Minimum `similarity` of a confident fuzzy match.
+        margin (float): How much better than the runner-up a fuzzy match must be.
+        min_score (float): Minimum `similarity` for a past search to be reused.
+    """
+
+    def __init__(self, threshold=0.75, margin=0.05, min_score=0.5):
+        """
+        Args:
+            threshold (float, optional): Minimum `similarity` of a confident fuzzy
+                match.
+            margin (float, optional): How much better than the runner-up a fuzzy
+                match must be.
+            min_score (float, optional): Minimum `similarity` for a past search
+                to be reused.
+        """
+        self.threshold = threshold
+        self.margin = margin
+        self.min_score = min_score
+        self._names = defaultdict(dict)
+        self._queries = defaultdict(dict)
+        self._index = defaultdict(lambda: defaultdict(set))
+
+    @classmethod
+    def from_history(cls, history, **kwargs):
+        """Builds the catalog from the latest product found for every item and
+        store in a `PriceHistory`.
+
+        Args:
+            history (PriceHistory): Past runs.
+            **kwargs: Any of the `ProductCatalog` arguments.
+
+        Returns:
+            ProductCatalog: The catalog.
+        """
+        catalog = cls(**kwargs)
+        for store, item, item_name, item_url in history.latest_products():
+            catalog.add(store, item, item_name, item_url)
+        catalog.logger.info(f"Loaded {len(catalog)} known product(s).")
+        return catalog
+
+    def __len__(self):
+        return sum(len(names) for names in self._names.values())
+
+    def add(self, store, item, item_name, item_url):
+        """Adds a product found for an item.
+
+        Args:
+            store (str): Store key or name, e.g. "makro".
+            item (str): The item searched for, None if unknown.
+            item_name (str): The product's name.
+            item_url (str): The product page.
+        """
+        if not item_name or not item_url:
+            return
+        store = store.lower()
+        self._names[store][item_url] = item_name
+        if item:
+            self._queries[store][normalize_query(item)] = item_url
+        for gram in trigrams(product_tokens(item_name)):
+            self._index[store][gram].add(item_url)
+
+    def lookup(self, store, item):
+        """Finds the known product for an item.
+
+        Args:
+            store (str): Store key or name, e.g. "makro".
+            item (str): The item searched for.
+
+        Returns:
+            CatalogMatch: The product and its `similarity` to the item, or None
+                when no product is a confident match.
+        """
+        store = store.lower()
+        names = self._names.get(store)
+        if not names:
+            return None
+        known_url = self._queries[store].get(normalize_query(item))
+        if known_url is not None:
+            score = similarity(item, names[known_url])
+            if score >= self.min_score:
+                return CatalogMatch(names[known_url], known_url, score)
+
+        index = self._index[store]
+        urls = set()
+        for gram in trigrams(product_tokens(item)):
+            urls.update(index.get(gram, ()))
+        scored = sorted(
+            ((similarity(item, names[url]), url) for url in urls), reverse=True
+        )
+        if not scored or scored[0][0] < self.threshold:
+            return None
+        (score, url), runner_up = scored[0], scored[1:2]
+        if runner_up and score - runner_up[0][0] < self.margin:
+            self.logger.debug(f"{item} matches several products at {store}.")
+            return None
+        return CatalogMatch(names[url], url, score)
@@ -0,0 +1,204 @@
+import logging
+import os
+import sys
+
+from .stores import get_adapter
+
+__all__ = [
+    "DEFAULT_TIMEOUTS",
+    "IDS",
+    "TIMEOUT",
+    "URLS",
+    "LoggingClass",
+    "ShoppingList",
+    "clean_price",
+    "to_cents",
+]
+
+TIMEOUT = 30
+
+# Seconds to wait for each step, stores can override them with a "timeouts" entry.
+DEFAULT_TIMEOUTS = {
+    "page_ready": TIMEOUT,
+    "search_input": TIMEOUT,
+    "search_submit": TIMEOUT,
+    "first_result": TIMEOUT,
+    "product_page": TIMEOUT,
+    "price": TIMEOUT,
+}
+
+URLS = [
+    "https://www.makro.co.za/",
+    "https://www.game.co.za/",
+    "https://www.pnp.co.za/",
+    "https://www.woolworths.co.za/",
+    "https://www.takealot.com/",
+]
+
+IDS = {
+    "makro": {
+        "first_result_xpath": "/html/body/main/div[9]/div[3]/div/div[1]/div[3]/div[2]/div/div/div[2]/div[1]",
+        "price_product": "product-ProductNamePrice",
+        "price_promotion": "product-PromotionSection",
+        "product_name": "name",
+        "requires_js": False,
+        "result_link_css": "a.product-tile-inner__productTitle",
+        "result_name_css": "a.product-tile-inner__productTitle",
+        "result_price_css": "p.price",
+        "result_tile_css": "div.product-tile-inner",
+        "search_button_xpath": "/html/body/main/div[2]/div/div[2]/div/div/div[4]/div/div/div/div/div[2]/div/form/span[2]/a/i",
+        "search_input_id": "js-site-search-input",
+        "search_url": "https://www.makro.co.za/search/?text={query}",
+        "timeouts": {"first_result": 20, "price": 10},
+    },
+    "game": {
+        "first_result_xpath": "/html/body/main/div[3]/div[2]/div[2]/div/div/div/ul/div[1]/a/div",
+        "price_product": "pdp_price",
+        "price_promotion": "pdp_price",
+        "product_name": "name",
+        "requires_js": False,
+        "result_link_css": "div.product-item a.product-item__link",
+        "result_name_css": "a.product-item__link",
+        "result_tile_css": "div.product-item",
+        "search_button_xpath": "/html/body/main/header/nav[1]/div/div[2]/div[2]/div/div/div/form/div/span/button",
+        "search_input_id": "js-site-search-input",
+        "timeouts": {"first_result": 20, "price": 10},
+    },
+    "pnp": {
+        "first_result_xpath": "/html/body/main/div[4]/div[2]/div/div[1]/div[3]/div[2]/div[2]/div[1]/ul/div[1]/div/div[3]/a/div[1]",
+        "price_product": "normalPrice",
+        "price_promotion": "pricedata-Save",
+        "product_name": "fed-pdp-product-details-title",
+        "requires_js": False,
+        "result_link_css": "div.productCarouselItem a.js-potential-impression-click",
+        "result_name_css": "div.item-name",
+        "result_price_css": "div.currentPrice",
+        "result_tile_css": "div.productCarouselItem",
+        "search_button_xpath": "/html/body/main/header/div[1]/div[2]/div/div[7]/div/form/div/span/button/span",
+        "search_input_id": "js-site-search-input",
+        "search_url": "https://www.pnp.co.za/pnpstorefront/pnp/en/search/?text={query}",
+        "timeouts": {"first_result": 20, "price": 10},
+    },
+    "woolworths": {
+        "cache_ttl": 12 * 60 * 60,
+        "first_result_xpath": "/html/body/div/div/div/main/div/div/div/div[1]/div[1]/div[3]/div[1]/article/div[2]/a/h2",
+        "price_product": "price",
+        "price_promotion": "price",
+        "product_name": "ffont-graphic heading--400 heading--sub no-wrap--ellipsis",
+        "requires_js": True,
+        "result_link_css": "div.product-list__item a.range--title",
+        "result_name_css": "a.range--title",
+        "result_price_css": "div.price",
+        "result_tile_css": "div.product-list__item",
+        "search_button_xpath": "/html/body/div/div/header/div[2]/div/section[3]/div/div/form/input[3]",
+        "search_input_id": "fldSearch",
+        "search_url": "https://www.woolworths.co.za/cat?Ntt={query}&Dy=1",
+        "timeouts": {"first_result": 25, "price": 15},
+    },
+    "takealot": {
+        "cache_ttl": 2 * 60 * 60,
+        "first_result_xpath": '//*[@id="pos_link_0"]',
+        "price_product": "sf-price",
+        "price_promotion": "buybox-module_price_2YUFa",
+        "product_name": "product-title",
+        "requires_js": True,
+        "result_link_css": "a.product-anchor",
+        "result_name_css": "a.product-anchor",
+        "result_price_css": "span.currency",
+        "result_tile_css": "div.product-card",
+        "search_button_xpath": "/html/body/div[3]/div/div[2]/form/fieldset/input[5]",
+        "search_input_id": "search",
+        "search_url": "https://www.takealot.com/all?qsearch={query}",
+        "timeouts": {"first_result": 15, "price": 10},
+    },
+}
+
+
+class ShoppingList:
+    """
+    A product found for an item. Slotted, with the price kept as integer cents, as
+    carts hold one per item and store.
+
+    Attributes:
+        item_name (str): The product's name.
+        price_cents (int): The price in cents, None when unknown.
+        item_url (str): The product page.
+    """
+
+    __slots__ = ("item_name", "price_cents", "item_url")
+
+    def __init__(self, item_name, item_price, item_url):
+        """
+        Args:
+            item_name (str): The product's name.
+            item_price: The price in Rand, as parsed by the store's adapter.
+            item_url (str): The product page.
+        """
+        self.item_name = item_name
+        self.price_cents = to_cents(item_price)
+        self.item_url = item_url
+
+    @property
+    def item_price(self):
+        """str: The price in Rand with two decimals, e.g. "49.99", or None."""
+        if self.price_cents is None:
+            return None
+        return "%d.%02d" % divmod(self.price_cents, 100)
+
+    @item_price.setter
+    def item_price(self, item_price):
+        self.price_cents = to_cents(item_price)
+
+    def __repr__(self):
+        return "<%s.%s(item_name='%s', item_price='%s') at 0x%x>" % (
+            self.__class__.__module__,
+            self.__class__.__name__,
+            self.item_name,
+            self.item_price,
+            id(self),
+        )
+
+
+def clean_price(store, price):
+    """Turns the price text scraped from a store's product page into a price.
+
+    Args:
+        store (str): Store key in `IDS`, e.g. "makro".
+        price (str): Price text as shown on the product page.
+
+    Returns:
+        The price in Rand.
+
+    Raises:
+        UnknownStore: If no adapter is registered for `store`.
+    """
+    return get_adapter(store).parse_price(price)
+
+
+def to_cents(price):
+    """Converts a price in Rand, as returned by `clean_price`, to integer cents.
+
+    Args:
+        price: The price, e.g. "49.99", " 1,299" or 199.0.
+
+    Returns:
+        int: The price in cents or None if there is no price.
+    """
+    if price is None:
+        return None
+    price = str(price).replace(",", "").replace(" ", "").lstrip("R")
+    if not price:
+        return None
+    return int(round(float(price) * 100))
+
+
+class LoggingClass:
+    @property
+    def logger(self):
+        log_format = (
+            "%(asctime)s - %(name)s - %(levelname)s - %(module)s - "
+            "%(pathname)s : %(lineno)d - %(message)s"
+        )
+        name = ".".join([os.path.basename(sys.argv[0]), self.__class__.__name__])
+        logging.basicConfig(format=log_format)
+        return logging.getLogger(name)
@@ -0,0 +1,524 @@
+import os
+import pathlib
+import socket
+import sqlite3
+import threading
+import time
+from collections import Counter, namedtuple
+
+from .common import LoggingClass, ShoppingList
+from .profiler import RunProfiler
+from .stores import store_key
+
+__all__ = ["Coordinator", "Job", "JobQueue", "Worker"]
+
+DEFAULT_QUEUE_PATH = pathlib.Path.home() / ".cache" / "shopping_list_bot" / "queue.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    item TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker TEXT,
+    leased_until REAL,
+    item_name TEXT,
+    item_price,
+    item_url TEXT,
+    error TEXT,
+    submitted_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (state, job_id);
+"""
+
+# Jobs a worker may lease: never leased, handed back, or leased by a worker that
+# stopped renewing its lease.
+AVAILABLE = (
+    "(state = 'pending' OR (state = 'leased' AND leased_until < :now)) "
+    "AND attempts < max_attempts"
+)
+
+# SQLite limits the number of variables in a single statement.
+MAX_VARIABLES = 500
+
+Job = namedtuple("Job", ["job_id", "url", "item", "attempts"])
+
+
+def _chunks(values, size=MAX_VARIABLES):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def _placeholders(values):
+    return ", ".join("?" * len(values))
+
+
+class JobQueue(LoggingClass):
+    """
+    A SQLite queue of (store, item) lookups shared by a `Coordinator` and any
+    number of `Worker` processes.
+
+    Workers lease a batch of jobs for a while and renew the lease as results come
+    in. Jobs whose worker fails them, or dies and lets its lease run out, go back
+    to the queue until they were attempted `max_attempts` times.
+
+    Every process opens the database itself, so the coordinator and the workers
+    must run on the same machine with the file on a local disk. SQLite's locks
+    are not reliable on network file systems such as NFS or SMB, where a job
+    could be leased twice or the file corrupted.
+
+    Attributes:
+        path (pathlib.Path): The SQLite database.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, clock=time.time):
+        """
+        Args:
+            path (str, optional): The SQLite database, created when missing.
+            clock (callable, optional): Returns the current time in seconds, the
+                same in every process sharing the queue.
+        """
+        self.path = pathlib.Path(path)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Transactions are started explicitly, to take the write lock before
+        # choosing which jobs to lease.
+        self._db = sqlite3.connect(
+            str(self.path), timeout=30, isolation_level=None, check_same_thread=False
+        )
+        with self._lock:
+            self._db.executescript(SCHEMA)
+
+    def _transaction(self, statements):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements()
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    def _expire(self, now):
+        self._db.execute(
+            "UPDATE jobs SET state = 'failed', finished_at = ?, "
+            "error = COALESCE(error, 'lease expired') WHERE state = 'leased' "
+            "AND leased_until < ? AND attempts >= max_attempts",
+            (now, now),
+        )
+
+    def submit(self, url, items, max_attempts=3):
+        """Queues a lookup of every item at a store.
+
+        Args:
+            url (str): Store url, one of `URLS`.
+            items (list): Items to search for.
+            max_attempts (int, optional): Leases per job before it fails.
+
+        Returns:
+            list: The id of every job, in item order.
+        """
+        now = self._clock()
+
+        def insert():
+            return [
+                self._db.execute(
+                    "INSERT INTO jobs (url, item, max_attempts, submitted_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (url, item, max_attempts, now),
+                ).lastrowid
+                for item in items
+            ]
+
+        return self._transaction(insert)
+
+    def lease(self, worker, limit=1, duration=300.0):
+        """Leases the oldest available jobs, all for the same store.
+
+        Args:
+            worker (str): Name of the worker taking the jobs.
+            limit (int, optional): Most jobs leased at once.
+            duration (float, optional): Seconds before the jobs are handed to
+                another worker, unless `extend` is called.
+
+        Returns:
+            list: The leased `Job`s, empty when there is nothing to do.
+        """
+        now = self._clock()
+
+        def take():
+            self._expire(now)
+            first = self._db.execute(
+                f"SELECT url FROM jobs WHERE {AVAILABLE} ORDER BY job_id LIMIT 1",
+                {"now": now},
+            ).fetchone()
+            if first is None:
+                return []
+            rows = self._db.execute(
+                f"SELECT job_id, url, item, attempts FROM jobs WHERE {AVAILABLE} "
+                "AND url = :url ORDER BY job_id LIMIT :limit",
+                {"now": now, "url": first[0], "limit": limit},
+            ).fetchall()
+            self._db.executemany(
+                "UPDATE jobs SET state = 'leased', worker = ?, leased_until = ?, "
+                "attempts = attempts + 1 WHERE job_id = ?",
+                [(worker, now + duration, job_id) for job_id, *_ in rows],
+            )
+            return [
+                Job(job_id, url, item, attempts + 1)
+                for job_id, url, item, attempts in rows
+            ]
+
+        return self._transaction(take)
+
+    def extend(self, worker, job_ids, duration=300.0):
+        """Renews the worker's lease of jobs it is still working on."""
+        until = self._clock() + duration
+        with self._lock:
+            for chunk in _chunks(job_ids):
+                self._db.execute(
+                    "UPDATE jobs SET leased_until = ? WHERE state = 'leased' AND "
+                    f"worker = ? AND job_id IN ({_placeholders(chunk)})",
+                    [until, worker] + chunk,
+                )
+
+    def complete(self, worker, job_id, result):
+        """Stores the result of a leased job.
+
+        Args:
+            worker (str): Name of the worker that leased the job.
+            job_id (int): The job.
+            result (ShoppingList): The product found, with no name if none was.
+
+        Returns:
+            bool: False when the job is no longer leased by the worker, e.g. after
+                its lease ran out, and the result was dropped.
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET state = 'done', item_name = ?, item_price = ?, "
+                "item_url = ?, error = NULL, finished_at = ? WHERE job_id = ? AND "
+                "worker = ? AND state = 'leased'",
+                (
+                    result.item_name,
+                    result.item_price,
+                    result.item_url,
+                    self._clock(),
+                    job_id,
+                    worker,
+                ),
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, worker, job_id, error):
+        """Hands a leased job back, to be retried unless it ran out of attempts.
+
+        Args:
+            worker (str): Name of the worker that leased the job.
+            job_id (int): The job.
+            error (str): Why the lookup failed.
+        """
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET state = CASE WHEN attempts >= max_attempts THEN "
+                "'failed' ELSE 'pending' END, finished_at = CASE WHEN attempts >= "
+                "max_attempts THEN ? END, worker = NULL, leased_until = NULL, "
+                "error = ? WHERE job_id = ? AND worker = ? AND state = 'leased'",
+                (self._clock(), error, job_id, worker),
+            )
+
+    def finished(self, job_ids):
+        """Returns the jobs that are done or failed for good.
+
+        Args:
+            job_ids (list): The jobs to check.
+
+        Returns:
+            dict: Job id mapped to its `ShoppingList` and None, or to None and the
+                last error for failed jobs.
+        """
+        now = self._clock()
+
+        def select():
+            self._expire(now)
+            finished = {}
+            for chunk in _chunks(job_ids):
+                rows = self._db.execute(
+                    "SELECT job_id, state, item_name, item_price, item_url, error "
+                    "FROM jobs WHERE state IN ('done', 'failed') AND job_id IN "
+                    f"({_placeholders(chunk)})",
+                    chunk,
+                )
+                for job_id, state, name, price, url, error in rows:
+                    if state == "done":
+                        finished[job_id] = (ShoppingList(name, price, url), None)
+                    else:
+                        finished[job_id] = (None, error)
+            return finished
+
+        return self._transaction(select)
+
+    def remove(self, job_ids):
+        """Drops jobs, workers still searching for them have their results
+        ignored."""
+        with self._lock:
+            for chunk in _chunks(job_ids):
+                self._db.execute(
+                    f"DELETE FROM jobs WHERE job_id IN ({_placeholders(chunk)})", chunk
+                )
+
+    def counts(self):
+        """Returns the number of jobs per state, e.g. {"pending": 3, "done": 1}."""
+        with self._lock:
+            rows = self._db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state")
+            return Counter(dict(rows.fetchall()))
+
+    def close(self):
+        self._db.close()
+
+
+class Coordinator(LoggingClass):
+    """
+    Hands browser lookups to `Worker`s through a `JobQueue` and waits for their
+    results, in place of opening a browser locally.
+
+    Attributes:
+        queue (JobQueue): The queue shared with the workers.
+        max_attempts (int): Leases per job before it fails.
+        poll_interval (float): Seconds between checks for new results.
+        timeout (float): Seconds to wait for a store's results, None waits until
+            every job is done or failed.
+    """
+
+    def __init__(
+        self, queue, max_attempts=3, poll_interval=1.0, timeout=None, profiler=None
+    ):
+        """
+        Args:
+            queue (JobQueue): The queue shared with the workers.
+            max_attempts (int, optional): Leases per job before it fails.
+            poll_interval (float, optional): Seconds between checks for new
+                results.
+            timeout (float, optional): Seconds to wait for a store's results.
+            profiler (RunProfiler, optional): Times the wait per store.
+        """
+        self.queue = queue
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.profiler = profiler or RunProfiler(enabled=False)
+
+    def search(self, items, url, on_result=None):
+        """Queues the items and waits for the workers to look them up.
+
+        Args:
+            items (list): Items to search for.
+            url (str): Store url, one of `URLS`.
+            on_result (callable, optional): Called with the index of the item and
+                its `ShoppingList` as soon as a worker reports it.
+
+        Returns:
+            list: A `ShoppingList` per item, None for the items that failed or were
+                not done within `timeout`.
+        """
+        store = store_key(url)
+        results = [None] * len(items)
+        job_ids = self.queue.submit(url, items, self.max_attempts)
+        positions = {job_id: position for position, job_id in enumerate(job_ids)}
+        self.logger.info(f"Queued {len(job_ids)} item(s) for {store.title()}.")
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        try:
+            with self.profiler.phase("queue_wait", store):
+                while positions:
+                    finished = self.queue.finished(list(positions))
+                    for job_id, (result, error) in sorted(finished.items()):
+                        position = positions.pop(job_id)
+                        if result is None:
+                            self.logger.error(
+                                f"Gave up on {items[position]} at {store.title()}: "
+                                f"{error}"
+                            )
+                            continue
+                        results[position] = result
+                        if on_result is not None:
+                            on_result(position, result)
+                    if not positions:
+                        break
+                    if deadline is not None and time.monotonic() >= deadline:
+                        self.logger.error(
+                            f"Timed-out after {self.timeout}s waiting for "
+                            f"{len(positions)} item(s) at {store.title()}."
+                        )
+                        break
+                    time.sleep(self.poll_interval)
+        finally:
+            # Unfinished jobs are cancelled, along with the finished ones.
+            self.queue.remove(job_ids)
+        return results
+
+    def close(self):
+        self.queue.close()
+
+
+class Worker(LoggingClass):
+    """
+    Looks up the jobs of a `JobQueue`, with a `ShoppingBot` per batch by default.
+
+    Each batch holds up to `batch_size` items of one store. Results are reported
+    as soon as they are found, renewing the lease of the rest of the batch, and
+    items that raised or got no result are handed back to be retried.
+
+    Attributes:
+        queue (JobQueue): The queue shared with the coordinator.
+        name (str): Identifies the worker's leases, unique per process.
+        batch_size (int): Most items leased and searched at once.
+        lease (float): Seconds a batch stays leased without a result.
+        poll_interval (float): Seconds to wait when the queue is empty.
+    """
+
+    def __init__(
+        self,
+        queue,
+        search=None,
+        name=None,
+        batch_size=5,
+        lease=300.0,
+        poll_interval=1.0,
+        headless=True,
+        pool=None,
+        profiler=None,
+        catalog=None,
+        health=None,
+    ):
+        """
+        Args:
+            queue (JobQueue): The queue shared with the coordinator.
+            search (callable, optional): Takes the items, the store url and a
+                callback for each result, and returns a `ShoppingList` or None per
+                item. Defaults to searching with a `ShoppingBot`.
+            name (str, optional): Defaults to the host name and process id.
+            batch_size (int, optional): Most items leased and searched at once.
+            lease (float, optional): Seconds a batch stays leased without a result.
+            poll_interval (float, optional): Seconds to wait when the queue is
+                empty.
+            headless (bool, optional): Run the browsers without a window.
+            pool (WebDriverPool, optional): Browsers reused across batches.
+            profiler (RunProfiler, optional): Times each phase of the lookups.
+            catalog (ProductCatalog, optional): Products opened directly instead
+                of searching for them.
+            health (HealthMonitor, optional): Adapts the browser timeouts to each
+                store and skips stores whose selectors keep failing.
+        """
+        self.queue = queue
+        self.search = search or self._search_with_browser
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = max(1, int(batch_size))
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.headless = headless
+        self.pool = pool
+        self.profiler = profiler or RunProfiler(enabled=False)
+        self.catalog = catalog
+        self.health = health
+        self._stop = threading.Event()
+
+    def _search_with_browser(self, items, url, on_result=None):
+        from .shopping_list_bot import ShoppingBot
+
+        if self.health is not None and self.health.is_open(store_key(url)):
+            return [None] * len(items)
+        crawling_bot = ShoppingBot(
+            items,
+            url,
+            headless=self.headless,
+            pool=self.pool,
+            profiler=self.profiler,
+            on_result=on_result,
+            catalog=self.catalog,
+            health=self.health,
+        )
+        crawling_bot.search_items()
+        return crawling_bot.shopping_cart[store_key(url).title()]
+
+    def work_once(self):
+        """Leases a batch of jobs and looks them up.
+
+        Returns:
+            int: The number of jobs leased, 0 when the queue had nothing to do.
+        """
+        jobs = self.queue.lease(self.name, self.batch_size, self.lease)
+        if not jobs:
+            return 0
+        url = jobs[0].url
+        remaining = {job.job_id for job in jobs}
+        lock = threading.Lock()
+
+        def found(position, result):
+            if result is None:
+                return
+            with lock:
+                job_id = jobs[position].job_id
+                if job_id not in remaining:
+                    return
+                remaining.discard(job_id)
+                self.queue.complete(self.name, job_id, result)
+                self.queue.extend(self.name, remaining, self.lease)
+
+        self.logger.info(f"Searching {url} for {len(jobs)} item(s).")
+        results, error = [], "no result"
+        try:
+            results = self.search([job.item for job in jobs], url, on_result=found)
+        except (Exception, SystemExit) as exc:
+            # WebDriverSetup exits on page time-outs, which must not end the worker.
+            self.logger.error(f"Failed to search {url} due to {exc!r}.")
+            error = repr(exc)
+        finally:
+            for position, result in enumerate(results):
+                found(position, result)
+            # Hands back what was not found, also when the worker is interrupted.
+            for job_id in sorted(remaining):
+                self.queue.fail(self.name, job_id, error)
+        return len(jobs)
+
+    def run(self, idle_timeout=None):
+        """Works through the queue until `stop` is called.
+
+        Args:
+            idle_timeout (float, optional): Also stop after the queue had nothing
+                to do for this many seconds.
+
+        Returns:
+            int: The number of jobs leased.
+        """
+        leased = 0
+        idle_since = time.monotonic()
+        while not self._stop.is_set():
+            count = self.work_once()
+            leased += count
+            if count:
+                idle_since = time.monotonic()
+                continue
+            if (
+                idle_timeout is not None
+                and time.monotonic() - idle_since >= idle_timeout
+            ):
+                break
+            self._stop.wait(self.poll_interval)
+        self.logger.info(f"Worker {self.name} stopped after {leased} job(s).")
+        return leased
+
+    def stop(self):
+        """Makes `run` return once the current batch is done."""
+        self._stop.set()
+
+    def close(self):
+        """Quits the pooled browsers and closes the queue."""
+        if self.pool is not None:
+            self.pool.shutdown()
+        self.queue.close()
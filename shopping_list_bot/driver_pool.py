@@ -0,0 +1,187 @@
+import atexit
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from selenium.common.exceptions import WebDriverException
+
+from .common import TIMEOUT, LoggingClass
+from .shopping_list_bot import firefox_driver
+
+__all__ = ["WebDriverPool", "PoolClosedError"]
+
+
+class PoolClosedError(RuntimeError):
+    """Raised when leasing from a pool that has been shut down."""
+
+
+class WebDriverPool(LoggingClass):
+    """
+    A small pool of long-lived Firefox sessions that `ShoppingBot` instances lease
+    instead of launching a browser each.
+
+    Attributes:
+        size (int): Maximum number of browser sessions alive at once.
+        headless (bool): Start the browsers without a window.
+        max_uses (int): Leases after which a browser is quit and replaced.
+    """
+
+    def __init__(
+        self, size=2, headless=True, max_uses=50, factory=None, timeout=TIMEOUT
+    ):
+        """
+        Args:
+            size (int, optional): Maximum number of browser sessions alive at once.
+            headless (bool, optional): Start the browsers without a window.
+            max_uses (int, optional): Leases after which a browser is recycled.
+            factory (callable, optional): Returns a new driver, defaults to
+                `firefox_driver`.
+            timeout (int, optional): Seconds to wait for a browser to start.
+        """
+        assert size > 0 and max_uses > 0
+        self.size = size
+        self.headless = headless
+        self.max_uses = max_uses
+        self._factory = factory or (
+            lambda: firefox_driver(headless=self.headless, timeout=timeout)
+        )
+        self._idle = deque()
+        self._uses = {}
+        self._starting = 0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+        atexit.register(self.shutdown)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    @property
+    def alive(self):
+        """int: Number of browser sessions started or starting, idle or leased."""
+        return len(self._uses) + self._starting
+
+    def warm_up(self, count=None):
+        """Starts browsers ahead of time so the first leases do not wait on them.
+
+        Args:
+            count (int, optional): Number of idle browsers wanted, defaults to `size`.
+        """
+        count = min(count or self.size, self.size)
+        while True:
+            with self._lock:
+                if self._closed or len(self._idle) >= count or self.alive >= self.size:
+                    return
+                self._starting += 1
+            try:
+                driver = self._start()
+            finally:
+                with self._lock:
+                    self._starting -= 1
+            with self._lock:
+                self._uses[driver] = 0
+                self._idle.append(driver)
+
+    def acquire(self, timeout=None):
+        """Leases a healthy browser, blocking while all of them are in use.
+
+        Args:
+            timeout (float, optional): Seconds to wait for a free browser.
+
+        Returns:
+            WebDriver: The leased browser session.
+
+        Raises:
+            PoolClosedError: If the pool was shut down.
+            TimeoutError: If no browser was freed within `timeout`.
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No browser became available within {timeout}s.")
+        try:
+            while True:
+                with self._lock:
+                    if self._closed:
+                        raise PoolClosedError("The WebDriver pool has been shut down.")
+                    driver = self._idle.pop() if self._idle else None
+                if driver is None:
+                    driver = self._start()
+                    with self._lock:
+                        self._uses[driver] = 0
+                    return driver
+                if self.is_healthy(driver):
+                    return driver
+                self.logger.warning("Discarding unresponsive browser session.")
+                self._quit(driver)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, driver, discard=False):
+        """Hands a leased browser back, recycling it once it reached `max_uses`.
+
+        Args:
+            driver (WebDriver): A browser obtained from `acquire`.
+            discard (bool, optional): Quit the browser instead of keeping it.
+        """
+        with self._lock:
+            uses = self._uses.get(driver, 0) + 1
+            recycle = (
+                discard
+                or self._closed
+                or uses >= self.max_uses
+                or self.alive > self.size
+            )
+            if not recycle:
+                self._uses[driver] = uses
+                self._idle.append(driver)
+        if recycle:
+            self.logger.debug(f"Recycling browser session after {uses} lease(s).")
+            self._quit(driver)
+        self._slots.release()
+
+    @contextmanager
+    def lease(self, timeout=None):
+        """Context manager around `acquire`/`release`, discarding broken browsers."""
+        driver = self.acquire(timeout=timeout)
+        try:
+            yield driver
+        except WebDriverException:
+            self.release(driver, discard=True)
+            raise
+        except BaseException:
+            self.release(driver)
+            raise
+        else:
+            self.release(driver)
+
+    @staticmethod
+    def is_healthy(driver):
+        """Checks that the browser session still responds to commands."""
+        try:
+            driver.current_url
+        except Exception:
+            return False
+        return True
+
+    def shutdown(self):
+        """Quits every idle browser, leased ones are quit when released."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+        for driver in idle:
+            self._quit(driver)
+
+    def _start(self):
+        self.logger.info("Starting a new pooled browser session.")
+        return self._factory()
+
+    def _quit(self, driver):
+        with self._lock:
+            self._uses.pop(driver, None)
+        try:
+            driver.quit()
+        except Exception:
+            self.logger.debug("Browser session was already gone.")
@@ -0,0 +1,234 @@
+import json
+import pathlib
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+from .common import LoggingClass
+from .profiler import percentile
+
+__all__ = ["HealthMonitor"]
+
+DEFAULT_HEALTH_PATH = (
+    pathlib.Path.home() / ".cache" / "shopping_list_bot" / "health.json"
+)
+
+# Waits for elements found by a store specific selector, a time-out there usually
+# means the store's layout changed rather than that it is slow.
+SELECTOR_WAITS = ("search_input", "first_result", "price")
+
+
+class HealthMonitor(LoggingClass):
+    """
+    Tracks how each store's waits behave, to shorten time-outs to what the store
+    normally needs and to stop searching a store whose selectors keep failing.
+
+    Every wait's timeout becomes `headroom` times its recent p95 plus `slack`
+    seconds, bounded by `min_timeout` and the store's configured timeout, once
+    `min_samples` successful waits were seen. A wait that times out with a
+    shortened timeout gets the configured timeout back until it succeeds again,
+    so a store going through a slow spell is not mistaken for a broken one.
+    After `failure_threshold` consecutive time-outs of selector waits given their
+    full timeout the store's circuit opens and its remaining items are skipped,
+    for the rest of the run or until `cooldown` seconds have passed, after which
+    a single item is tried again.
+
+    Attributes:
+        failure_threshold (int): Consecutive selector failures that open a
+            store's circuit.
+        cooldown (float): Seconds before an open circuit lets an item through
+            again, None keeps it open.
+        min_samples (int): Successful waits needed before adapting a timeout.
+        headroom (float): Multiple of the p95 latency waited for.
+        slack (float): Seconds added to every adapted timeout.
+        min_timeout (float): Shortest adapted timeout.
+    """
+
+    def __init__(
+        self,
+        failure_threshold=3,
+        cooldown=None,
+        window=50,
+        min_samples=5,
+        headroom=3.0,
+        slack=1.0,
+        min_timeout=2.0,
+        clock=time.monotonic,
+    ):
+        """
+        Args:
+            failure_threshold (int, optional): Consecutive selector failures that
+                open a store's circuit.
+            cooldown (float, optional): Seconds before an open circuit lets an
+                item through again.
+            window (int, optional): Latest latencies kept per store and wait.
+            min_samples (int, optional): Successful waits needed before adapting
+                a timeout.
+            headroom (float, optional): Multiple of the p95 latency waited for.
+            slack (float, optional): Seconds added to every adapted timeout.
+            min_timeout (float, optional): Shortest adapted timeout.
+            clock (callable, optional): Returns the current time in seconds.
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.min_samples = min_samples
+        self.headroom = headroom
+        self.slack = slack
+        self.min_timeout = min_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+        self._timeouts = Counter()
+        # Waits last given a shortened timeout, and those widened again after
+        # timing out with one.
+        self._shortened = set()
+        self._widened = set()
+        self._failures = Counter()
+        self._failed_wait = {}
+        self._opened_at = {}
+
+    @classmethod
+    def load(cls, path=DEFAULT_HEALTH_PATH, **kwargs):
+        """Creates a monitor that starts from the latencies saved by `save`.
+
+        Args:
+            path (str, optional): The JSON file, missing files are ignored.
+            **kwargs: Any of the `HealthMonitor` arguments.
+
+        Returns:
+            HealthMonitor: The monitor.
+        """
+        monitor = cls(**kwargs)
+        path = pathlib.Path(path)
+        if path.is_file():
+            for store, waits in json.loads(path.read_text()).items():
+                for name, latencies in waits.items():
+                    monitor._latencies[(store, name)].extend(latencies)
+        return monitor
+
+    def save(self, path=DEFAULT_HEALTH_PATH):
+        """Saves the latest latencies, so the next run starts with adapted
+        timeouts."""
+        with self._lock:
+            waits = defaultdict(dict)
+            for (store, name), latencies in sorted(self._latencies.items()):
+                waits[store][name] = [round(seconds, 3) for seconds in latencies]
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(waits, indent=2, sort_keys=True))
+
+    def timeout(self, store, name, default):
+        """Returns the seconds to wait for `name` at `store`.
+
+        Args:
+            store (str): Store key in `IDS`.
+            name (str): The wait, e.g. "first_result".
+            default (float): The configured timeout, never exceeded.
+        """
+        key = (store, name)
+        with self._lock:
+            latencies = sorted(self._latencies.get(key, ()))
+            timeout = default
+            if len(latencies) >= self.min_samples and key not in self._widened:
+                adapted = self.headroom * percentile(latencies, 0.95) + self.slack
+                timeout = min(default, max(self.min_timeout, adapted))
+            if timeout < default:
+                self._shortened.add(key)
+            else:
+                self._shortened.discard(key)
+        return timeout
+
+    def record_wait(self, store, name, seconds, timed_out=False):
+        """Records how a wait went.
+
+        Args:
+            store (str): Store key in `IDS`.
+            name (str): The wait, e.g. "first_result".
+            seconds (float): How long the wait took.
+            timed_out (bool, optional): The condition was never met.
+        """
+        key = (store, name)
+        opened = False
+        with self._lock:
+            if not timed_out:
+                self._latencies[key].append(seconds)
+                self._widened.discard(key)
+            else:
+                self._timeouts[key] += 1
+                if key in self._shortened:
+                    # Retried with the full timeout before it counts as a failure.
+                    self._shortened.discard(key)
+                    self._widened.add(key)
+                    return
+            if name not in SELECTOR_WAITS:
+                return
+            if not timed_out:
+                self._failures[store] = 0
+                self._opened_at.pop(store, None)
+                return
+            self._failures[store] += 1
+            if self._failures[store] >= self.failure_threshold:
+                opened = store not in self._opened_at
+                if opened:
+                    self._failed_wait[store] = name
+                self._opened_at[store] = self._clock()
+        if opened:
+            self.logger.error(
+                f"Stopped searching {store} after {self.failure_threshold} "
+                f"consecutive {name} time-outs, its layout may have changed."
+            )
+
+    def is_open(self, store):
+        """Whether `store` failed too often to keep searching it."""
+        with self._lock:
+            opened_at = self._opened_at.get(store)
+        if opened_at is None:
+            return False
+        return self.cooldown is None or self._clock() - opened_at < self.cooldown
+
+    def open_circuits(self):
+        """Returns the stores that are not searched, each mapped to the wait whose
+        time-out opened the circuit."""
+        with self._lock:
+            stores = list(self._opened_at)
+            failed_waits = dict(self._failed_wait)
+        return {store: failed_waits[store] for store in stores if self.is_open(store)}
+
+    def report(self):
+        """Summarises every store's waits.
+
+        Returns:
+            list: One dict per store and wait with the number of successful waits,
+                time-outs, p95 latency in seconds and whether the store's circuit
+                is open.
+        """
+        with self._lock:
+            keys = sorted(set(self._latencies) | set(self._timeouts))
+            rows = [
+                (store, name, sorted(self._latencies.get((store, name), ())))
+                for store, name in keys
+            ]
+            timeouts = Counter(self._timeouts)
+        return [
+            {
+                "store": store,
+                "wait": name,
+                "count": len(latencies),
+                "timeouts": timeouts[(store, name)],
+                "p95": percentile(latencies, 0.95),
+                "open": self.is_open(store),
+            }
+            for store, name, latencies in rows
+        ]
+
+    def format_report(self):
+        """Returns the report as a text table."""
+        lines = [f"{'store':<12}{'wait':<16}{'count':>7}{'timeouts':>10}{'p95':>9}"]
+        for row in self.report():
+            p95 = "-" if row["p95"] is None else f"{row['p95']:.2f}s"
+            state = "  circuit open" if row["open"] else ""
+            lines.append(
+                f"{row['store']:<12}{row['wait']:<16}{row['count']:>7}"
+                f"{row['timeouts']:>10}{p95:>9}{state}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,330 @@
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote_plus, urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .common import IDS, LoggingClass, ShoppingList
+from .profiler import RunProfiler
+from .results import ResultsExtractor, element_text, make_soup
+from .stores import get_adapter, store_key
+
+__all__ = ["HttpFetcher", "NeedsBrowser"]
+
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Linux x86_64; rv:68.0) Gecko/20100101 Firefox/68.0"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-ZA,en;q=0.5",
+}
+
+
+class NeedsBrowser(Exception):
+    """Raised when a page cannot be scraped without running its JavaScript."""
+
+
+class HttpFetcher(LoggingClass):
+    """
+    Scrapes store search results and product pages over plain HTTP, sharing one
+    pooled keep-alive session between all stores.
+
+    Stores that render their pages with JavaScript, or whose pages could not be
+    parsed, are left for a `ShoppingBot` browser session.
+
+    Attributes:
+        ids (dict): Per store selectors, see `IDS`.
+        session (requests.Session): The pooled HTTP session.
+        timeout (float): Seconds to wait for each request.
+        workers (int): Number of concurrent requests per store.
+        pool_size (int): Connections kept open per host, None for a session
+            passed in.
+        profiler (RunProfiler): Times the requests and parsing.
+        catalog (ProductCatalog): Known products, opened without searching, or
+            None.
+    """
+
+    def __init__(
+        self,
+        ids=IDS,
+        workers=8,
+        timeout=15,
+        session=None,
+        profiler=None,
+        catalog=None,
+    ):
+        """
+        Args:
+            ids (dict, optional): Per store selectors, see `IDS`.
+            workers (int, optional): Number of concurrent requests per store.
+            timeout (float, optional): Seconds to wait for each request.
+            session (requests.Session, optional): Session to use instead of a new
+                one.
+            profiler (RunProfiler, optional): Times the requests and parsing.
+            catalog (ProductCatalog, optional): Known products, opened without
+                searching.
+        """
+        self.ids = ids
+        self.profiler = profiler or RunProfiler(enabled=False)
+        self.catalog = catalog
+        self.extractor = ResultsExtractor(ids)
+        self.workers = workers
+        self.timeout = timeout
+        self.pool_size = None
+        self.session = session or self._new_session(workers)
+
+    def _new_session(self, workers):
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        self._mount(session, workers)
+        return session
+
+    def _mount(self, session, pool_size):
+        adapter = HTTPAdapter(
+            pool_connections=len(self.ids),
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=2, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504)
+            ),
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        self.pool_size = pool_size
+
+    def reserve_connections(self, threads):
+        """Keeps enough connections open per store for `threads` threads sharing
+        the session, instead of discarding those over `workers` after each
+        request. Sessions passed in are left as they were configured.
+
+        Args:
+            threads (int): Threads making requests at once.
+        """
+        if self.pool_size is not None and threads > self.pool_size:
+            self._mount(self.session, threads)
+
+    def close(self):
+        """Closes the pooled connections."""
+        self.session.close()
+
+    def can_fetch(self, url):
+        """Whether the store at `url` can be scraped without a browser.
+
+        Args:
+            url (str): Store url, one of `URLS`.
+        """
+        store_ids = self.ids.get(store_key(url), {})
+        return bool(
+            store_ids.get("search_url")
+            and store_ids.get("result_link_css")
+            and not store_ids.get("requires_js")
+        )
+
+    def search_items(self, items, url, on_result=None):
+        """Searches a store for all items, a few requests at a time.
+
+        Args:
+            items (list): Items to search for.
+            url (str): Store url, one of `URLS`.
+            on_result (callable, optional): Called from the worker threads with the
+                index of the item and its `ShoppingList` as soon as one is found.
+
+        Returns:
+            list: A `ShoppingList` per item, in the order of `items`. Items that
+                need a browser are None.
+        """
+        if not self.can_fetch(url):
+            return [None] * len(items)
+
+        def search(count, item):
+            try:
+                result = self.search_item(item, url)
+            except NeedsBrowser as error:
+                self.logger.info(f"Escalating {item} on {url} to a browser: {error}")
+            except requests.RequestException as error:
+                self.logger.warning(f"Failed to fetch {item} from {url}: {error}")
+            else:
+                if on_result is not None and result is not None:
+                    on_result(count, result)
+                return result
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(search, range(len(items)), items))
+
+    def get_prices(self, product_urls, store):
+        """Re-reads the price of known products, a few requests at a time.
+
+        Args:
+            product_urls (list): Product pages on `store`.
+            store (str): Store key in `IDS`.
+
+        Returns:
+            list: The price of each product, None where a browser is needed.
+        """
+
+        def get_price(product_url):
+            try:
+                return self.get_product(product_url, store).item_price
+            except NeedsBrowser as error:
+                self.logger.info(f"Escalating {product_url} to a browser: {error}")
+            except requests.RequestException as error:
+                self.logger.warning(f"Failed to fetch {product_url}: {error}")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(get_price, product_urls))
+
+    def search_item(self, item, url):
+        """Finds the search result that best matches `item`.
+
+        Products the `catalog` knows are read off their page without searching.
+        Otherwise the name and price are read off the results page when the store
+        shows them there, and off the product page if not. When the results page
+        only shows products unrelated to the item, it was not found.
+
+        Args:
+            item (str): Item to search for.
+            url (str): Store url, one of `URLS`.
+
+        Returns:
+            ShoppingList: The product's name, price and url, all None when the item
+                was not found.
+
+        Raises:
+            NeedsBrowser: If the results or product page could not be parsed.
+            requests.RequestException: If a page could not be fetched.
+        """
+        store = store_key(url)
+        known = self._known_product(item, store)
+        if known is not None:
+            return known
+        response = self._search(item, store)
+        tiles = self._tiles(item, store, response)
+        best = next(iter(self.extractor.rank(item, tiles, top_n=1)), None)
+        if best is None and any(tile.item_name for tile in tiles):
+            self.logger.info(f"No search result on {url} matches {item}.")
+            return ShoppingList(item_name=None, item_price=None, item_url=None)
+        if best is not None and best.item_price is not None:
+            return best
+        if best is not None and best.item_url:
+            product_url = best.item_url
+        else:
+            product_url = self._first_result(item, store, response)
+        return self.get_product(product_url, store, item)
+
+    def _known_product(self, item, store):
+        match = self.catalog.lookup(store, item) if self.catalog is not None else None
+        if match is None:
+            return None
+        try:
+            return self.get_product(match.item_url, store, item)
+        except (NeedsBrowser, requests.RequestException) as error:
+            self.logger.info(
+                f"Searching for {item} again, {match.item_url} failed: {error}"
+            )
+
+    def search_candidates(self, item, url, top_n=5):
+        """Lists the closest matches for `item` using the results page alone, to
+        compare variants without loading each product page.
+
+        Args:
+            item (str): Item to search for.
+            url (str): Store url, one of `URLS`.
+            top_n (int, optional): Maximum number of candidates.
+
+        Returns:
+            list: `ShoppingList` results from the best match down, their price is
+                None where the results page shows none.
+
+        Raises:
+            requests.RequestException: If the page could not be fetched.
+        """
+        store = store_key(url)
+        return self._candidates(item, store, self._search(item, store), top_n=top_n)
+
+    def _search(self, item, store):
+        search_url = self.ids[store]["search_url"].format(query=quote_plus(item))
+        self.logger.debug(f"Searching for {item} on {search_url}.")
+        with self.profiler.phase("http_search", store, item):
+            return self._get(search_url)
+
+    def _candidates(self, item, store, response, top_n=None):
+        return self.extractor.rank(
+            item, self._tiles(item, store, response), top_n=top_n
+        )
+
+    def _tiles(self, item, store, response):
+        if not self.extractor.has_tiles(store):
+            return []
+        with self.profiler.phase("parse_results", store, item):
+            return self.extractor.extract(response.text, store, response.url)
+
+    def _first_result(self, item, store, response):
+        soup = make_soup(response.text)
+        try:
+            first_result = soup.select_one(self.ids[store]["result_link_css"])
+            if first_result is None or not first_result.get("href"):
+                raise NeedsBrowser(f"no search result matched for {item}")
+            return urljoin(response.url, first_result["href"])
+        finally:
+            soup.decompose()
+
+    def get_product(self, product_url, store, item=None):
+        """Reads the name and price off a product page.
+
+        Args:
+            product_url (str): The product page.
+            store (str): Store key in `IDS`.
+            item (str, optional): The item searched for, used in log messages.
+
+        Returns:
+            ShoppingList: The product's name, price and url.
+
+        Raises:
+            NeedsBrowser: If the name or price could not be found.
+            requests.RequestException: If the page could not be fetched.
+        """
+        with self.profiler.phase("http_product", store, item):
+            response = self._get(product_url)
+        soup = make_soup(response.text)
+        try:
+            name = self._product_name(soup, store)
+            price_text = self._price_text(soup, store)
+        finally:
+            soup.decompose()
+
+        if not name or name.lower() in response.url:
+            raise NeedsBrowser(f"no product name found for {item} on {product_url}")
+        if not price_text:
+            raise NeedsBrowser(f"no price found for {item} on {product_url}")
+        try:
+            with self.profiler.phase("parse_price", store, item):
+                price = get_adapter(store).parse_price(price_text)
+        except ValueError:
+            raise NeedsBrowser(f"unexpected price {price_text!r} on {product_url}")
+        return ShoppingList(
+            item_name=name.title(), item_price=price, item_url=response.url
+        )
+
+    def _get(self, url):
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    def _product_name(self, soup, store):
+        if soup.title and soup.title.string:
+            name = soup.title.string.split("|")[0].strip()
+            if name:
+                return name
+        # Class names may hold several space separated classes, as with woolworths.
+        element = soup.select_one(
+            "." + ".".join(self.ids[store]["product_name"].split())
+        )
+        return element_text(element).split("\n")[0] if element else None
+
+    def _price_text(self, soup, store):
+        for key in ("price_promotion", "price_product"):
+            element = soup.find(class_=self.ids[store][key])
+            if element is not None:
+                text = element_text(element)
+                if text:
+                    return text
@@ -0,0 +1,184 @@
+import hashlib
+import pathlib
+import sqlite3
+import threading
+import time
+
+from .common import LoggingClass, ShoppingList
+from .price_cache import normalize_query
+
+__all__ = ["RunJournal"]
+
+DEFAULT_JOURNAL_PATH = (
+    pathlib.Path.home() / ".cache" / "shopping_list_bot" / "journal.db"
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    items_key TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS lookups (
+    run_id INTEGER NOT NULL,
+    store TEXT NOT NULL,
+    query TEXT NOT NULL,
+    item_name TEXT,
+    item_price,
+    item_url TEXT,
+    done_at REAL NOT NULL,
+    PRIMARY KEY (run_id, store, query)
+);
+"""
+
+
+def items_key(items):
+    """Returns a key identifying a shopping list, to only resume runs for the same
+    items."""
+    queries = "\n".join(normalize_query(item) for item in items)
+    return hashlib.sha1(queries.encode("utf-8")).hexdigest()
+
+
+class RunJournal(LoggingClass):
+    """
+    A local SQLite checkpoint of the (store, item) lookups completed during a run,
+    so a run that died half-way can be resumed without crawling them again.
+
+    Unlike `PriceCache`, products that were searched for but not found are
+    journaled too, and only the lookups of the current run are kept.
+
+    Attributes:
+        path (pathlib.Path): The SQLite database.
+        resume (bool): Whether `begin` continues the last unfinished run for the
+            same items instead of starting over.
+        run_id (int): The current run, None before `begin`.
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH, resume=False, clock=time.time):
+        """
+        Args:
+            path (str, optional): The SQLite database, created when missing.
+            resume (bool, optional): Continue the last unfinished run.
+            clock (callable, optional): Returns the current time in seconds.
+        """
+        self.path = pathlib.Path(path)
+        self.resume = resume
+        self.run_id = None
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._closed = False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def begin(self, items):
+        """Starts a run for the items, or resumes the last unfinished one.
+
+        Lookups of every other run are dropped.
+
+        Args:
+            items (list): The items on the shopping list.
+
+        Returns:
+            int: The run's id.
+        """
+        key = items_key(items)
+        with self._lock, self._db:
+            row = None
+            if self.resume:
+                row = self._db.execute(
+                    "SELECT run_id FROM runs WHERE items_key = ? AND finished_at IS "
+                    "NULL ORDER BY run_id DESC LIMIT 1",
+                    (key,),
+                ).fetchone()
+            if row is None:
+                cursor = self._db.execute(
+                    "INSERT INTO runs (items_key, started_at) VALUES (?, ?)",
+                    (key, self._clock()),
+                )
+                self.run_id = cursor.lastrowid
+            else:
+                (self.run_id,) = row
+            self._db.execute("DELETE FROM runs WHERE run_id != ?", (self.run_id,))
+            self._db.execute("DELETE FROM lookups WHERE run_id != ?", (self.run_id,))
+            (done,) = self._db.execute(
+                "SELECT COUNT(*) FROM lookups WHERE run_id = ?", (self.run_id,)
+            ).fetchone()
+        if row is not None:
+            self.logger.info(f"Resuming run {self.run_id}, {done} lookup(s) done.")
+        return self.run_id
+
+    def get_many(self, store, items):
+        """Returns the lookups of the current run already done at `store`.
+
+        Args:
+            store (str): Store name, e.g. "Makro".
+            items (list): The items searched for.
+
+        Returns:
+            list: A `ShoppingList` per item that was looked up, with no name where
+                the product was not found, and None for the items still to do.
+        """
+        queries = [normalize_query(item) for item in items]
+        done = {}
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT query, item_name, item_price, item_url FROM lookups "
+                "WHERE run_id = ? AND store = ?",
+                (self.run_id, store.lower()),
+            )
+            for query, name, price, url in rows:
+                done[query] = ShoppingList(name, price, url)
+        return [done.get(query) for query in queries]
+
+    def put(self, store, item, result):
+        """Checkpoints a completed lookup, None results are skipped."""
+        self.put_many(store, [item], [result])
+
+    def put_many(self, store, items, results):
+        """Checkpoints many completed lookups at once.
+
+        Args:
+            store (str): Store name, e.g. "Makro".
+            items (list): The items searched for.
+            results (list): A `ShoppingList` or None per item.
+        """
+        now = self._clock()
+        rows = [
+            (
+                self.run_id,
+                store.lower(),
+                normalize_query(item),
+                result.item_name,
+                result.item_price,
+                result.item_url,
+                now,
+            )
+            for item, result in zip(items, results)
+            if result is not None
+        ]
+        if not rows:
+            return
+        with self._lock:
+            if self._closed:
+                # A store given up on may still report a lookup.
+                return
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO lookups VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    def finish(self):
+        """Marks the current run as complete, it is not resumed afterwards."""
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE runs SET finished_at = ? WHERE run_id = ?",
+                (self._clock(), self.run_id),
+            )
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._db.close()
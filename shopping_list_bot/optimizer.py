@@ -0,0 +1,338 @@
+import itertools
+from collections import namedtuple
+
+from .common import to_cents
+
+__all__ = ["PriceMatrix", "Split", "format_cents"]
+
+Split = namedtuple(
+    "Split", ["stores", "total_cents", "delivery_cents", "missing", "assignment"]
+)
+Split.__doc__ = """A way to buy the list at a set of stores.
+
+Attributes:
+    stores (tuple): Names of the stores bought from.
+    total_cents (int): Price of the items found plus the delivery fees, in cents.
+    delivery_cents (int): Delivery fees of the stores, in cents.
+    missing (int): Number of items none of the stores sell.
+    assignment (list): Per item, the store to buy it at, or None when missing.
+"""
+
+# Broadcast (subset, item, store) elements evaluated at once, bounds the memory of
+# `best_splits` to a few tens of MB whatever the size of the list.
+MAX_ELEMENTS = 4_000_000
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as error:
+        raise ImportError(
+            "The basket optimizer needs numpy, run `pip install numpy`."
+        ) from error
+    return numpy
+
+
+def format_cents(cents):
+    """Formats cents as Rand with two decimals, e.g. "49.99"."""
+    return "%d.%02d" % divmod(int(cents), 100)
+
+
+class PriceMatrix:
+    """
+    The prices of a shopping list as an items x stores matrix of cents, for
+    comparing whole baskets across stores.
+
+    Items a store does not sell, or whose price is unknown, are masked out: they
+    count as missing at that store instead of costing nothing. Needs the optional
+    `numpy` package (`pip install numpy`).
+
+    Attributes:
+        items (list): The items, one per row.
+        stores (list): The store names, one per column.
+        cents (numpy.ndarray): int64 prices in cents, 0 where unavailable.
+        available (numpy.ndarray): Whether each store sells each item.
+    """
+
+    def __init__(self, items, stores, cents, available):
+        """
+        Args:
+            items (list): The items, one per row.
+            stores (list): The store names, one per column.
+            cents (array-like): Prices in cents, items x stores.
+            available (array-like): Whether each price is known, items x stores.
+
+        Raises:
+            ImportError: If numpy is not installed.
+            ValueError: If the shapes do not match the items and stores.
+        """
+        np = _numpy()
+        self._np = np
+        self.items = list(items)
+        self.stores = list(stores)
+        self.available = np.asarray(available, dtype=bool).reshape(
+            len(self.items), len(self.stores)
+        )
+        cents = np.asarray(cents, dtype=np.int64)
+        if cents.shape != self.available.shape:
+            raise ValueError(
+                f"Expected {self.available.shape} prices, got {cents.shape}."
+            )
+        self.cents = np.where(self.available, cents, 0)
+        # Unavailable prices are larger than any basket so they are never picked.
+        self._unavailable = np.iinfo(np.int64).max // 2
+        self._masked = np.where(self.available, cents, self._unavailable)
+        self._subsets = {}
+
+    @classmethod
+    def from_carts(cls, items, shopping_carts):
+        """Builds the matrix from the carts `PriceUpdater.get_shopping_cart` returns.
+
+        Args:
+            items (list): The items searched for.
+            shopping_carts (dict): Store name mapped to its list of `ShoppingList`
+                results, in item order.
+
+        Returns:
+            PriceMatrix: The prices.
+        """
+        stores = list(shopping_carts)
+        cents = [[0] * len(stores) for _ in items]
+        available = [[False] * len(stores) for _ in items]
+        for col, shopping_cart in enumerate(shopping_carts.values()):
+            for row, result in enumerate(shopping_cart[: len(items)]):
+                if result is not None and result.price_cents is not None:
+                    cents[row][col] = result.price_cents
+                    available[row][col] = True
+        return cls(items, stores, cents, available)
+
+    @classmethod
+    def from_prices(cls, items, prices):
+        """Builds the matrix from price text, e.g. as read from the spreadsheet.
+
+        Args:
+            items (list): The items.
+            prices (dict): Store name mapped to the price of each item in Rand,
+                empty or unparseable where unknown.
+
+        Returns:
+            PriceMatrix: The prices.
+        """
+        stores = list(prices)
+        cents = [[0] * len(stores) for _ in items]
+        available = [[False] * len(stores) for _ in items]
+        for col, store_prices in enumerate(prices.values()):
+            for row, price in enumerate(store_prices[: len(items)]):
+                try:
+                    price_cents = to_cents(price)
+                except ValueError:
+                    price_cents = None
+                if price_cents is not None:
+                    cents[row][col] = price_cents
+                    available[row][col] = True
+        return cls(items, stores, cents, available)
+
+    @property
+    def prices(self):
+        """numpy.ma.MaskedArray: The prices in cents, unavailable ones masked."""
+        return self._np.ma.masked_array(self.cents, mask=~self.available)
+
+    def fees(self, delivery_fees=None):
+        """Returns the delivery fee of each store in cents, 0 when not given.
+
+        Args:
+            delivery_fees (dict, optional): Store name mapped to its fee in cents,
+                matched ignoring case.
+        """
+        delivery_fees = {
+            store.lower(): cents for store, cents in (delivery_fees or {}).items()
+        }
+        return self._np.array(
+            [delivery_fees.get(store.lower(), 0) for store in self.stores],
+            dtype=self._np.int64,
+        )
+
+    def store_baskets(self, delivery_fees=None):
+        """Prices the whole list at each store on its own.
+
+        Args:
+            delivery_fees (dict, optional): Store name mapped to its fee in cents.
+
+        Returns:
+            list: A `Split` per store, those missing the fewest items and then the
+                cheapest first.
+        """
+        np = self._np
+        fees = self.fees(delivery_fees)
+        totals = self.cents.sum(axis=0) + fees
+        missing = (~self.available).sum(axis=0)
+        order = np.lexsort((totals, missing))
+        return [
+            Split(
+                (self.stores[col],),
+                int(totals[col]),
+                int(fees[col]),
+                int(missing[col]),
+                [self.stores[col] if sold else None for sold in self.available[:, col]],
+            )
+            for col in order
+        ]
+
+    def best_splits(self, max_stores=2, delivery_fees=None, stores=None, top_n=1):
+        """Finds the cheapest ways to buy the list at no more than `max_stores`.
+
+        Every combination of up to `max_stores` stores is priced at once, with
+        each item bought at the cheapest store of the combination that sells it.
+        Combinations are ranked by the items they miss, then by the total with
+        their delivery fees, then by the number of stores.
+
+        Args:
+            max_stores (int, optional): Most stores to buy from.
+            delivery_fees (dict, optional): Store name mapped to its fee in cents,
+                charged once per store bought from.
+            stores (list, optional): Only consider these stores, e.g. to see what
+                leaving one out would cost.
+            top_n (int, optional): Number of splits to return.
+
+        Returns:
+            list: Up to `top_n` `Split`s, the best first.
+
+        Raises:
+            ValueError: If `max_stores` is less than 1 or a store is unknown.
+        """
+        np = self._np
+        if max_stores < 1:
+            raise ValueError(f"max_stores must be at least 1, got {max_stores}.")
+        columns = self._columns(stores)
+        subsets = self._combinations(columns, min(max_stores, len(columns)))
+        if not len(subsets):
+            return []
+        fees = self.fees(delivery_fees)
+
+        masked, unavailable = self._masked, self._unavailable
+        totals, missing = [], []
+        step = max(1, MAX_ELEMENTS // max(1, masked.size))
+        for start in range(0, len(subsets), step):
+            chunk = subsets[start : start + step]
+            cheapest = np.where(chunk[:, None, :], masked[None, :, :], unavailable)
+            cheapest = cheapest.min(axis=2)
+            found = cheapest != unavailable
+            totals.append(np.where(found, cheapest, 0).sum(axis=1))
+            missing.append((~found).sum(axis=1))
+        delivery = subsets.astype(np.int64) @ fees
+        totals = np.concatenate(totals) + delivery
+        missing = np.concatenate(missing)
+        order = np.lexsort((subsets.sum(axis=1), totals, missing))[:top_n]
+        return [
+            self._split(subsets[index], int(totals[index]), int(delivery[index]))
+            for index in order
+        ]
+
+    def best_split(self, max_stores=2, delivery_fees=None, stores=None):
+        """Returns the cheapest `Split` over at most `max_stores`, see
+        `best_splits`, or None when there are no stores."""
+        splits = self.best_splits(max_stores, delivery_fees, stores)
+        return splits[0] if splits else None
+
+    def _columns(self, stores):
+        if stores is None:
+            return list(range(len(self.stores)))
+        lower = [store.lower() for store in self.stores]
+        columns = []
+        for store in stores:
+            if store.lower() not in lower:
+                raise ValueError(f"Unknown store {store}.")
+            columns.append(lower.index(store.lower()))
+        return sorted(set(columns))
+
+    def _combinations(self, columns, max_stores):
+        """Returns every non-empty combination of up to `max_stores` of the columns
+        as a boolean subsets x stores matrix, cached for repeated queries."""
+        key = (tuple(columns), max_stores)
+        if key not in self._subsets:
+            np = self._np
+            combinations = [
+                combination
+                for size in range(1, max_stores + 1)
+                for combination in itertools.combinations(columns, size)
+            ]
+            subsets = np.zeros((len(combinations), len(self.stores)), dtype=bool)
+            for row, combination in enumerate(combinations):
+                subsets[row, list(combination)] = True
+            self._subsets[key] = subsets
+        return self._subsets[key]
+
+    def _split(self, subset, total_cents, delivery_cents):
+        np = self._np
+        columns = np.flatnonzero(subset)
+        available = self.available[:, columns]
+        picked = columns[self._masked[:, columns].argmin(axis=1)]
+        found = available.any(axis=1)
+        return Split(
+            tuple(self.stores[col] for col in columns),
+            total_cents,
+            delivery_cents,
+            int((~found).sum()),
+            [
+                self.stores[col] if sold else None
+                for col, sold in zip(picked.tolist(), found.tolist())
+            ],
+        )
+
+    def report_rows(self, split, delivery_fees=None):
+        """Lays out the store baskets and a split as rows of a results tab.
+
+        Args:
+            split (Split): The split to detail item by item.
+            delivery_fees (dict, optional): Store name mapped to its fee in cents.
+
+        Returns:
+            list: Rows of cell values.
+        """
+        rows = [
+            ["Store", "Total", "Delivery", "Missing items"],
+        ]
+        for basket in self.store_baskets(delivery_fees):
+            rows.append(
+                [
+                    basket.stores[0],
+                    format_cents(basket.total_cents),
+                    format_cents(basket.delivery_cents),
+                    basket.missing,
+                ]
+            )
+        rows.append([])
+        rows.append(
+            [
+                "Best split",
+                format_cents(split.total_cents),
+                format_cents(split.delivery_cents),
+                split.missing,
+            ]
+        )
+        rows.append(["Item", "Store", "Price"])
+        columns = {store: col for col, store in enumerate(self.stores)}
+        for row, (item, store) in enumerate(zip(self.items, split.assignment)):
+            if store is None:
+                rows.append([item, "", ""])
+            else:
+                rows.append(
+                    [item, store, format_cents(self.cents[row, columns[store]])]
+                )
+        return rows
+
+    def format_report(self, split, delivery_fees=None):
+        """Returns the store baskets and the split as a text summary."""
+        lines = [f"{'store':<14}{'total':>12}{'delivery':>10}{'missing':>9}"]
+        for basket in self.store_baskets(delivery_fees):
+            lines.append(
+                f"{basket.stores[0]:<14}{format_cents(basket.total_cents):>12}"
+                f"{format_cents(basket.delivery_cents):>10}{basket.missing:>9}"
+            )
+        lines.append(
+            f"Best split over {', '.join(split.stores)}: "
+            f"{format_cents(split.total_cents)} including "
+            f"{format_cents(split.delivery_cents)} delivery, "
+            f"{split.missing} item(s) missing."
+        )
+        return "\n".join(lines)
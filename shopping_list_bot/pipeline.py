@@ -0,0 +1,224 @@
+import queue
+import threading
+import time
+
+from .common import LoggingClass
+from .profiler import RunProfiler
+from .sinks import CELLS_PER_RESULT, GoogleSheetSink, result_cells
+
+__all__ = ["ResultPipeline", "SheetPipeline", "result_cells"]
+
+# Put on the queue by `close` to stop the writer thread.
+_DONE = object()
+
+
+class ResultPipeline(LoggingClass):
+    """
+    Writes results to a `ResultSink` while the stores are still being crawled.
+
+    Crawlers `put` each result on a bounded queue, blocking while the writer is
+    behind, and a writer thread hands them to the sink in micro-batches of up to
+    `batch_size` results, or sooner once `flush_interval` seconds have passed
+    since the last flush. Whatever was queued before `close` is written, also when
+    the crawl failed half-way.
+
+    Attributes:
+        sink (ResultSink): Where the results are written.
+        items (list): The items of the run, handed to the sink when it is opened.
+        batch_size (int): Number of results collected before they are written.
+        flush_interval (float): Seconds after which collected results are written,
+            even if there are fewer than `batch_size`.
+        results (int): Number of results written so far.
+        calls (int): Number of writes, or API calls, made so far.
+    """
+
+    def __init__(
+        self,
+        sink,
+        items=None,
+        batch_size=None,
+        flush_interval=5.0,
+        max_queued=1000,
+        profiler=None,
+    ):
+        """
+        Args:
+            sink (ResultSink): Where the results are written.
+            items (list, optional): The items of the run.
+            batch_size (int, optional): Number of results per flush, the sink's
+                `batch_size` by default.
+            flush_interval (float, optional): Seconds between flushes of a partial
+                batch.
+            max_queued (int, optional): Results held before `put` blocks.
+            profiler (RunProfiler, optional): Times each flush as the sink's phase.
+        """
+        self.sink = sink
+        self.items = items
+        self.batch_size = batch_size or sink.batch_size
+        self.flush_interval = flush_interval
+        self.profiler = profiler or RunProfiler(enabled=False)
+        self.results = 0
+        self.calls = 0
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._written = set()
+        self._error = None
+        self._thread = None
+        self._closed = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+            return
+        try:
+            self.close()
+        except Exception as error:
+            self.logger.error(f"Failed to write the last results due to {error!r}.")
+
+    def start(self):
+        """Opens the sink and starts the writer thread."""
+        if self._thread is None:
+            self._closed = False
+            self.sink.open(self.items)
+            self._thread = threading.Thread(
+                target=self._run, name="result-pipeline", daemon=True
+            )
+            self._thread.start()
+
+    def put(self, shop_name, count, result):
+        """Queues a result to be written, blocking while the queue is full.
+
+        Results that are None or were written already are skipped by the writer,
+        results put after `close` are dropped.
+
+        Args:
+            shop_name (str): Store name, e.g. "Makro".
+            count (int): Index of the item.
+            result (ShoppingList): The product found for the item.
+        """
+        if result is not None and not self._closed:
+            self._queue.put((shop_name, count, result))
+
+    def put_carts(self, shopping_carts):
+        """Queues every result of the shopping carts.
+
+        Args:
+            shopping_carts (dict): Store name mapped to its list of `ShoppingList`
+                results, in item order.
+        """
+        for shop_name, shopping_cart in shopping_carts.items():
+            for count, result in enumerate(shopping_cart or []):
+                self.put(shop_name, count, result)
+
+    def close(self):
+        """Writes the queued results, stops the writer thread and closes the sink.
+
+        Raises:
+            Exception: The error that stopped the writer, if any.
+        """
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(_DONE)
+            self._thread.join()
+            self._thread = None
+            self.sink.close()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self):
+        pending = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                entry = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                entry = None
+            if entry is _DONE:
+                self._flush(pending)
+                return
+            if entry is not None and self._accepts(*entry):
+                pending.append(entry)
+            while len(pending) >= self.batch_size:
+                self._flush(pending[: self.batch_size])
+                del pending[: self.batch_size]
+                deadline = time.monotonic() + self.flush_interval
+            if time.monotonic() >= deadline:
+                self._flush(pending)
+                pending = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _accepts(self, shop_name, count, result):
+        if (shop_name, count) in self._written or not self.sink.accepts(shop_name):
+            return False
+        self._written.add((shop_name, count))
+        return True
+
+    def _flush(self, results):
+        # After a failed write the queue is still drained, so crawlers never
+        # block on it, and the error is raised by `close`.
+        if not results or self._error is not None:
+            return
+        try:
+            with self.profiler.phase(self.sink.phase):
+                calls = self.sink.write(results)
+        except Exception as error:
+            self.logger.error(
+                f"Failed to write {len(results)} result(s) due to {error!r}."
+            )
+            self._error = error
+            return
+        self.results += len(results)
+        self.calls += calls
+
+
+class SheetPipeline(ResultPipeline):
+    """
+    Writes results to the spreadsheet while the stores are still being crawled,
+    a `ResultPipeline` into a `GoogleSheetSink`.
+
+    Attributes:
+        writer (SheetWriter): Writes the cells to the worksheet.
+        product_columns (dict): Store name mapped to the (row, column) of its first
+            product name cell.
+    """
+
+    def __init__(
+        self,
+        writer,
+        product_columns,
+        batch_size=None,
+        flush_interval=5.0,
+        max_queued=1000,
+        profiler=None,
+    ):
+        """
+        Args:
+            writer (SheetWriter): Writes the cells to the worksheet.
+            product_columns (dict): Store name mapped to the (row, column) of its
+                first product name cell.
+            batch_size (int, optional): Number of cells per flush, the writer's
+                `chunk_size` by default.
+            flush_interval (float, optional): Seconds between flushes of a partial
+                batch.
+            max_queued (int, optional): Results held before `put` blocks.
+            profiler (RunProfiler, optional): Times each flush as "sheet_write".
+        """
+        sink = GoogleSheetSink(writer, product_columns)
+        super().__init__(
+            sink,
+            batch_size=max(1, (batch_size or writer.chunk_size) // CELLS_PER_RESULT),
+            flush_interval=flush_interval,
+            max_queued=max_queued,
+            profiler=profiler,
+        )
+        self.writer = writer
+        self.product_columns = product_columns
+
+    @property
+    def cells(self):
+        """int: Number of cells written so far."""
+        return self.sink.cells
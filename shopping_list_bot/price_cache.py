@@ -0,0 +1,172 @@
+import pathlib
+import sqlite3
+import threading
+import time
+
+from .common import IDS, LoggingClass, ShoppingList
+
+__all__ = ["PriceCache", "normalize_query"]
+
+DEFAULT_CACHE_PATH = pathlib.Path.home() / ".cache" / "shopping_list_bot" / "prices.db"
+# Seconds a cached price is used for, stores can override it with "cache_ttl".
+DEFAULT_TTL = 6 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    store TEXT NOT NULL,
+    query TEXT NOT NULL,
+    item_name TEXT,
+    item_price,
+    item_url TEXT,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (store, query)
+);
+CREATE INDEX IF NOT EXISTS prices_accessed_at ON prices (accessed_at);
+"""
+
+
+def normalize_query(item):
+    """Returns the cache key for an item, ignoring case and extra whitespace."""
+    return " ".join(item.lower().split())
+
+
+class PriceCache(LoggingClass):
+    """
+    An on-disk SQLite cache of search results, keyed by store and item, so items
+    checked recently are not crawled again.
+
+    Attributes:
+        path (pathlib.Path): The SQLite database.
+        ids (dict): Per store settings, see `IDS`, for their "cache_ttl".
+        default_ttl (float): Seconds a result is fresh for stores without a TTL.
+        max_entries (int): Results kept, the least recently used are evicted.
+    """
+
+    def __init__(
+        self,
+        path=DEFAULT_CACHE_PATH,
+        ids=IDS,
+        default_ttl=DEFAULT_TTL,
+        max_entries=50000,
+        clock=time.time,
+    ):
+        """
+        Args:
+            path (str, optional): The SQLite database, created when missing.
+            ids (dict, optional): Per store settings, see `IDS`.
+            default_ttl (float, optional): Seconds a result is fresh for stores
+                without a "cache_ttl".
+            max_entries (int, optional): Results kept before evicting.
+            clock (callable, optional): Returns the current time in seconds.
+        """
+        self.path = pathlib.Path(path)
+        self.ids = ids
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def ttl(self, store):
+        """Seconds a result from `store` stays fresh."""
+        return self.ids.get(store.lower(), {}).get("cache_ttl", self.default_ttl)
+
+    def get(self, store, item, max_age=None):
+        """Returns the cached result for `item` at `store` if it is fresh enough.
+
+        Args:
+            store (str): Store name, e.g. "Makro".
+            item (str): The item searched for.
+            max_age (float, optional): Maximum age in seconds, instead of the
+                store's TTL.
+
+        Returns:
+            ShoppingList: The cached result or None.
+        """
+        return self.get_many(store, [item], max_age=max_age)[0]
+
+    def get_many(self, store, items, max_age=None):
+        """Looks up many items at once.
+
+        Returns:
+            list: A `ShoppingList` or None per item, in the order of `items`.
+        """
+        now = self._clock()
+        oldest = now - (self.ttl(store) if max_age is None else max_age)
+        queries = [normalize_query(item) for item in items]
+        found = {}
+        with self._lock, self._db:
+            for start in range(0, len(queries), 500):
+                chunk = queries[start : start + 500]
+                rows = self._db.execute(
+                    "SELECT query, item_name, item_price, item_url FROM prices "
+                    "WHERE store = ? AND fetched_at >= ? "
+                    f"AND query IN ({', '.join('?' * len(chunk))})",
+                    [store.lower(), oldest, *chunk],
+                )
+                for query, name, price, url in rows:
+                    found[query] = ShoppingList(name, price, url)
+            if found:
+                self._db.executemany(
+                    "UPDATE prices SET accessed_at = ? WHERE store = ? AND query = ?",
+                    [(now, store.lower(), query) for query in found],
+                )
+        self.logger.debug(f"{len(found)}/{len(items)} cache hit(s) for {store}.")
+        return [found.get(query) for query in queries]
+
+    def put(self, store, item, result):
+        """Caches the result for `item` at `store`."""
+        self.put_many(store, [item], [result])
+
+    def put_many(self, store, items, results):
+        """Caches many results at once, skipping products that were not found.
+
+        Args:
+            store (str): Store name, e.g. "Makro".
+            items (list): The items searched for.
+            results (list): A `ShoppingList` or None per item.
+        """
+        now = self._clock()
+        rows = [
+            (
+                store.lower(),
+                normalize_query(item),
+                result.item_name,
+                result.item_price,
+                result.item_url,
+                now,
+                now,
+            )
+            for item, result in zip(items, results)
+            if result is not None and result.item_name
+        ]
+        if not rows:
+            return
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        self.evict()
+
+    def evict(self):
+        """Drops the least recently used results beyond `max_entries`."""
+        with self._lock, self._db:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM prices").fetchone()
+            if count > self.max_entries:
+                self._db.execute(
+                    "DELETE FROM prices WHERE rowid IN "
+                    "(SELECT rowid FROM prices ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+                self.logger.debug(f"Evicted {count - self.max_entries} result(s).")
+
+    def clear(self):
+        """Drops every cached result."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM prices")
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,236 @@
+import pathlib
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from .common import LoggingClass
+from .price_cache import normalize_query
+
+__all__ = ["PriceChange", "PriceHistory", "PriceRecord"]
+
+DEFAULT_HISTORY_PATH = (
+    pathlib.Path.home() / ".cache" / "shopping_list_bot" / "history.db"
+)
+
+PriceRecord = namedtuple(
+    "PriceRecord",
+    ["run_id", "recorded_at", "store", "item", "item_name", "price_cents", "item_url"],
+)
+PriceChange = namedtuple(
+    "PriceChange", ["store", "item", "item_name", "old_cents", "new_cents", "item_url"]
+)
+
+COLUMNS = ", ".join(PriceRecord._fields)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS prices (
+    run_id INTEGER NOT NULL,
+    recorded_at REAL NOT NULL,
+    store TEXT NOT NULL,
+    item TEXT NOT NULL,
+    item_name TEXT,
+    price_cents INTEGER,
+    item_url TEXT
+);
+CREATE INDEX IF NOT EXISTS prices_item ON prices (item, store, recorded_at);
+CREATE INDEX IF NOT EXISTS prices_store ON prices (store, recorded_at);
+CREATE INDEX IF NOT EXISTS prices_run ON prices (run_id);
+"""
+
+
+class PriceHistory(LoggingClass):
+    """
+    An append-only SQLite log of every price found, one run at a time, to see how
+    prices change between runs.
+
+    Attributes:
+        path (pathlib.Path): The SQLite database.
+    """
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH, clock=time.time):
+        """
+        Args:
+            path (str, optional): The SQLite database, created when missing.
+            clock (callable, optional): Returns the current time in seconds.
+        """
+        self.path = pathlib.Path(path)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def record(self, shopping_carts, items):
+        """Appends a run's results.
+
+        Args:
+            shopping_carts (dict): Store name mapped to a `ShoppingList` or None per
+                item, as returned by `PriceUpdater.get_shopping_cart`.
+            items (list): The items searched for.
+
+        Returns:
+            int: The run's id.
+        """
+        now = self._clock()
+        results = [
+            (
+                store.lower(),
+                normalize_query(item),
+                cart.item_name,
+                cart.price_cents,
+                cart.item_url,
+            )
+            for store, shopping_cart in shopping_carts.items()
+            for item, cart in zip(items, shopping_cart)
+            if cart is not None and cart.item_name
+        ]
+        with self._lock, self._db:
+            run_id = self._db.execute(
+                "INSERT INTO runs (started_at) VALUES (?)", (now,)
+            ).lastrowid
+            self._db.executemany(
+                f"INSERT INTO prices ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, now, *result) for result in results],
+            )
+        self.logger.info(f"Recorded {len(results)} price(s) for run {run_id}.")
+        return run_id
+
+    def query(self, item=None, store=None, since=None, until=None):
+        """Returns the recorded prices, oldest first.
+
+        Args:
+            item (str, optional): Only this item.
+            store (str, optional): Only this store.
+            since (float, optional): Only prices recorded at or after this time.
+            until (float, optional): Only prices recorded before this time.
+
+        Returns:
+            list: `PriceRecord` tuples.
+        """
+        where, params = self._filters(item, store, since, until)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {COLUMNS} FROM prices {where} ORDER BY recorded_at, rowid",
+                params,
+            ).fetchall()
+        return [PriceRecord(*row) for row in rows]
+
+    def columns(self, item=None, store=None, since=None, until=None):
+        """Returns the recorded prices column by column, for analysis.
+
+        Takes the same filters as `query`.
+
+        Returns:
+            dict: Each `PriceRecord` field mapped to a list of values.
+        """
+        records = self.query(item=item, store=store, since=since, until=until)
+        values = list(zip(*records)) or [()] * len(PriceRecord._fields)
+        return {
+            field: list(column) for field, column in zip(PriceRecord._fields, values)
+        }
+
+    def latest_products(self):
+        """Returns the product last found for every item at every store.
+
+        Returns:
+            list: (store, item, item_name, item_url) tuples.
+        """
+        with self._lock:
+            # SQLite takes the other columns from the row with the latest time.
+            return [
+                row[:4]
+                for row in self._db.execute(
+                    "SELECT store, item, item_name, item_url, MAX(recorded_at) "
+                    "FROM prices WHERE item_url IS NOT NULL GROUP BY store, item"
+                )
+            ]
+
+    def last_run(self):
+        """Returns the id of the latest run or None."""
+        with self._lock:
+            (run_id,) = self._db.execute("SELECT MAX(run_id) FROM runs").fetchone()
+        return run_id
+
+    def changes(self, run_id=None):
+        """Lists the prices of a run that differ from the previous price recorded
+        for the same item at the same store.
+
+        Args:
+            run_id (int, optional): The run, defaults to the latest.
+
+        Returns:
+            list: `PriceChange` tuples, items seen for the first time included
+                with an `old_cents` of None.
+        """
+        run_id = self.last_run() if run_id is None else run_id
+        with self._lock:
+            rows = self._db.execute(
+                """
+                SELECT new.store, new.item, new.item_name,
+                    (SELECT old.price_cents FROM prices AS old
+                     WHERE old.item = new.item AND old.store = new.store
+                        AND old.recorded_at < new.recorded_at
+                     ORDER BY old.recorded_at DESC LIMIT 1) AS old_cents,
+                    new.price_cents, new.item_url
+                FROM prices AS new
+                WHERE new.run_id = ?
+                ORDER BY new.store, new.item
+                """,
+                (run_id,),
+            ).fetchall()
+        return [PriceChange(*row) for row in rows if row[3] != row[4]]
+
+    def compact(self, older_than):
+        """Drops old rows that repeat the previous price of the same item at the
+        same store, keeping every price change.
+
+        Args:
+            older_than (float): Seconds, rows recorded before `now - older_than`
+                are compacted.
+
+        Returns:
+            int: Number of rows dropped.
+        """
+        cutoff = self._clock() - older_than
+        with self._lock, self._db:
+            rows = self._db.execute(
+                "SELECT rowid, store, item, price_cents FROM prices "
+                "WHERE recorded_at < ? ORDER BY store, item, recorded_at, rowid",
+                (cutoff,),
+            )
+            previous, repeated = None, []
+            for rowid, store, item, price_cents in rows:
+                if previous == (store, item, price_cents):
+                    repeated.append((rowid,))
+                previous = (store, item, price_cents)
+            self._db.executemany("DELETE FROM prices WHERE rowid = ?", repeated)
+            self._db.execute(
+                "DELETE FROM runs WHERE run_id NOT IN (SELECT run_id FROM prices) "
+                "AND started_at < ?",
+                (cutoff,),
+            )
+        self.logger.info(f"Compacted {len(repeated)} unchanged price(s).")
+        return len(repeated)
+
+    def close(self):
+        self._db.close()
+
+    @staticmethod
+    def _filters(item, store, since, until):
+        conditions, params = [], []
+        for condition, value in (
+            ("item = ?", item and normalize_query(item)),
+            ("store = ?", store and store.lower()),
+            ("recorded_at >= ?", since),
+            ("recorded_at < ?", until),
+        ):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, params
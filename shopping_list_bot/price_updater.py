@@ -1,9 +1,15 @@
+import contextlib
 import logging
-import coloredlogs
-import gspread
-import time
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
 import shopping_list_bot as shopping_bot
-from oauth2client.service_account import ServiceAccountCredentials
+
+__all__ = ["PriceUpdater"]
+
+
+class CrawlCancelled(Exception):
+    """Raised in the thread of a store that was given up on, to stop its crawl."""
 
 
 class PriceUpdater(shopping_bot.LoggingClass):
@@ -12,7 +18,26 @@ class PriceUpdater(shopping_bot.LoggingClass):
     """
 
     def __init__(
-        self, spreadsheet_name, secrets_json, share=[], log_level="INFO", headless=True
+        self,
+        spreadsheet_name,
+        secrets_json,
+        share=[],
+        log_level="INFO",
+        headless=True,
+        workers=1,
+        crawl_timeout=None,
+        pool_size=0,
+        http_first=True,
+        cache=None,
+        max_age=None,
+        history=None,
+        async_crawl=False,
+        profiler=None,
+        flush_interval=5.0,
+        journal=None,
+        catalog=None,
+        health=None,
+        coordinator=None,
     ):
         """Summary
 
@@ -22,31 +47,189 @@ class PriceUpdater(shopping_bot.LoggingClass):
             share (list, optional): Description
             log_level (str, optional): Description
             headless (bool, optional): Description
+            workers (int, optional): Number of stores crawled at the same time, each
+                with its own browser session. 1 crawls the stores one after another.
+            crawl_timeout (float, optional): Seconds to wait for all stores when
+                crawling concurrently. Stores still running afterwards are dropped
+                and stop, quitting their browser, once their current item is done.
+            pool_size (int, optional): Number of long-lived browsers shared by all
+                stores. 0 starts a new browser for every store.
+            http_first (bool, optional): Scrape stores over plain HTTP and only open
+                a browser for the items that need one.
+            cache (PriceCache, optional): Reuse recent results instead of crawling
+                the items again.
+            max_age (float, optional): Seconds a cached result is used for, instead
+                of the store's TTL.
+            history (PriceHistory, optional): Log every run's prices to see what
+                changed since the previous run.
+            async_crawl (bool, optional): Look items up over HTTP at all stores at
+                once on an event loop, before opening browsers for the rest.
+            profiler (RunProfiler, optional): Times each phase of the run per store
+                and item.
+            flush_interval (float, optional): Seconds between writes of the results
+                found so far while the stores are crawled.
+            journal (RunJournal, optional): Checkpoints every completed lookup, to
+                resume a run that died half-way.
+            catalog (ProductCatalog, optional): Products found by past runs, opened
+                directly instead of searching for the items they confidently match.
+            health (HealthMonitor, optional): Adapts the browser timeouts to each
+                store and skips stores whose selectors keep failing.
+            coordinator (Coordinator, optional): Hands the items that need a
+                browser to `Worker`s on other machines instead of opening one.
         """
         self.secrets_json = secrets_json
-        self.headless = headless
-        self.row_start = 2
-        self.stores_row = 2
+        self._configure(
+            log_level=log_level,
+            headless=headless,
+            workers=workers,
+            crawl_timeout=crawl_timeout,
+            pool_size=pool_size,
+            http_first=http_first,
+            cache=cache,
+            max_age=max_age,
+            history=history,
+            async_crawl=async_crawl,
+            profiler=profiler,
+            flush_interval=flush_interval,
+            journal=journal,
+            catalog=catalog,
+            health=health,
+            coordinator=coordinator,
+        )
 
-        self.logger.setLevel(log_level.upper())
-        coloredlogs.install(level=log_level.upper())
+        # The Sheets client is only needed once a spreadsheet is opened.
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
 
         scope = [
             "https://spreadsheets.google.com/feeds",
             "https://www.googleapis.com/auth/drive",
         ]
 
-        creds = ServiceAccountCredentials.from_json_keyfile_name(self.secrets_json, scope)
-        client = gspread.authorize(creds)
-        sheet = client.open(spreadsheet_name)
+        creds = ServiceAccountCredentials.from_json_keyfile_name(
+            self.secrets_json, scope
+        )
+        self.client = gspread.authorize(creds)
+        sheet = self.client.open(spreadsheet_name)
         if share:
             for shared in share:
                 self.logger.info("Sharing the spreadsheet with '%s'", shared)
                 sheet.share(shared, perm_type="user", role="writer")
 
-        self.sheet = sheet.sheet1
+        self._open_worksheet(sheet.sheet1)
         self.logger.info("Successfully opened spreadsheet: %s", spreadsheet_name)
 
+    @classmethod
+    def from_worksheet(cls, worksheet, **kwargs):
+        """Creates a `PriceUpdater` for an already opened worksheet.
+
+        Args:
+            worksheet (gspread.Worksheet): The shopping list worksheet.
+            **kwargs: Any of the optional `PriceUpdater` arguments except `share`.
+
+        Returns:
+            PriceUpdater: The price updater.
+        """
+        price_updater = cls.__new__(cls)
+        price_updater.secrets_json = None
+        price_updater._configure(**kwargs)
+        price_updater._open_worksheet(worksheet)
+        return price_updater
+
+    @classmethod
+    def offline(cls, **kwargs):
+        """Creates a `PriceUpdater` without a spreadsheet, for `export_results`.
+
+        Args:
+            **kwargs: Any of the optional `PriceUpdater` arguments except `share`.
+
+        Returns:
+            PriceUpdater: The price updater.
+        """
+        price_updater = cls.__new__(cls)
+        price_updater.secrets_json = None
+        price_updater._configure(**kwargs)
+        price_updater.sheet = price_updater.writer = price_updater._snapshot = None
+        return price_updater
+
+    def _configure(
+        self,
+        log_level="INFO",
+        headless=True,
+        workers=1,
+        crawl_timeout=None,
+        pool_size=0,
+        http_first=True,
+        cache=None,
+        max_age=None,
+        history=None,
+        async_crawl=False,
+        profiler=None,
+        flush_interval=5.0,
+        journal=None,
+        catalog=None,
+        health=None,
+        coordinator=None,
+    ):
+        if coordinator is not None:
+            # Stores only wait on the workers, so all of them are queued at once.
+            workers = max(workers, len(shopping_bot.URLS))
+        self.headless = headless
+        self.workers = max(1, int(workers))
+        self.crawl_timeout = crawl_timeout
+        self.flush_interval = flush_interval
+        self.profiler = profiler or shopping_bot.RunProfiler(enabled=False)
+        self.pool = (
+            shopping_bot.WebDriverPool(size=pool_size, headless=headless)
+            if pool_size
+            else None
+        )
+        self.catalog = catalog
+        self.health = health
+        self.coordinator = coordinator
+        self.fetcher = (
+            shopping_bot.HttpFetcher(profiler=self.profiler, catalog=catalog)
+            if http_first
+            else None
+        )
+        self.cache = cache
+        self.max_age = max_age
+        self.history = history
+        # Store name mapped to the indices of the items looked up in this run,
+        # rather than taken from the cache or the journal.
+        self._crawled = {}
+        self.journal = journal
+        self.async_crawler = (
+            shopping_bot.AsyncCrawler(fetcher=self.fetcher)
+            if async_crawl and self.fetcher is not None
+            else None
+        )
+        self.row_start = 2
+        self.stores_row = 2
+
+        self.logger.setLevel(log_level.upper())
+        import coloredlogs
+
+        coloredlogs.install(level=log_level.upper())
+
+    def _open_worksheet(self, worksheet):
+        self.sheet = worksheet
+        self.writer = shopping_bot.SheetWriter(worksheet)
+        self._snapshot = None
+
+    @property
+    def snapshot(self):
+        """SheetSnapshot: The worksheet as last read, read on first use."""
+        if self._snapshot is None:
+            self.logger.debug("Reading the worksheet.")
+            with self.profiler.phase("sheet_read"):
+                self._snapshot = shopping_bot.SheetSnapshot(self.sheet)
+        return self._snapshot
+
+    def invalidate_snapshot(self):
+        """Forgets the worksheet snapshot, the next lookup reads the sheet again."""
+        self._snapshot = None
+
     def get_all_stores(self):
         """Summary
 
@@ -56,8 +239,8 @@ class PriceUpdater(shopping_bot.LoggingClass):
         return {
             coord.value.title(): (coord.row, coord.col)
             for coord in [
-                self.sheet.find(store_name)
-                for store_name in self.sheet.row_values(self.stores_row)
+                self.snapshot.find(store_name)
+                for store_name in self.snapshot.row_values(self.stores_row)
                 if store_name
             ]
         }
@@ -73,7 +256,7 @@ class PriceUpdater(shopping_bot.LoggingClass):
         """
         return [
             (coord.row + self.row_start, coord.col)
-            for coord in self.sheet.findall(product_name)
+            for coord in self.snapshot.findall(product_name)
         ]
 
     def get_all_price_coord(self, price="Price"):
@@ -86,7 +269,8 @@ class PriceUpdater(shopping_bot.LoggingClass):
             TYPE: Description
         """
         return [
-            (coord.row + self.row_start, coord.col) for coord in self.sheet.findall(price)
+            (coord.row + self.row_start, coord.col)
+            for coord in self.snapshot.findall(price)
         ]
 
     def get_all_url_coord(self, url="URL"):
@@ -99,7 +283,8 @@ class PriceUpdater(shopping_bot.LoggingClass):
             TYPE: Description
         """
         return [
-            (coord.row + self.row_start, coord.col) for coord in self.sheet.findall(url)
+            (coord.row + self.row_start, coord.col)
+            for coord in self.snapshot.findall(url)
         ]
 
     def get_all_items(self, items="Item"):
@@ -111,78 +296,792 @@ class PriceUpdater(shopping_bot.LoggingClass):
         Returns:
             TYPE: Description
         """
-        items_coord = self.sheet.find(items)
+        items_coord = self.snapshot.find(items)
         col, row = items_coord.col, items_coord.row
-        return [item for item in self.sheet.col_values(col)[row:] if item]
+        return [item for item in self.snapshot.col_values(col)[row:] if item]
 
-    def get_shopping_cart(self):
-        """Summary
+    def get_shopping_cart(self, on_result=None, items=None):
+        """Crawls every store in `URLS` for the items on the spreadsheet.
+
+        Args:
+            on_result (callable, optional): Called with the store name, the index of
+                the item and its `ShoppingList` as soon as one is found, from the
+                thread that found it.
+            items (list, optional): Items to search for instead of the ones on the
+                spreadsheet.
 
         Returns:
-            TYPE: Description
+            dict: Store name mapped to its list of `ShoppingList` results, in the
+                order of `URLS`. Stores that failed or timed-out are left out.
         """
-        items = self.get_all_items()
+        if items is None:
+            items = self.get_all_items()
         urls = shopping_bot.URLS
-        shopping_carts = []
         self.logger.info(f"[Attempting] to retrieve product information.")
+        if self.journal is not None:
+            self.journal.begin(items)
+        self._crawled = {}
+        if self.pool is not None:
+            self.pool.warm_up(min(self.workers, self.pool.size))
+        prefetched = {}
+        if self.async_crawler is not None:
+            prefetched = self._crawl_async(items, urls, on_result)
+        if self.workers > 1:
+            shopping_carts = self._crawl_concurrently(
+                items, urls, prefetched, on_result
+            )
+        else:
+            shopping_carts = {
+                url: self._crawl_store(items, url, prefetched.get(url), on_result)
+                for url in urls
+            }
+
+        merged_cart = {}
         for url in urls:
-            try:
-                crawling_bot = shopping_bot.ShoppingBot(
-                    items, url, headless=self.headless
-                )
-                crawling_bot.search_items()
-                shopping_carts.append(crawling_bot.shopping_cart)
-                self.logger.info(
-                    f"[Done] Retrieving product information from {crawling_bot.__class__}"
-                )
-            except Exception as error:
-                self.logger.error(f"Failed to retrieve {url} due to {error}.")
+            merged_cart.update(shopping_carts.get(url) or {})
+        if self.journal is not None and all(shopping_carts.get(url) for url in urls):
+            self.journal.finish()
+        self.log_store_health()
+
+        if self.history is not None:
+            # Cached and resumed results were not seen now, recording them again
+            # would repeat old prices as new observations.
+            observed = {
+                shop_name: [
+                    cart if count in self._crawled.get(shop_name, ()) else None
+                    for count, cart in enumerate(shopping_cart)
+                ]
+                for shop_name, shopping_cart in merged_cart.items()
+            }
+            with self.profiler.phase("history_record"):
+                run_id = self.history.record(observed, items)
+            self.log_price_changes(run_id)
+        return merged_cart
+
+    def log_store_health(self):
+        """Logs the stores that were skipped after their selectors kept failing."""
+        if self.health is None:
+            return
+        for store, wait in self.health.open_circuits().items():
+            self.logger.error(
+                f"{store.title()} was skipped after repeated {wait} time-outs, check "
+                f"its selectors in IDS."
+            )
+        self.logger.debug(f"Store health:\n{self.health.format_report()}")
+
+    def log_price_changes(self, run_id):
+        """Logs the prices of a run that changed since the previous run."""
+        changes = self.history.changes(run_id)
+        for change in changes:
+            if change.old_cents is None or change.new_cents is None:
+                continue
+            self.logger.info(
+                f"{change.item} at {change.store.title()} changed from "
+                f"R{change.old_cents / 100:.2f} to R{change.new_cents / 100:.2f}."
+            )
+        self.logger.info(f"{len(changes)} price(s) changed since the last run.")
+
+    def _crawl_async(self, items, urls, on_result=None):
+        """Looks up the items that are not cached at all stores at once over HTTP.
+
+        Args:
+            items (list): Items to search for.
+            urls (list): Store urls.
+            on_result (callable, optional): Called with the store name, the index of
+                the item and its `ShoppingList` as soon as one is found.
+
+        Returns:
+            dict: Store url mapped to a dict of item to `ShoppingList` or None, for
+                the stores that can be scraped without a browser.
+        """
+        jobs, positions = {}, {}
+        for url in urls:
+            if not self.async_crawler.fetcher.can_fetch(url):
+                continue
+            shop_name = shopping_bot.store_key(url).title()
+            known = self._known_results(shop_name, items)
+            positions[url] = [count for count, cart in enumerate(known) if cart is None]
+            jobs[url] = [items[count] for count in positions[url]]
+
+        def found(url, count, item, result):
+            if on_result is not None and result is not None:
+                shop_name = shopping_bot.store_key(url).title()
+                on_result(shop_name, positions[url][count], result)
+
+        lookups = sum(len(pending) for pending in jobs.values())
+        self.logger.info(f"Looking up {lookups} item(s) over HTTP.")
+        with self.profiler.phase("async_crawl"):
+            results = self.async_crawler.crawl_all(jobs, on_result=found)
+        return {url: dict(zip(jobs[url], results[url])) for url in jobs}
+
+    def _crawl_store(self, items, url, prefetched=None, on_result=None, stop=None):
+        """Searches a single store for all items, over HTTP where the store allows it
+        and with a browser for the rest.
+
+        Args:
+            items (list): Items to search for.
+            url (str): Store url, one of `URLS`.
+            prefetched (dict, optional): Item mapped to the result already looked up
+                by the async crawler, used instead of searching over HTTP again.
+            on_result (callable, optional): Called with the store name, the index of
+                the item and its `ShoppingList` as soon as one is found.
+            stop (threading.Event, optional): Set once the store was given up on.
+                Its later results are dropped and its crawl stops after the item
+                in progress.
+
+        Returns:
+            dict: The store's shopping cart or None if the store could not be crawled.
+        """
+        try:
+            with self.profiler.phase("store", shopping_bot.store_key(url)):
+                return self._crawl_store_items(items, url, prefetched, on_result, stop)
+        except CrawlCancelled:
+            self.logger.info(f"Stopped crawling {url}, it was given up on.")
+        except Exception as error:
+            # One store failing must not end the crawl of the others.
+            self.logger.exception(f"Failed to retrieve {url} due to {error!r}.")
+
+    def _crawl_store_items(
+        self, items, url, prefetched=None, on_result=None, stop=None
+    ):
+        shop_name = shopping_bot.store_key(url).title()
+        shopping_cart = self._known_results(shop_name, items)
+
+        def found(count, cart):
+            # Raised through the crawler, which quits its browser on the way out.
+            if stop is not None and stop.is_set():
+                raise CrawlCancelled(url)
+            if self.journal is not None:
+                self.journal.put(shop_name, items[count], cart)
+            if on_result is not None:
+                on_result(shop_name, count, cart)
+
+        for count, cart in enumerate(shopping_cart):
+            if cart is not None:
+                found(count, cart)
+
+        crawled = []
+        if prefetched is not None:
+            crawled += self._search_pending(
+                shopping_cart,
+                items,
+                lambda pending, _: [prefetched.get(item) for item in pending],
+                found,
+            )
+        elif self.fetcher is not None and self.fetcher.can_fetch(url):
+            crawled += self._search_pending(
+                shopping_cart,
+                items,
+                lambda pending, on_result: self.fetcher.search_items(
+                    pending, url, on_result=on_result
+                ),
+                found,
+            )
+        try:
+            if stop is not None and stop.is_set():
+                raise CrawlCancelled(url)
+            crawled += self._search_pending(
+                shopping_cart,
+                items,
+                lambda pending, on_result: self._search_with_browser(
+                    pending, url, on_result=on_result
+                ),
+                found,
+            )
+        except CrawlCancelled:
+            raise
+        except (Exception, SystemExit) as error:
+            # WebDriverSetup exits on page time-outs, which must not end the run.
+            self.logger.error(f"Failed to retrieve {url} due to {error!r}.")
+            if not any(shopping_cart):
+                return
+
+        if self.cache is not None and crawled:
+            self.cache.put_many(
+                shop_name,
+                [items[count] for count in crawled],
+                [shopping_cart[count] for count in crawled],
+            )
+        self._crawled[shop_name] = set(crawled)
+        self.logger.info(f"[Done] Retrieving product information from {url}")
+        return {shop_name: shopping_cart}
+
+    def _known_results(self, shop_name, items):
+        """Looks up the items already done in this run or cached recently.
+
+        Args:
+            shop_name (str): Store name, e.g. "Makro".
+            items (list): Items to search for.
+
+        Returns:
+            list: A `ShoppingList` per item that needs no crawling, None for the
+                others.
+        """
+        known = [None] * len(items)
+        if self.journal is not None:
+            known = self.journal.get_many(shop_name, items)
+        if self.cache is not None and None in known:
+            with self.profiler.phase("cache_read", shop_name.lower()):
+                cached = self.cache.get_many(shop_name, items, max_age=self.max_age)
+            known = [done or cart for done, cart in zip(known, cached)]
+        return known
+
+    @staticmethod
+    def _search_pending(shopping_cart, items, search, on_result=None):
+        """Searches for the items that have no result yet and fills them in.
+
+        Args:
+            shopping_cart (list): A `ShoppingList` or None per item, updated in place.
+            items (list): Items to search for.
+            search (callable): Takes a list of items and a callback for each result
+                as it is found, and returns a result per item.
+            on_result (callable, optional): Called with the index of the item in
+                `items` and its `ShoppingList`, once per item found.
+
+        Returns:
+            list: Indices of the items that were found.
+        """
+        pending = [count for count, cart in enumerate(shopping_cart) if cart is None]
+        if not pending:
+            return []
+        reported = set()
+
+        def found(position, cart):
+            reported.add(position)
+            if on_result is not None:
+                on_result(pending[position], cart)
+
+        results = search([items[count] for count in pending], found)
+        for position, (count, cart) in enumerate(zip(pending, results)):
+            shopping_cart[count] = cart
+            if cart is not None and position not in reported:
+                found(position, cart)
+        return [count for count, cart in zip(pending, results) if cart is not None]
+
+    def _search_with_browser(self, items, url, on_result=None):
+        if self.coordinator is not None:
+            return self.coordinator.search(items, url, on_result=on_result)
+        if self.health is not None and self.health.is_open(shopping_bot.store_key(url)):
+            self.logger.error(f"Not opening a browser for {url}, it keeps failing.")
+            return [None] * len(items)
+        crawling_bot = shopping_bot.ShoppingBot(
+            items,
+            url,
+            headless=self.headless,
+            pool=self.pool,
+            profiler=self.profiler,
+            on_result=on_result,
+            catalog=self.catalog,
+            health=self.health,
+        )
+        crawling_bot.search_items()
+        return crawling_bot.shopping_cart[shopping_bot.store_key(url).title()]
+
+    def _crawl_concurrently(self, items, urls, prefetched=None, on_result=None):
+        """Crawls the stores on a thread pool, one browser session per worker.
+
+        Args:
+            items (list): Items to search for.
+            urls (list): Store urls.
+            prefetched (dict, optional): Store url mapped to the results already
+                looked up by the async crawler.
+            on_result (callable, optional): Called with the store name, the index of
+                the item and its `ShoppingList` as soon as one is found.
+
+        Returns:
+            dict: Store url mapped to the bot's `shopping_cart`, for the stores that
+                finished within `crawl_timeout`.
+        """
+        prefetched = prefetched or {}
+        shopping_carts = {}
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=min(self.workers, len(urls)))
+        futures = {
+            executor.submit(
+                self._crawl_store, items, url, prefetched.get(url), on_result, stop
+            ): url
+            for url in urls
+        }
+        try:
+            for future in as_completed(futures, timeout=self.crawl_timeout):
+                shopping_carts[futures[future]] = future.result()
+        except TimeoutError:
+            pending = [url for future, url in futures.items() if not future.done()]
+            self.logger.error(
+                f"Timed-out after {self.crawl_timeout}s, skipping {', '.join(pending)}."
+            )
+        finally:
+            # Stores still running stop after their current item instead of
+            # reporting results once the run moved on, queued ones never start.
+            stop.set()
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
         return shopping_carts
 
-    def process_item_list(self):
-        """Summary
+    def get_product_columns(self):
+        """Finds where each store's products are listed.
+
+        Returns:
+            dict: Store name mapped to the (row, column) of its first product name
+                cell. The price and URL columns follow the product name column.
         """
-        list_of_shopping_carts = self.get_shopping_cart()
-        available_stores_coord = self.get_all_stores()
         product_names_coord = self.get_all_product_name_coord()
-        prices_coord = self.get_all_price_coord()
-        urls_coord = self.get_all_url_coord()
-
-        for shopping_carts in list_of_shopping_carts:
-            for shop_name, shopping_cart in shopping_carts.items():
-                for shop_coord in available_stores_coord[shop_name]:
-                    for prod_coord in product_names_coord:
-                        if shop_coord == prod_coord[1]:
-                            self.logger.info(f"Updating Google Sheets for {shop_name}.")
-                            for count, cart in enumerate(shopping_cart):
-                                self.logger.info(
-                                    f"Updated {cart.item_name} and {cart.item_price}."
-                                )
-                                self.sheet.update_cell(
-                                    prod_coord[0] + count, prod_coord[1], cart.item_name
-                                )
-                                self.sheet.update_cell(
-                                    prod_coord[0] + count,
-                                    prod_coord[1] + 1,
-                                    cart.item_price,
-                                )
-                                self.sheet.update_cell(
-                                    prod_coord[0] + count,
-                                    prod_coord[1] + 2,
-                                    cart.item_url,
-                                )
-                                time.sleep(10)
-                            available_stores_coord.pop(shop_name, None)
-
-    def update_spreadsheet_price(self):
-        """Summary
+        product_columns = {}
+        for shop_name, (_, shop_col) in self.get_all_stores().items():
+            for prod_coord in product_names_coord:
+                if prod_coord[1] == shop_col:
+                    product_columns[shop_name] = prod_coord
+                    break
+        return product_columns
+
+    def get_cart_cells(self, prod_coord, shopping_cart):
+        """Lays out a store's shopping cart as the cells to write.
+
+        Args:
+            prod_coord (tuple): (row, column) of the store's first product name cell.
+            shopping_cart (list): The store's `ShoppingList` results, in item order.
+
+        Returns:
+            list: `gspread.Cell` objects with the name, price and URL of each product.
+        """
+        cells = []
+        for count, cart in enumerate(shopping_cart):
+            if cart is not None:
+                cells.extend(shopping_bot.result_cells(prod_coord, count, cart))
+        return cells
+
+    def process_item_list(self, sinks=()):
+        """Crawls the stores for the items on the spreadsheet and writes the
+        product names, prices and URLs back while the crawl is running.
+
+        Results are streamed to a `SheetPipeline` as they are found and written in
+        batches, so a store that hangs or a crash half-way through the run does not
+        lose what was found before it.
+
+        Args:
+            sinks (list, optional): `ResultSink`s the results are also written to.
+        """
+        pipeline = shopping_bot.SheetPipeline(
+            self.writer,
+            self.get_product_columns(),
+            flush_interval=self.flush_interval,
+            profiler=self.profiler,
+        )
+        try:
+            self._stream_results([pipeline] + self._sink_pipelines(sinks))
+        finally:
+            self.invalidate_snapshot()
+            self.logger.info(
+                f"Updated {pipeline.cells} cells with {pipeline.calls} API call(s)."
+            )
+
+    def export_results(self, items, sinks):
+        """Crawls the stores for the items and writes the results to the sinks
+        only, without reading or writing a spreadsheet.
+
+        Args:
+            items (list): Items to search for.
+            sinks (list): `ResultSink`s the results are written to.
+
+        Returns:
+            dict: Store name mapped to its list of `ShoppingList` results.
+        """
+        pipelines = self._sink_pipelines(sinks, items)
+        shopping_carts = self._stream_results(pipelines, items)
+        for pipeline in pipelines:
+            self.logger.info(
+                f"Wrote {pipeline.results} result(s) to {type(pipeline.sink).__name__}."
+            )
+        return shopping_carts
+
+    def _sink_pipelines(self, sinks, items=None):
+        if sinks and items is None:
+            items = self.get_all_items()
+        return [
+            shopping_bot.ResultPipeline(
+                sink,
+                items=items,
+                flush_interval=self.flush_interval,
+                profiler=self.profiler,
+            )
+            for sink in sinks
+        ]
+
+    def _stream_results(self, pipelines, items=None):
+        """Crawls the stores, handing every result to all the pipelines as soon as
+        it is found."""
+
+        def put(shop_name, count, result):
+            for pipeline in pipelines:
+                pipeline.put(shop_name, count, result)
+
+        with contextlib.ExitStack() as stack:
+            for pipeline in pipelines:
+                stack.enter_context(pipeline)
+            if items is None:
+                shopping_carts = self.get_shopping_cart(on_result=put)
+            else:
+                shopping_carts = self.get_shopping_cart(on_result=put, items=items)
+            # Catches results of crawlers that do not report them one by one.
+            for pipeline in pipelines:
+                pipeline.put_carts(shopping_carts)
+        return shopping_carts
+
+    def open_worksheets(self, spreadsheet_names, all_worksheets=False):
+        """Opens more shopping lists with the same credentials.
+
+        Args:
+            spreadsheet_names (list): Names of the spreadsheets.
+            all_worksheets (bool, optional): Every worksheet of each spreadsheet
+                instead of only the first.
+
+        Returns:
+            list: The `gspread.Worksheet`s.
+        """
+        worksheets = []
+        for spreadsheet_name in spreadsheet_names:
+            sheet = self.client.open(spreadsheet_name)
+            worksheets.extend(sheet.worksheets() if all_worksheets else [sheet.sheet1])
+        return worksheets
+
+    def process_worksheets(self, worksheets, sinks=()):
+        """Crawls the stores once for the items of many shopping lists and writes
+        the results back to each of them.
+
+        Items are matched across the worksheets ignoring case and extra
+        whitespace, every unique item is looked up once per store and its results
+        are streamed to a `SheetPipeline` per worksheet. Worksheets without an
+        "Item" header are skipped.
+
+        Args:
+            worksheets (list): `gspread.Worksheet`s laid out like the shopping list.
+            sinks (list, optional): `ResultSink`s the results of the unique items
+                are also written to.
+        """
+        own_sheet = self.sheet
+        unique_items, positions, sheets = [], {}, []
+        for worksheet in worksheets:
+            self._open_worksheet(worksheet)
+            if self.snapshot.find("Item") is None:
+                self.logger.warning(f"Skipping {worksheet.title}, it lists no items.")
+                continue
+            sheet_positions = []
+            for item in self.get_all_items():
+                query = shopping_bot.normalize_query(item)
+                if query not in positions:
+                    positions[query] = len(unique_items)
+                    unique_items.append(item)
+                sheet_positions.append(positions[query])
+            sheets.append((worksheet, self.get_product_columns(), sheet_positions))
+        lookups = sum(len(sheet_positions) for _, _, sheet_positions in sheets)
+        self.logger.info(
+            f"Looking up {len(unique_items)} unique item(s) for {lookups} item(s) on "
+            f"{len(sheets)} worksheet(s)."
+        )
+
+        pipelines = [
+            shopping_bot.SheetPipeline(
+                shopping_bot.SheetWriter(worksheet),
+                product_columns,
+                flush_interval=self.flush_interval,
+                profiler=self.profiler,
+            )
+            for worksheet, product_columns, _ in sheets
+        ]
+        # Where each unique item is listed, as (pipeline, index on its worksheet).
+        listed = [[] for _ in unique_items]
+        for pipeline, (_, _, sheet_positions) in zip(pipelines, sheets):
+            for count, position in enumerate(sheet_positions):
+                listed[position].append((pipeline, count))
+
+        exports = self._sink_pipelines(sinks, unique_items)
+
+        def fan_out(shop_name, position, result):
+            for pipeline, count in listed[position]:
+                pipeline.put(shop_name, count, result)
+            for pipeline in exports:
+                pipeline.put(shop_name, position, result)
+
+        try:
+            with contextlib.ExitStack() as stack:
+                for pipeline in pipelines + exports:
+                    stack.enter_context(pipeline)
+                shopping_carts = self.get_shopping_cart(
+                    on_result=fan_out, items=unique_items
+                )
+                for shop_name, shopping_cart in shopping_carts.items():
+                    for position, cart in enumerate(shopping_cart):
+                        fan_out(shop_name, position, cart)
+        finally:
+            self._open_worksheet(own_sheet)
+            self.logger.info(
+                f"Updated {sum(pipeline.cells for pipeline in pipelines)} cells with "
+                f"{sum(pipeline.calls for pipeline in pipelines)} API call(s)."
+            )
+
+    def get_price_matrix(self):
+        """Reads the prices on the spreadsheet into an items x stores matrix.
+
+        Returns:
+            PriceMatrix: The prices, masked where a store has none.
         """
-        # TODO
-        # get urls from spreadsheet
-        # for url in urls
-        #   > get new prices from shopping bot
-        #   > update spreadsheet with new prices
-        pass
+        items = self.get_all_items()
+        prices = {
+            shop_name: [
+                self.snapshot.cell_value(row + count, col + 1)
+                for count in range(len(items))
+            ]
+            for shop_name, (row, col) in self.get_product_columns().items()
+        }
+        return shopping_bot.PriceMatrix.from_prices(items, prices)
+
+    def optimize_basket(
+        self,
+        max_stores=2,
+        delivery_fees=None,
+        shopping_carts=None,
+        items=None,
+        tab="Basket",
+    ):
+        """Finds the cheapest store for the whole list and the cheapest way to
+        split it over at most `max_stores` stores, and writes both to a tab.
+
+        Args:
+            max_stores (int, optional): Most stores to buy from.
+            delivery_fees (dict, optional): Store name mapped to its delivery fee
+                in cents.
+            shopping_carts (dict, optional): Carts of a crawl to use instead of
+                the prices on the spreadsheet.
+            items (list, optional): The items of `shopping_carts`, the ones on the
+                spreadsheet by default.
+            tab (str, optional): Worksheet the results are written to, created if
+                missing. None to only return them.
+
+        Returns:
+            tuple: The `PriceMatrix` and its best `Split`.
+        """
+        with self.profiler.phase("optimize"):
+            if shopping_carts is None:
+                matrix = self.get_price_matrix()
+            else:
+                if items is None:
+                    items = self.get_all_items()
+                matrix = shopping_bot.PriceMatrix.from_carts(items, shopping_carts)
+            split = matrix.best_split(max_stores, delivery_fees)
+        if split is None:
+            self.logger.warning("There are no prices to compare.")
+            return matrix, split
+        self.logger.info(
+            f"Cheapest over {', '.join(split.stores)}: "
+            f"{shopping_bot.format_cents(split.total_cents)}, "
+            f"{split.missing} item(s) missing."
+        )
+        if tab is not None and self.sheet is not None:
+            self.write_tab(tab, matrix.report_rows(split, delivery_fees))
+        return matrix, split
+
+    def write_tab(self, title, rows):
+        """Replaces the contents of a worksheet of the spreadsheet with `rows`.
+
+        Args:
+            title (str): The worksheet, added to the spreadsheet if missing.
+            rows (list): Rows of cell values, from cell A1.
+
+        Returns:
+            gspread.Worksheet: The worksheet.
+        """
+        import gspread
+        from gspread.exceptions import WorksheetNotFound
+
+        spreadsheet = self.sheet.spreadsheet
+        width = max((len(row) for row in rows), default=1)
+        try:
+            worksheet = spreadsheet.worksheet(title)
+            worksheet.clear()
+        except WorksheetNotFound:
+            worksheet = spreadsheet.add_worksheet(
+                title=title, rows=len(rows), cols=width
+            )
+        if worksheet.row_count < len(rows):
+            worksheet.add_rows(len(rows) - worksheet.row_count)
+        cells = [
+            gspread.Cell(row, col, value)
+            for row, values in enumerate(rows, 1)
+            for col, value in enumerate(values, 1)
+        ]
+        with self.profiler.phase("sheet_write"):
+            shopping_bot.SheetWriter(worksheet).write(cells)
+        self.logger.info(f"Wrote {len(rows)} rows to the {title} worksheet.")
+        return worksheet
+
+    def close(self):
+        """Quits the pooled browsers and closes the HTTP connections, databases and
+        job queue."""
+        if self.pool is not None:
+            self.pool.shutdown()
+        if self.async_crawler is not None:
+            self.async_crawler.close()
+        if self.fetcher is not None:
+            self.fetcher.close()
+        if self.cache is not None:
+            self.cache.close()
+        if self.history is not None:
+            self.history.close()
+        if self.journal is not None:
+            self.journal.close()
+        if self.coordinator is not None:
+            self.coordinator.close()
+
+    def update_spreadsheet_price(self, worksheets=None):
+        """Refreshes the prices of the products already on the spreadsheet.
+
+        Instead of searching for every item again, the product pages stored in the
+        URL columns are visited directly and only prices that changed are written.
+
+        Args:
+            worksheets (list, optional): `gspread.Worksheet`s to refresh one after
+                another instead of the spreadsheet's.
+        """
+        if worksheets is not None:
+            own_sheet = self.sheet
+            try:
+                for worksheet in worksheets:
+                    self._open_worksheet(worksheet)
+                    self.update_spreadsheet_price()
+            finally:
+                self._open_worksheet(own_sheet)
+            return
+
+        import gspread
+
+        stale_prices = {}
+        for shop_name, (first_row, col) in self.get_product_columns().items():
+            price_col, url_col = col + 1, col + 2
+            products = [
+                (row, self.snapshot.cell_value(row, url_col))
+                for row in range(first_row, len(self.snapshot.values) + 1)
+            ]
+            stale_prices[shop_name] = [
+                (row, price_col, url) for row, url in products if url
+            ]
+
+        if self.workers > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                prices = dict(
+                    zip(
+                        stale_prices,
+                        executor.map(self._refresh_prices, stale_prices.items()),
+                    )
+                )
+        else:
+            prices = {
+                shop_name: self._refresh_prices((shop_name, products))
+                for shop_name, products in stale_prices.items()
+            }
+
+        cells = []
+        for shop_name, products in stale_prices.items():
+            for (row, price_col, url), price in zip(products, prices[shop_name]):
+                old_price = self.snapshot.cell_value(row, price_col)
+                if price is None or same_price(old_price, price):
+                    continue
+                self.logger.info(f"{url} changed from {old_price} to {price}.")
+                cells.append(gspread.Cell(row, price_col, price))
+        if self.history is not None:
+            with self.profiler.phase("history_record"):
+                self._record_refreshed_prices(stale_prices, prices)
+
+        calls = 0
+        if cells:
+            with self.profiler.phase("sheet_write"):
+                calls = self.writer.write(cells)
+        self.invalidate_snapshot()
+        self.logger.info(f"Updated {len(cells)} changed price(s) with {calls} call(s).")
+
+    def _record_refreshed_prices(self, stale_prices, prices):
+        """Appends the prices read by `update_spreadsheet_price` to the history.
+
+        Args:
+            stale_prices (dict): Store name mapped to its (row, price column, url)
+                products.
+            prices (dict): Store name mapped to the price read for each product,
+                None where it could not be read.
+        """
+        rows = sorted(
+            {row for products in stale_prices.values() for row, *_ in products}
+        )
+        item_col = self.snapshot.find("Item").col
+        items = [self.snapshot.cell_value(row, item_col) for row in rows]
+        positions = {row: count for count, row in enumerate(rows)}
+        shopping_carts = {}
+        for shop_name, products in stale_prices.items():
+            shopping_cart = shopping_carts[shop_name] = [None] * len(rows)
+            for (row, price_col, url), price in zip(products, prices[shop_name]):
+                if price is not None:
+                    name = self.snapshot.cell_value(row, price_col - 1)
+                    shopping_cart[positions[row]] = shopping_bot.ShoppingList(
+                        name, price, url
+                    )
+        self.history.record(shopping_carts, items)
+
+    def _refresh_prices(self, store_products):
+        """Reads the current price of a store's products from their pages.
+
+        Args:
+            store_products (tuple): The store name and its (row, price column, url)
+                products.
+
+        Returns:
+            list: The price of each product, None where it could not be read.
+        """
+        shop_name, products = store_products
+        store = shop_name.lower()
+        urls = [url for _, _, url in products]
+        prices = [None] * len(urls)
+        if not urls:
+            return prices
+        store_url = next((url for url in shopping_bot.URLS if f".{store}." in url), "")
+
+        if store_url and self.fetcher is not None and self.fetcher.can_fetch(store_url):
+            prices = self.fetcher.get_prices(urls, store)
+        pending = [count for count, price in enumerate(prices) if price is None]
+        if pending and store_url:
+            try:
+                crawling_bot = shopping_bot.ShoppingBot(
+                    [],
+                    store_url,
+                    headless=self.headless,
+                    pool=self.pool,
+                    profiler=self.profiler,
+                    health=self.health,
+                    open_store=False,
+                )
+                browser_prices = crawling_bot.get_prices([urls[c] for c in pending])
+            except (Exception, SystemExit) as error:
+                self.logger.error(f"Failed to refresh {shop_name} due to {error!r}.")
+            else:
+                for count, price in zip(pending, browser_prices):
+                    prices[count] = price
+        return prices
+
+
+def same_price(old_price, new_price):
+    """Compares a price read off the sheet with a freshly scraped one.
+
+    Args:
+        old_price (str): The price as shown on the sheet, e.g. "R49.99".
+        new_price: The scraped price.
+
+    Returns:
+        bool: Whether both are the same amount.
+    """
+    try:
+        old = float(re.sub(r"[^\d.]", "", str(old_price)))
+        new = float(re.sub(r"[^\d.]", "", str(new_price)))
+    except ValueError:
+        return False
+    return abs(old - new) < 0.005
 
 
 if __name__ == "__main__":
@@ -0,0 +1,222 @@
+import json
+import math
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+__all__ = ["PhaseSample", "RunProfiler"]
+
+PhaseSample = namedtuple(
+    "PhaseSample", ["phase", "store", "item", "started_at", "seconds", "failed"]
+)
+
+METRIC = "shopping_list_bot_phase_seconds"
+FAILURES_METRIC = "shopping_list_bot_phase_failures_total"
+
+
+def percentile(values, fraction):
+    """Returns the nearest-rank percentile of sorted `values`, e.g. 0.95 for p95."""
+    if not values:
+        return None
+    rank = max(1, int(math.ceil(fraction * len(values))))
+    return values[rank - 1]
+
+
+class _Phase:
+    __slots__ = ("_profiler", "_phase", "_store", "_item", "_started_at", "_start")
+
+    def __init__(self, profiler, phase, store, item):
+        self._profiler = profiler
+        self._phase = phase
+        self._store = store
+        self._item = item
+
+    def __enter__(self):
+        self._started_at = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._profiler.add(
+            PhaseSample(
+                self._phase,
+                self._store,
+                self._item,
+                self._started_at,
+                time.perf_counter() - self._start,
+                exc_type is not None,
+            )
+        )
+        return False
+
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NO_PHASE = _NoPhase()
+
+
+class RunProfiler:
+    """
+    Times the phases of a run, e.g. starting browsers, loading pages, each wait,
+    parsing prices and writing to the spreadsheet, per store and per item.
+
+    A disabled profiler records nothing, so components can time their phases
+    unconditionally.
+
+    Attributes:
+        enabled (bool): Whether phases are recorded.
+        started_at (float): When the profiler was created, in seconds since the
+            epoch.
+    """
+
+    def __init__(self, enabled=True):
+        """
+        Args:
+            enabled (bool, optional): Record phases, False makes every call a no-op.
+        """
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._samples = []
+
+    def phase(self, phase, store="", item=""):
+        """Times the body of a `with` block.
+
+        Args:
+            phase (str): The phase, e.g. "page_load" or "sheet_write".
+            store (str, optional): Store key in `IDS`.
+            item (str, optional): The item being looked up.
+
+        Returns:
+            A context manager, phases that raise are recorded as failed.
+        """
+        if not self.enabled:
+            return NO_PHASE
+        return _Phase(self, phase, store or "", item or "")
+
+    def record(self, phase, seconds, store="", item="", failed=False):
+        """Adds a phase timed elsewhere.
+
+        Args:
+            phase (str): The phase.
+            seconds (float): How long it took.
+            store (str, optional): Store key in `IDS`.
+            item (str, optional): The item being looked up.
+            failed (bool, optional): The phase did not complete.
+        """
+        if self.enabled:
+            self.add(
+                PhaseSample(
+                    phase,
+                    store or "",
+                    item or "",
+                    time.time() - seconds,
+                    seconds,
+                    failed,
+                )
+            )
+
+    def add(self, sample):
+        with self._lock:
+            self._samples.append(sample)
+
+    def samples(self):
+        """Returns every recorded `PhaseSample`, in the order they finished."""
+        with self._lock:
+            return list(self._samples)
+
+    def summary(self):
+        """Summarises the samples per phase and store.
+
+        Returns:
+            list: One dict per phase and store with its count, failures, total,
+                p50, p95 and max seconds, in the order the phases were first seen.
+        """
+        groups = OrderedDict()
+        for sample in self.samples():
+            groups.setdefault((sample.phase, sample.store), []).append(sample)
+        summary = []
+        for (phase, store), samples in groups.items():
+            seconds = sorted(sample.seconds for sample in samples)
+            summary.append(
+                {
+                    "phase": phase,
+                    "store": store,
+                    "count": len(seconds),
+                    "failed": sum(1 for sample in samples if sample.failed),
+                    "total": sum(seconds),
+                    "p50": percentile(seconds, 0.5),
+                    "p95": percentile(seconds, 0.95),
+                    "max": seconds[-1],
+                }
+            )
+        return summary
+
+    def to_json(self, indent=None):
+        """Returns the summary and every sample as a JSON document."""
+        return json.dumps(
+            {
+                "started_at": self.started_at,
+                "phases": self.summary(),
+                "samples": [sample._asdict() for sample in self.samples()],
+            },
+            indent=indent,
+        )
+
+    def to_prometheus(self):
+        """Returns the summary in the Prometheus text exposition format."""
+        summary = self.summary()
+        lines = [
+            f"# HELP {METRIC} Time spent in each phase of a run.",
+            f"# TYPE {METRIC} summary",
+        ]
+        for row in summary:
+            labels = f'phase="{escape(row["phase"])}",store="{escape(row["store"])}"'
+            lines += [
+                f'{METRIC}{{{labels},quantile="0.5"}} {row["p50"]:.6f}',
+                f'{METRIC}{{{labels},quantile="0.95"}} {row["p95"]:.6f}',
+                f"{METRIC}_sum{{{labels}}} {row['total']:.6f}",
+                f"{METRIC}_count{{{labels}}} {row['count']}",
+            ]
+        lines += [
+            f"# HELP {FAILURES_METRIC} Phases that raised an error.",
+            f"# TYPE {FAILURES_METRIC} counter",
+        ]
+        for row in summary:
+            labels = f'phase="{escape(row["phase"])}",store="{escape(row["store"])}"'
+            lines.append(f"{FAILURES_METRIC}{{{labels}}} {row['failed']}")
+        return "\n".join(lines) + "\n"
+
+    def save(self, path):
+        """Writes the profile to `path`, in the Prometheus format for ".prom" files
+        and as JSON otherwise."""
+        text = self.to_prometheus() if str(path).endswith(".prom") else self.to_json()
+        with open(str(path), "w") as profile:
+            profile.write(text)
+
+    def format_report(self):
+        """Returns the summary as a text table."""
+        lines = [
+            f"{'phase':<22}{'store':<12}{'count':>7}{'failed':>8}"
+            f"{'total':>10}{'p50':>9}{'p95':>9}{'max':>9}"
+        ]
+        for row in self.summary():
+            lines.append(
+                f"{row['phase']:<22}{row['store'] or '-':<12}{row['count']:>7}"
+                f"{row['failed']:>8}{row['total']:>9.2f}s{row['p50']:>8.2f}s"
+                f"{row['p95']:>8.2f}s{row['max']:>8.2f}s"
+            )
+        return "\n".join(lines)
+
+
+def escape(label):
+    """Escapes a Prometheus label value."""
+    return label.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,173 @@
+import functools
+from urllib.parse import urljoin
+
+from .catalog import product_tokens
+from .common import IDS, LoggingClass, ShoppingList
+from .stores import get_adapter
+
+__all__ = ["ResultsExtractor", "match_score"]
+
+
+@functools.lru_cache(maxsize=None)
+def html_parser():
+    """Returns the fastest installed BeautifulSoup parser, lxml when available."""
+    try:
+        import lxml  # noqa: F401
+    except ImportError:
+        return "html.parser"
+    return "lxml"
+
+
+def make_soup(markup):
+    """Parses a page, BeautifulSoup is only imported the first time a page is
+    parsed so that runs which never scrape do not pay for it.
+
+    Args:
+        markup (str): The page's HTML.
+
+    Returns:
+        BeautifulSoup: The parsed page.
+    """
+    from bs4 import BeautifulSoup
+
+    return BeautifulSoup(markup, html_parser())
+
+
+def match_score(item, name):
+    """Scores how well a product name matches the item searched for.
+
+    Sizes are compared in the same unit, so "1kg" matches "1000g".
+
+    Args:
+        item (str): The item searched for, e.g. "jungle oats 1kg".
+        name (str): A product name from the search results.
+
+    Returns:
+        tuple: The share of the item's words found in the name, then the share of
+            the name's words that were searched for, higher is better.
+    """
+    wanted = set(product_tokens(item))
+    found = set(product_tokens(name))
+    if not wanted or not found:
+        return (0.0, 0.0)
+    common = len(wanted & found)
+    return (common / len(wanted), common / len(found))
+
+
+class ResultsExtractor(LoggingClass):
+    """
+    Reads the name, price and link of every product tile on a store's search
+    results page in one pass, so the best match, or the cheapest of the closest
+    matches, is known without loading each product page.
+
+    Stores opt in with "result_tile_css" and "result_name_css" in `IDS`, plus
+    "result_price_css" when the tiles show prices. The link is read with
+    "result_link_css" inside each tile.
+
+    Attributes:
+        ids (dict): Per store selectors, see `IDS`.
+    """
+
+    def __init__(self, ids=IDS):
+        """
+        Args:
+            ids (dict, optional): Per store selectors, see `IDS`.
+        """
+        self.ids = ids
+
+    def has_tiles(self, store):
+        """Whether the results page of `store` can be read tile by tile."""
+        store_ids = self.ids.get(store, {})
+        return bool(
+            store_ids.get("result_tile_css") and store_ids.get("result_name_css")
+        )
+
+    def extract(self, page_source, store, base_url=""):
+        """Reads every product tile on a search results page.
+
+        Args:
+            page_source (str): The results page's HTML.
+            store (str): Store key in `IDS`.
+            base_url (str, optional): The results page's url, to resolve links.
+
+        Returns:
+            list: A `ShoppingList` per tile in page order, the price is None when
+                the tile shows none or it could not be read.
+        """
+        if not self.has_tiles(store):
+            return []
+        store_ids = self.ids[store]
+        soup = make_soup(page_source)
+        try:
+            return [
+                self._tile(tile, store, store_ids, base_url)
+                for tile in soup.select(store_ids["result_tile_css"])
+            ]
+        finally:
+            soup.decompose()
+
+    def rank(self, item, candidates, top_n=None):
+        """Orders candidates from the best to the worst match for `item`, keeping
+        the page order between equally good matches.
+
+        Candidates sharing no word with the item are left out, such as the
+        promotions a store shows when nothing matched the search.
+
+        Args:
+            item (str): The item searched for.
+            candidates (list): `ShoppingList` results, as returned by `extract`.
+            top_n (int, optional): Only keep this many.
+
+        Returns:
+            list: The matching `ShoppingList` results, named ones only.
+        """
+        scored = [
+            (match_score(item, candidate.item_name), candidate)
+            for candidate in candidates
+            if candidate.item_name
+        ]
+        ranked = [
+            candidate
+            for score, candidate in sorted(
+                scored, key=lambda scored: scored[0], reverse=True
+            )
+            if score[0] > 0
+        ]
+        return ranked[:top_n] if top_n else ranked
+
+    def best_match(self, item, page_source, store, base_url=""):
+        """Returns the tile that best matches `item`, or None if none matches."""
+        ranked = self.rank(item, self.extract(page_source, store, base_url), top_n=1)
+        return ranked[0] if ranked else None
+
+    @staticmethod
+    def cheapest(candidates):
+        """Returns the cheapest of the candidates with a price, or None."""
+        priced = [
+            candidate for candidate in candidates if candidate.price_cents is not None
+        ]
+        return min(priced, key=lambda candidate: candidate.price_cents, default=None)
+
+    def _tile(self, tile, store, store_ids, base_url):
+        name_element = tile.select_one(store_ids["result_name_css"])
+        name = element_text(name_element).split("\n")[0] if name_element else None
+        link = tile.select_one(store_ids.get("result_link_css", "a"))
+        url = urljoin(base_url, link["href"]) if link and link.get("href") else None
+        price = None
+        if store_ids.get("result_price_css"):
+            price_element = tile.select_one(store_ids["result_price_css"])
+            price_text = element_text(price_element) if price_element else ""
+            if price_text:
+                try:
+                    price = get_adapter(store).parse_price(price_text)
+                except ValueError:
+                    self.logger.debug(f"Unexpected price {price_text!r} on {store}.")
+        return ShoppingList(
+            item_name=name.title() if name else None, item_price=price, item_url=url
+        )
+
+
+def element_text(element):
+    """Returns the element's text laid out in lines like Selenium's `.text`."""
+    lines = (" ".join(line.split()) for line in element.get_text().splitlines())
+    return "\n".join(line for line in lines if line)
@@ -0,0 +1,138 @@
+import time
+from collections import defaultdict
+
+import gspread
+from gspread.exceptions import APIError
+
+from .common import LoggingClass
+
+__all__ = ["SheetSnapshot", "SheetWriter"]
+
+# Status codes worth retrying: quota exceeded and transient server errors.
+RETRY_STATUS_CODES = (429, 500, 502, 503)
+
+
+class SheetWriter(LoggingClass):
+    """
+    Writes cells to a worksheet in a few range updates instead of one API call per
+    cell, backing off when the Sheets API quota is exceeded.
+
+    Attributes:
+        sheet (gspread.Worksheet): The worksheet to write to.
+        chunk_size (int): Maximum number of cells per API call.
+        retries (int): Attempts per chunk before giving up.
+        backoff (float): Seconds to wait before the first retry, doubled after each.
+    """
+
+    def __init__(
+        self, sheet, chunk_size=1000, retries=5, backoff=2.0, sleep=time.sleep
+    ):
+        """
+        Args:
+            sheet (gspread.Worksheet): The worksheet to write to.
+            chunk_size (int, optional): Maximum number of cells per API call.
+            retries (int, optional): Attempts per chunk before giving up.
+            backoff (float, optional): Seconds to wait before the first retry.
+            sleep (callable, optional): Used to wait between retries.
+        """
+        self.sheet = sheet
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.backoff = backoff
+        self._sleep = sleep
+
+    def write(self, cells):
+        """Writes the cells, a row band of at most `chunk_size` cells per API call.
+
+        Cells whose value is None are left untouched on the sheet.
+
+        Args:
+            cells (list): `gspread.Cell` objects to write.
+
+        Returns:
+            int: Number of API calls made, including retries.
+        """
+        cells = sorted(cells, key=lambda cell: (cell.row, cell.col))
+        calls = 0
+        for start in range(0, len(cells), self.chunk_size):
+            chunk = cells[start : start + self.chunk_size]
+            calls += self._write_chunk(chunk)
+            self.logger.info(
+                f"Wrote {len(chunk)} cells to rows {chunk[0].row}-{chunk[-1].row}."
+            )
+        return calls
+
+    def _write_chunk(self, chunk):
+        delay = self.backoff
+        for attempt in range(1, self.retries + 1):
+            try:
+                self.sheet.update_cells(chunk, value_input_option="USER_ENTERED")
+                return attempt
+            except APIError as error:
+                status_code = getattr(
+                    getattr(error, "response", None), "status_code", None
+                )
+                if status_code not in RETRY_STATUS_CODES or attempt == self.retries:
+                    raise
+                self.logger.warning(
+                    f"Sheets API returned {status_code}, retrying in {delay:.0f}s."
+                )
+                self._sleep(delay)
+                delay *= 2
+
+
+class SheetSnapshot:
+    """
+    An in-memory copy of a worksheet, read with a single API call, that answers
+    the `find`, `findall`, `row_values` and `col_values` lookups locally.
+
+    Attributes:
+        values (list): The worksheet's rows as lists of strings.
+    """
+
+    def __init__(self, sheet):
+        """
+        Args:
+            sheet (gspread.Worksheet): The worksheet to read.
+        """
+        self.values = sheet.get_all_values()
+        self._index = defaultdict(list)
+        for row, row_values in enumerate(self.values, 1):
+            for col, value in enumerate(row_values, 1):
+                if value:
+                    self._index[value].append((row, col))
+
+    def find(self, query):
+        """Returns the first cell, row by row, whose value is `query` or None."""
+        coords = self._index.get(query)
+        return gspread.Cell(*coords[0], query) if coords else None
+
+    def findall(self, query):
+        """Returns every cell whose value is `query`, row by row."""
+        return [
+            gspread.Cell(row, col, query) for row, col in self._index.get(query, [])
+        ]
+
+    def cell_value(self, row, col):
+        """Returns the value of the cell at `row`, `col` (1-based)."""
+        try:
+            return self.values[row - 1][col - 1]
+        except IndexError:
+            return ""
+
+    def row_values(self, row):
+        """Returns the values of `row` (1-based) up to its last non-empty cell."""
+        values = list(self.values[row - 1]) if row <= len(self.values) else []
+        return self._trim(values)
+
+    def col_values(self, col):
+        """Returns the values of `col` (1-based) up to its last non-empty cell."""
+        return self._trim(
+            [self.cell_value(row, col) for row in range(1, len(self.values) + 1)]
+        )
+
+    @staticmethod
+    def _trim(values):
+        while values and not values[-1]:
+            values.pop()
+        return values
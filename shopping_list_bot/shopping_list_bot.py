@@ -1,13 +1,6 @@
-import logging
-import random
-import os
-import re
 import sys
 import time
-from collections import defaultdict
-
-import coloredlogs
-from bs4 import BeautifulSoup
+from urllib.parse import quote_plus
 
 from selenium import webdriver
 from selenium.common.exceptions import TimeoutException
@@ -15,130 +8,88 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.firefox.options import Options
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import Select, WebDriverWait
 
+from .common import *
+from .profiler import RunProfiler
+from .stores import get_adapter, store_key
+from .waits import WaitTimings, page_is_ready, url_changed_or_stale, wait_until
+
+__all__ = [
+    "DEFAULT_TIMEOUTS",
+    "IDS",
+    "TIMEOUT",
+    "URLS",
+    "LoggingClass",
+    "ShoppingBot",
+    "ShoppingList",
+    "WebDriverSetup",
+    "clean_price",
+    "disable_images_firefox_profile",
+    "firefox_driver",
+    "to_cents",
+]
 
-TIMEOUT = 30
 
-URLS = [
-    "https://www.makro.co.za/",
-    "https://www.game.co.za/",
-    "https://www.pnp.co.za/",
-    "https://www.woolworths.co.za/",
-    "https://www.takealot.com/",
-]
+def disable_images_firefox_profile():
+    """Returns a Firefox profile with images and Flash disabled."""
+    # get the Firefox profile object
+    firefoxProfile = webdriver.FirefoxProfile()
+    # Disable images
+    firefoxProfile.set_preference("permissions.default.image", 2)
+    # Disable Flash
+    firefoxProfile.set_preference("dom.ipc.plugins.enabled.libflashplayer.so", "false")
+    # Set the modified profile while creating the browser object
+    return firefoxProfile
 
-IDS = {
-    "makro": {
-        "first_result_xpath": "/html/body/main/div[9]/div[3]/div/div[1]/div[3]/div[2]/div/div/div[2]/div[1]",
-        "price_product": "product-ProductNamePrice",
-        "price_promotion": "product-PromotionSection",
-        "product_name": "name",
-        "search_button_xpath": "/html/body/main/div[2]/div/div[2]/div/div/div[4]/div/div/div/div/div[2]/div/form/span[2]/a/i",
-        "search_input_id": "js-site-search-input",
-    },
-    "game": {
-        "first_result_xpath": "/html/body/main/div[3]/div[2]/div[2]/div/div/div/ul/div[1]/a/div",
-        "price_product": "pdp_price",
-        "price_promotion": "pdp_price",
-        "product_name": "name",
-        "search_button_xpath": "/html/body/main/header/nav[1]/div/div[2]/div[2]/div/div/div/form/div/span/button",
-        "search_input_id": "js-site-search-input",
-    },
-    "pnp": {
-        "first_result_xpath": "/html/body/main/div[4]/div[2]/div/div[1]/div[3]/div[2]/div[2]/div[1]/ul/div[1]/div/div[3]/a/div[1]",
-        "price_product": "normalPrice",
-        "price_promotion": "pricedata-Save",
-        "product_name": "fed-pdp-product-details-title",
-        "search_button_xpath": "/html/body/main/header/div[1]/div[2]/div/div[7]/div/form/div/span/button/span",
-        "search_input_id": "js-site-search-input",
-    },
-    "woolworths": {
-        "first_result_xpath": "/html/body/div/div/div/main/div/div/div/div[1]/div[1]/div[3]/div[1]/article/div[2]/a/h2",
-        "price_product": "price",
-        "price_promotion": "price",
-        "product_name": "ffont-graphic heading--400 heading--sub no-wrap--ellipsis",
-        "search_button_xpath": "/html/body/div/div/header/div[2]/div/section[3]/div/div/form/input[3]",
-        "search_input_id": "fldSearch",
-    },
-    "takealot": {
-        "first_result_xpath": '//*[@id="pos_link_0"]',
-        "price_product": "sf-price",
-        "price_promotion": "buybox-module_price_2YUFa",
-        "product_name": "product-title",
-        "search_button_xpath": "/html/body/div[3]/div/div[2]/form/fieldset/input[5]",
-        "search_input_id": "search",
-    },
-}
-
-
-class ShoppingList:
-    def __init__(self, item_name, item_price, item_url):
-        self.item_name = item_name
-        self.item_price = item_price
-        self.item_url = item_url
-
-    def __repr__(self):
-        return "<%s.%s(item_name='%s', item_price='%s') at 0x%x>" % (
-            self.__class__.__module__,
-            self.__class__.__name__,
-            self.item_name,
-            self.item_price,
-            id(self),
-        )
 
+def firefox_driver(headless=True, timeout=TIMEOUT):
+    """Starts a new Firefox session.
 
-class LoggingClass:
-    @property
-    def logger(self):
-        log_format = (
-            "%(asctime)s - %(name)s - %(levelname)s - %(module)s - "
-            "%(pathname)s : %(lineno)d - %(message)s"
-        )
-        name = ".".join([os.path.basename(sys.argv[0]), self.__class__.__name__])
-        logging.basicConfig(format=log_format)
-        return logging.getLogger(name)
+    Args:
+        headless (bool, optional): Run Firefox without a window.
+        timeout (int, optional): Seconds to wait for the browser to start.
+
+    Returns:
+        webdriver.Firefox: The browser session.
+    """
+    options = Options()
+    options.headless = headless
+    return webdriver.Firefox(
+        firefox_profile=disable_images_firefox_profile(),
+        options=options,
+        timeout=timeout,
+    )
 
 
 class WebDriverSetup:
-    def __init__(self, url, headless):
+    def __init__(self, url, headless, pool=None, profiler=None, open_store=True):
         self._timeout = TIMEOUT
-        self._options = Options()
-        self._options.headless = headless
-        self._profile = self._disable_Images_Firefox_Profile()
-
-        self.driver = webdriver.Firefox(
-            firefox_profile=self._profile, options=self._options, timeout=self._timeout
-        )
-
-        if self._options.headless:
-            self.logger.info("Headless Firefox Initialized.")
+        self._pool = pool
+        self.profiler = profiler or RunProfiler(enabled=False)
+        store = store_key(url)
+        with self.profiler.phase("browser_start", store):
+            if pool is None:
+                self.driver = firefox_driver(headless=headless, timeout=self._timeout)
+                if headless:
+                    self.logger.info("Headless Firefox Initialized.")
+            else:
+                self.driver = pool.acquire()
+        self._session_open = True
+        if not open_store:
+            return
 
         try:
             # Navigate to the makro URL.
             self.logger.info(f"Navigating to {url}.")
-            self.driver.get(url)
+            with self.profiler.phase("page_load", store):
+                self.driver.get(url)
         except TimeoutException:
             self.logger.exception("Timed-out while loading page.")
-            self.close_session()
+            self.close_session(discard=True)
             sys.exit(1)
-        else:
-            # Obtain the source
-            self.html = self.driver.page_source
-            self.soup = BeautifulSoup(self.html, "html.parser")
-            self.html_source = self.soup.prettify("utf-8")
-
-    def _disable_Images_Firefox_Profile(self):
-        # get the Firefox profile object
-        firefoxProfile = webdriver.FirefoxProfile()
-        # Disable images
-        firefoxProfile.set_preference("permissions.default.image", 2)
-        # Disable Flash
-        firefoxProfile.set_preference(
-            "dom.ipc.plugins.enabled.libflashplayer.so", "false"
-        )
-        # Set the modified profile while creating the browser object
-        return firefoxProfile
+        except BaseException:
+            self.close_session(discard=True)
+            raise
 
 
 class ShoppingBot(WebDriverSetup, LoggingClass):
@@ -150,120 +101,352 @@ class ShoppingBot(WebDriverSetup, LoggingClass):
         ids (TYPE): Description
         item (TYPE): Description
         items (TYPE): Description
-        shopping_cart (TYPE): Description
+        results (list): A `ShoppingList` per item searched, in order.
         url (TYPE): Description
+        top_n (int): Number of closest search results kept per item.
+        candidates (dict): Item mapped to its closest `top_n` search results, with
+            prices where the results page shows them.
+        on_result (callable): Called with the index of each item and its
+            `ShoppingList` as soon as it is read, or None.
+        catalog (ProductCatalog): Known products, opened without searching, or
+            None.
+        health (HealthMonitor): Adapts the timeouts to the store and stops
+            searching it when its selectors keep failing, or None.
+
+    Pass `open_store=False` to skip loading the store's homepage when the session
+    starts, for sessions that only open known product pages with `get_prices`.
     """
 
-    def __init__(self, items, url="", ids=IDS, log_level="INFO", headless=True):
+    def __init__(
+        self,
+        items,
+        url="",
+        ids=IDS,
+        log_level="INFO",
+        headless=True,
+        pool=None,
+        profiler=None,
+        top_n=0,
+        on_result=None,
+        catalog=None,
+        health=None,
+        open_store=True,
+    ):
+        # Imported here as the results module depends on this one.
+        from .results import ResultsExtractor
+
         assert isinstance(items, list)
         self.items = items
         assert isinstance(url, str)
         self.url = url
+        self.store = store_key(url)
+        self.adapter = get_adapter(self.store)
         assert isinstance(ids, dict)
         self.ids = ids
-        self.shopping_cart = defaultdict(list)
+        self.results = []
         self.item = None
+        self.extractor = ResultsExtractor(ids)
+        self.top_n = top_n
+        self.candidates = {}
+        self.on_result = on_result
+        self.catalog = catalog
+        self.health = health
+        self.wait_timings = WaitTimings()
         self.logger.setLevel(log_level.upper())
+        import coloredlogs
+
         coloredlogs.install(level=log_level.upper())
-        super().__init__(url, headless)
+        super().__init__(
+            url, headless, pool=pool, profiler=profiler, open_store=open_store
+        )
 
     def search_items(self):
         """Searches through the list of items obtained from spreadsheet and
         obtains name, price, and URL information for each item."""
+        try:
+            self._search_items()
+        except BaseException:
+            # Quit the browser, it may be broken, and free its slot in the pool.
+            self.close_session(discard=True)
+            raise
+        self.close_session()
+
+    def _search_items(self):
+        search_url = self.ids[self.store].get("search_url")
         for count, self.item in enumerate(self.items, 1):
-            self.driver.get(self.url)
-            time.sleep(0.3)
+            if self.store_failing():
+                break
             self.logger.info(
                 f"Searching on url: {self.url} for item #{count}: {self.item}..."
             )
-            try:
-                search_input_id = self.ids[self.url.split(".")[1]]["search_input_id"]
-                self.logger.debug(f"inserting {self.item} on search bar")
-                search_input = WebDriverWait(self.driver, self._timeout).until(
-                    EC.presence_of_element_located((By.ID, search_input_id))
-                )
-            except Exception:
-                self.logger.error(f"Could not insert {self.item} to the search bar.")
-            else:
-                search_input = self.driver.find_element_by_id(search_input_id)
-                search_input.send_keys(self.item)
-                self.logger.info(f"Now searching for {self.item}.")
-                search_input.send_keys(Keys.RETURN)
+            with self.profiler.phase("item", self.store, self.item):
+                known = self.open_known_product()
+                if known is not None:
+                    self._add_result(known)
+                    continue
+                if search_url:
+                    self.open_search_results(search_url)
+                else:
+                    self.submit_search_form()
+
+                best = self.read_results_page()
+                if best is not None and best.item_name is None:
+                    self.logger.info(
+                        f"No search result on {self.url} matches {self.item}."
+                    )
+                    self._add_result(best)
+                    continue
+                if best is not None and best.item_price is not None:
+                    self.logger.info(
+                        f"Found {self.item} with product name: {best.item_name} on "
+                        f"the results page of {self.url}."
+                    )
+                    self._add_result(best)
+                    continue
+                if best is not None and best.item_url:
+                    self.open_product_page(best.item_url)
+                else:
+                    self.open_first_result()
+                self._add_result(self.read_product_page())
+
+    def open_known_product(self):
+        """Opens the product page the `catalog` knows for the current item.
+
+        Returns:
+            ShoppingList: The product, or None when the catalog has no confident
+                match or its page no longer shows a product.
+        """
+        if self.catalog is None:
+            return None
+        match = self.catalog.lookup(self.store, self.item)
+        if match is None:
+            return None
+        self.open_product_page(match.item_url)
+        product = self.read_product_page()
+        if product.item_name is None:
+            self.logger.info(
+                f"Searching for {self.item} again, {match.item_url} moved."
+            )
+            return None
+        return product
+
+    def read_product_page(self):
+        """Reads the name, price and url off the open product page.
+
+        Returns:
+            ShoppingList: The product, all None when the page shows no product.
+        """
+        name = self.get_product_name()
+        if name == "Not Available":
+            return ShoppingList(item_name=None, item_price=None, item_url=None)
+        self.logger.info(f"Found {self.item} with product name: {name} on {self.url}.")
+        price = self.get_product_price()
+        return ShoppingList(
+            item_name=name, item_price=price, item_url=self.driver.current_url
+        )
 
+    def _add_result(self, result):
+        self.results.append(result)
+        if self.on_result is not None:
+            self.on_result(len(self.results) - 1, result)
+
+    @property
+    def shopping_cart(self):
+        """dict: The store name mapped to `results`."""
+        return {self.store.title(): self.results}
+
+    def read_results_page(self):
+        """Reads every product tile on the search results page at once and picks
+        the best match for the current item, keeping the closest `top_n` in
+        `candidates`.
+
+        Returns:
+            ShoppingList: The best match, with a price when the tiles show one, all
+                None when no tile matches the item, or None if the store's tiles
+                are unknown or none were found.
+        """
+        if not self.extractor.has_tiles(self.store):
+            return
+        with self.profiler.phase("parse_results", self.store, self.item):
+            tiles = self.extractor.extract(
+                self.driver.page_source, self.store, self.driver.current_url
+            )
+            candidates = self.extractor.rank(self.item, tiles)
+        if self.top_n:
+            self.candidates[self.item] = candidates[: self.top_n]
+        if candidates:
+            return candidates[0]
+        if any(tile.item_name for tile in tiles):
+            return ShoppingList(item_name=None, item_price=None, item_url=None)
+
+    def open_first_result(self):
+        """Clicks the first search result and waits for its product page."""
+        try:
+            if "woolworths" in self.url:
+                assert "couldn't find anything" not in self.driver.page_source
+            self.logger.debug("Selecting first result and open link, using xpath")
+            first_result_xpath = self.ids[self.store]["first_result_xpath"]
+            first_res = self._wait(
+                "first_result",
+                EC.element_to_be_clickable((By.XPATH, first_result_xpath)),
+            )
+        except Exception:
+            self.logger.error("No Data Available")
+        else:
+            results_url = self.driver.current_url
+            first_res.click()
+            try:
+                self._wait("product_page", EC.url_changes(results_url))
+                self._wait("page_ready", page_is_ready())
+            except TimeoutException:
+                self.logger.debug("Product page did not load a new url.")
+
+    def open_product_page(self, product_url):
+        """Loads the product page of the best search result."""
+        self.logger.debug(f"Opening {product_url} for {self.item}.")
+        with self.profiler.phase("page_load", self.store, self.item):
+            self.driver.get(product_url)
+        try:
+            self._wait("page_ready", page_is_ready())
+        except TimeoutException:
+            self.logger.debug(f"{product_url} is still loading.")
+
+    def open_search_results(self, search_url):
+        """Loads the store's search results page for the current item directly.
+
+        Args:
+            search_url (str): The store's search url template with a `{query}`
+                placeholder.
+        """
+        url = search_url.format(query=quote_plus(self.item))
+        self.logger.info(f"Now searching for {self.item} on {url}.")
+        with self.profiler.phase("page_load", self.store, self.item):
+            self.driver.get(url)
+        try:
+            self._wait("page_ready", page_is_ready())
+        except TimeoutException:
+            self.logger.debug(f"Search results for {self.item} are still loading.")
 
+    def submit_search_form(self):
+        """Searches for the current item by typing it into the store's search bar,
+        for stores without a search url template."""
+        with self.profiler.phase("page_load", self.store, self.item):
+            self.driver.get(self.url)
+        try:
+            self._wait("page_ready", page_is_ready())
+        except TimeoutException:
+            self.logger.debug(f"{self.url} is still loading.")
+        try:
+            search_input_id = self.ids[self.store]["search_input_id"]
+            self.logger.debug(f"inserting {self.item} on search bar")
+            search_input = self._wait(
+                "search_input",
+                EC.presence_of_element_located((By.ID, search_input_id)),
+            )
+        except Exception:
+            self.logger.error(f"Could not insert {self.item} to the search bar.")
+        else:
+            search_page_url = self.driver.current_url
+            search_input.send_keys(self.item)
+            self.logger.info(f"Now searching for {self.item}.")
+            search_input.send_keys(Keys.RETURN)
             try:
-                if "woolworths" in self.url:
-                    assert "couldn't find anything" not in self.driver.page_source
-                self.logger.debug("Selecting first result and open link, using xpath")
-                first_result_xpath = self.ids[self.url.split(".")[1]][
-                    "first_result_xpath"
-                ]
-                first_res = WebDriverWait(self.driver, self._timeout).until(
-                    EC.presence_of_element_located((By.XPATH, first_result_xpath))
+                self._wait(
+                    "search_submit", url_changed_or_stale(search_page_url, search_input)
                 )
-            except Exception:
-                self.logger.error("No Data Available")
-            else:
-                first_res = self.driver.find_element_by_xpath(first_result_xpath)
-                first_res.click()
-                time.sleep(0.5)
-
-            name = self.get_product_name()
-            if name == "Not Available":
-                name = None
-                price = None
-                current_url = None
-            else:
-                self.logger.info(
-                    f"Found {self.item} with product name: {name} on {self.url}.")
-                price = self.get_product_price()
-                current_url = self.driver.current_url
-
-            shop_name = self.url.split(".")[1].title()
-            self.shopping_cart[shop_name].append(
-                ShoppingList(item_name=name, item_price=price, item_url=current_url)
-            )
+            except TimeoutException:
+                self.logger.debug("Search results did not load a new page.")
+
+    def store_failing(self):
+        """Whether `health` stopped this store after repeated selector failures."""
+        if self.health is None or not self.health.is_open(self.store):
+            return False
+        self.logger.error(f"Skipping {self.item} and the rest on {self.url}.")
+        return True
+
+    def _wait(self, name, condition):
+        """Waits for `condition` using the store's timeout for the wait `name`,
+        shortened by `health` to what the store usually needs."""
+        timeouts = self.ids[self.store].get("timeouts", {})
+        timeout = timeouts.get(name, DEFAULT_TIMEOUTS[name])
+        if self.health is not None:
+            timeout = self.health.timeout(self.store, name, timeout)
+        start = time.perf_counter()
+        timed_out = True
+        try:
+            with self.profiler.phase(f"wait_{name}", self.store, self.item):
+                result = wait_until(
+                    self.driver, condition, timeout, name, self.wait_timings
+                )
+            timed_out = False
+            return result
+        finally:
+            if self.health is not None:
+                self.health.record_wait(
+                    self.store, name, time.perf_counter() - start, timed_out
+                )
+
+    def get_prices(self, product_urls):
+        """Re-reads the price of products whose pages are already known, skipping
+        the search.
+
+        Args:
+            product_urls (list): Product pages on this bot's store.
+
+        Returns:
+            list: The price of each product, None where it could not be read.
+        """
+        try:
+            prices = self._get_prices(product_urls)
+        except BaseException:
+            self.close_session(discard=True)
+            raise
         self.close_session()
+        return prices
+
+    def _get_prices(self, product_urls):
+        prices = []
+        for count, self.item in enumerate(product_urls, 1):
+            if self.store_failing():
+                prices.extend([None] * (len(product_urls) - count + 1))
+                break
+            self.logger.info(f"Refreshing price #{count}: {self.item}...")
+            try:
+                with self.profiler.phase("page_load", self.store):
+                    self.driver.get(self.item)
+                self._wait("page_ready", page_is_ready())
+            except TimeoutException:
+                self.logger.error(f"Timed-out while loading {self.item}.")
+                prices.append(None)
+                continue
+            prices.append(self.get_product_price())
+        return prices
 
     def get_product_price(self):
         """Gets and cleans product item price on the makro page."""
         price = None
         try:
             price = self.driver.find_element_by_class_name(
-                self.ids[self.url.split(".")[1]]["price_promotion"]
+                self.ids[self.store]["price_promotion"]
             ).text
-            time.sleep(0.5)
             assert isinstance(price, str) and price != ""
         except Exception:
             self.logger.debug(f"{self.item} is not on promotion, getting normal price.")
-            time.sleep(0.5)
-            prod_price = self.ids[self.url.split(".")[1]]["price_product"]
+            prod_price = self.ids[self.store]["price_product"]
             try:
-                price = WebDriverWait(self.driver, self._timeout).until(
-                    EC.presence_of_element_located((By.CLASS_NAME, prod_price))
-                )
+                price = self._wait(
+                    "price",
+                    EC.visibility_of_element_located((By.CLASS_NAME, prod_price)),
+                ).text
             except Exception:
                 self.logger.error(
                     f"Price information for {self.item} could not be retrieved."
                 )
                 return
-            else:
-                price = self.driver.find_element_by_class_name(prod_price).text
 
         try:
-            time.sleep(0.2)
-            if "takealot" in self.url.split(".")[1]:
-                return price.split("R")[-1]
-            elif "woolworths" in self.url.split(".")[1]:
-                return price.split("R")[-1].strip()
-            elif "makro" in self.url.split(".")[1]:
-                price = re.sub("\D", "", price.split("\n")[0]) if "R" in price else price
-                return "%.2f" % (float(price) / 100)
-            elif "pnp" in self.url.split(".")[1]:
-                return "%.2f" % (float(price.split("R")[-1]) / 100)
-            elif "game":
-                price = re.sub("\D", "", price.split("\n")[0])
-                return float(price) / 100
+            with self.profiler.phase("parse_price", self.store, self.item):
+                return self.adapter.parse_price(price)
         except Exception:
             self.logger.exception(
                 f"Failed to retrieve price for {self.item} on {self.url}"
@@ -278,7 +461,7 @@ class ShoppingBot(WebDriverSetup, LoggingClass):
             assert isinstance(product_name, str) and product_name != ""
         except Exception:
             product_name = self.driver.find_element_by_class_name(
-                self.ids[self.url.split(".")[1]]["product_name"]
+                self.ids[self.store]["product_name"]
             ).text.split("\n")[0]
 
         if (not product_name) or (product_name.lower() in self.driver.current_url):
@@ -286,10 +469,32 @@ class ShoppingBot(WebDriverSetup, LoggingClass):
             product_name = "Not Available"
         return product_name.title()
 
-    def close_session(self):
-        """Close the browser session."""
-        self.logger.info(f"Successfully closed {self.driver.current_url}!!!")
-        self.driver.close()
+    def close_session(self, discard=False):
+        """Close the browser session, or hand it back when leased from a pool.
+
+        Only the first call has an effect.
+
+        Args:
+            discard (bool, optional): Quit the browser instead of returning it to
+                the pool, after an error left it in an unknown state.
+        """
+        if not self._session_open:
+            return
+        self._session_open = False
+        if self._pool is not None:
+            self.logger.info(f"Returning browser session for {self.url} to the pool.")
+            self._pool.release(self.driver, discard=discard)
+        elif discard:
+            try:
+                self.driver.quit()
+            except Exception:
+                self.logger.debug(f"Browser session for {self.url} was already gone.")
+        else:
+            self.logger.info(f"Successfully closed {self.driver.current_url}!!!")
+            self.driver.close()
+        self.logger.info(
+            f"Wait timings for {self.url}:\n{self.wait_timings.format_report()}"
+        )
 
 
 if __name__ == "__main__":
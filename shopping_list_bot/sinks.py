@@ -0,0 +1,336 @@
+import csv
+import pathlib
+import sqlite3
+import time
+
+from .common import LoggingClass
+
+__all__ = [
+    "CsvSink",
+    "GoogleSheetSink",
+    "ParquetSink",
+    "ResultSink",
+    "SqliteSink",
+    "sink_for_path",
+]
+
+# Cells taken by a result on the spreadsheet: name, price and URL.
+CELLS_PER_RESULT = 3
+
+# Columns of the offline sinks, one row per store and item.
+COLUMNS = (
+    "store",
+    "position",
+    "item",
+    "item_name",
+    "price_cents",
+    "item_url",
+    "found_at",
+)
+
+
+def result_cells(prod_coord, count, result):
+    """Lays out a single result as the cells to write.
+
+    Args:
+        prod_coord (tuple): (row, column) of the store's first product name cell.
+        count (int): Index of the item on the spreadsheet.
+        result (ShoppingList): The product found for the item.
+
+    Returns:
+        list: `gspread.Cell` objects with the name, price and URL of the product.
+    """
+    import gspread
+
+    row, col = prod_coord
+    return [
+        gspread.Cell(row + count, col, result.item_name),
+        gspread.Cell(row + count, col + 1, result.item_price),
+        gspread.Cell(row + count, col + 2, result.item_url),
+    ]
+
+
+class ResultSink(LoggingClass):
+    """
+    Where a `ResultPipeline` writes the results of a crawl, a batch at a time.
+
+    Subclasses implement `write`, and `open` and `close` when they hold a file or
+    connection. Results are given as (store name, item index, `ShoppingList`)
+    tuples, `items` maps the index back to the item searched for.
+
+    Attributes:
+        batch_size (int): Results written at once by default.
+        phase (str): Name of the `RunProfiler` phase timing the writes.
+        items (list): The items of the run, set by `open`.
+        results (int): Number of results written so far.
+    """
+
+    batch_size = 500
+    phase = "sink_write"
+
+    def __init__(self):
+        self.items = []
+        self.results = 0
+
+    def open(self, items=None):
+        """Prepares for a run over the items, called before the first `write`."""
+        self.items = list(items or [])
+
+    def accepts(self, shop_name):
+        """Whether results of the store can be written, others are dropped."""
+        return True
+
+    def write(self, results):
+        """Writes a batch of results.
+
+        Args:
+            results (list): (store name, item index, `ShoppingList`) tuples.
+
+        Returns:
+            int: Number of API calls or writes made.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Flushes and releases whatever `open` acquired."""
+
+    def rows(self, results):
+        """Returns a row of `COLUMNS` per result, prices in cents."""
+        found_at = time.time()
+        for shop_name, count, result in results:
+            item = self.items[count] if count < len(self.items) else None
+            yield (
+                shop_name,
+                count,
+                item,
+                result.item_name,
+                result.price_cents,
+                result.item_url,
+                found_at,
+            )
+
+
+class GoogleSheetSink(ResultSink):
+    """
+    Writes results into the product columns of a shopping list worksheet.
+
+    Attributes:
+        writer (SheetWriter): Writes the cells to the worksheet.
+        product_columns (dict): Store name mapped to the (row, column) of its first
+            product name cell.
+        cells (int): Number of cells written so far.
+    """
+
+    phase = "sheet_write"
+
+    def __init__(self, writer, product_columns):
+        """
+        Args:
+            writer (SheetWriter): Writes the cells to the worksheet.
+            product_columns (dict): Store name mapped to the (row, column) of its
+                first product name cell.
+        """
+        super().__init__()
+        self.writer = writer
+        self.product_columns = product_columns
+        # A batch fits in a single API call.
+        self.batch_size = max(1, writer.chunk_size // CELLS_PER_RESULT)
+        self.cells = 0
+        self._unknown = set()
+
+    def accepts(self, shop_name):
+        if shop_name in self.product_columns:
+            return True
+        if shop_name not in self._unknown:
+            self._unknown.add(shop_name)
+            self.logger.error(f"{shop_name} has no columns on the spreadsheet.")
+        return False
+
+    def write(self, results):
+        cells = []
+        for shop_name, count, result in results:
+            cells.extend(result_cells(self.product_columns[shop_name], count, result))
+        calls = self.writer.write(cells)
+        self.cells += len(cells)
+        self.results += len(results)
+        return calls
+
+
+class CsvSink(ResultSink):
+    """
+    Streams results to a CSV file, flushed after every batch so the file can be
+    followed while the stores are crawled.
+
+    Attributes:
+        path (pathlib.Path): The CSV file, overwritten by `open`.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): The CSV file.
+        """
+        super().__init__()
+        self.path = pathlib.Path(path)
+        self._file = None
+        self._writer = None
+
+    def open(self, items=None):
+        super().open(items)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(COLUMNS)
+
+    def write(self, results):
+        rows = list(self.rows(results))
+        self._writer.writerows(rows)
+        self._file.flush()
+        self.results += len(rows)
+        return 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class SqliteSink(ResultSink):
+    """
+    Appends results to a table of a SQLite database, one transaction per batch.
+
+    Attributes:
+        path (pathlib.Path): The SQLite database, created when missing.
+        table (str): The table, created when missing.
+    """
+
+    def __init__(self, path, table="results"):
+        """
+        Args:
+            path (str): The SQLite database.
+            table (str, optional): The table to append to.
+        """
+        super().__init__()
+        self.path = pathlib.Path(path)
+        self.table = table
+        self._db = None
+
+    def open(self, items=None):
+        super().open(items)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} (store TEXT NOT NULL, "
+                "position INTEGER, item TEXT, item_name TEXT, price_cents INTEGER, "
+                "item_url TEXT, found_at REAL NOT NULL)"
+            )
+
+    def write(self, results):
+        rows = list(self.rows(results))
+        with self._db:
+            self._db.executemany(
+                f"INSERT INTO {self.table} VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        self.results += len(rows)
+        return 1
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class ParquetSink(ResultSink):
+    """
+    Writes results to a Parquet file, a row group per batch built column by
+    column. Needs the optional `pyarrow` package (`pip install pyarrow`).
+
+    Attributes:
+        path (pathlib.Path): The Parquet file, overwritten by `open`.
+    """
+
+    batch_size = 5000
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): The Parquet file.
+
+        Raises:
+            ImportError: If pyarrow is not installed.
+        """
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as error:
+            raise ImportError(
+                "Writing Parquet files needs pyarrow, run `pip install pyarrow`."
+            ) from error
+        super().__init__()
+        self.path = pathlib.Path(path)
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self._schema = pyarrow.schema(
+            [
+                ("store", pyarrow.string()),
+                ("position", pyarrow.int32()),
+                ("item", pyarrow.string()),
+                ("item_name", pyarrow.string()),
+                ("price_cents", pyarrow.int64()),
+                ("item_url", pyarrow.string()),
+                ("found_at", pyarrow.float64()),
+            ]
+        )
+        self._writer = None
+
+    def open(self, items=None):
+        super().open(items)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._writer = self._pq.ParquetWriter(str(self.path), self._schema)
+
+    def write(self, results):
+        rows = list(self.rows(results))
+        columns = [
+            self._pa.array([row[index] for row in rows], type=field.type)
+            for index, field in enumerate(self._schema)
+        ]
+        table = self._pa.Table.from_arrays(columns, schema=self._schema)
+        self._writer.write_table(table)
+        self.results += table.num_rows
+        return 1
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+# File extension mapped to the sink writing it.
+SINKS = {
+    ".csv": CsvSink,
+    ".parquet": ParquetSink,
+    ".db": SqliteSink,
+    ".sqlite": SqliteSink,
+    ".sqlite3": SqliteSink,
+}
+
+
+def sink_for_path(path):
+    """Creates the sink writing the kind of file `path` names.
+
+    Args:
+        path (str): A .csv, .parquet, .db, .sqlite or .sqlite3 file.
+
+    Returns:
+        ResultSink: The sink.
+
+    Raises:
+        ValueError: If the extension is not supported.
+    """
+    suffix = pathlib.Path(path).suffix.lower()
+    if suffix not in SINKS:
+        raise ValueError(
+            f"Cannot write {path}, use one of {', '.join(sorted(SINKS))} files."
+        )
+    return SINKS[suffix](path)
@@ -0,0 +1,109 @@
+import re
+
+__all__ = ["StoreAdapter", "UnknownStore", "get_adapter", "register_store", "store_key"]
+
+NON_DIGITS = re.compile(r"\D")
+
+ADAPTERS = {}
+
+
+class UnknownStore(ValueError):
+    """Raised when no adapter is registered for a store."""
+
+
+def store_key(url):
+    """Returns the store key in `IDS` for a store url, e.g. "makro" for
+    "https://www.makro.co.za/"."""
+    parts = url.split(".")
+    return parts[1] if len(parts) > 1 else ""
+
+
+def register_store(adapter_class):
+    """Class decorator adding a `StoreAdapter` to the registry under its `key`.
+
+    Registering a key again replaces the previous adapter.
+    """
+    ADAPTERS[adapter_class.key] = adapter_class()
+    return adapter_class
+
+
+def get_adapter(store):
+    """Returns the adapter for a store key in `IDS`.
+
+    Raises:
+        UnknownStore: If no adapter is registered for `store`.
+    """
+    try:
+        return ADAPTERS[store]
+    except KeyError:
+        raise UnknownStore(f"No adapter registered for {store!r}.") from None
+
+
+class StoreAdapter:
+    """
+    Parses what a store shows on its pages. Subclass it, set `key` to the store's
+    key in `IDS` and decorate it with `register_store` to add a store.
+
+    Attributes:
+        key (str): Store key in `IDS`, e.g. "makro".
+    """
+
+    key = ""
+
+    def parse_price(self, price):
+        """Turns the price text scraped from the store into a price.
+
+        Args:
+            price (str): Price text as shown on the store's page.
+
+        Returns:
+            The price in Rand.
+
+        Raises:
+            ValueError: If the text holds no price.
+        """
+        raise NotImplementedError
+
+
+@register_store
+class Makro(StoreAdapter):
+    key = "makro"
+
+    def parse_price(self, price):
+        # "R 49\n99" with the cents raised, or the cents on their own.
+        if "R" in price:
+            price = NON_DIGITS.sub("", price.split("\n")[0])
+        return "%.2f" % (float(price) / 100)
+
+
+@register_store
+class Game(StoreAdapter):
+    key = "game"
+
+    def parse_price(self, price):
+        return float(NON_DIGITS.sub("", price.split("\n")[0])) / 100
+
+
+@register_store
+class PnP(StoreAdapter):
+    key = "pnp"
+
+    def parse_price(self, price):
+        # Cents without a decimal point, e.g. "R2999".
+        return "%.2f" % (float(price.split("R")[-1]) / 100)
+
+
+@register_store
+class Woolworths(StoreAdapter):
+    key = "woolworths"
+
+    def parse_price(self, price):
+        return price.split("R")[-1].strip()
+
+
+@register_store
+class Takealot(StoreAdapter):
+    key = "takealot"
+
+    def parse_price(self, price):
+        return price.split("R")[-1]
@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import OrderedDict
+
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.webdriver.support.ui import WebDriverWait
+
+__all__ = [
+    "WaitTimings",
+    "page_is_ready",
+    "url_changed_or_stale",
+    "wait_until",
+]
+
+POLL_FREQUENCY = 0.1
+
+
+class page_is_ready:
+    """An expectation that the document finished loading."""
+
+    def __call__(self, driver):
+        return driver.execute_script("return document.readyState") == "complete"
+
+
+class url_changed_or_stale:
+    """An expectation that the browser left the page `element` was found on.
+
+    Single page stores change the url without replacing the search form, others
+    reload the page and the element goes stale while the url may stay the same.
+
+    Args:
+        url (str): The url before the navigation.
+        element (WebElement, optional): An element of the old page.
+    """
+
+    def __init__(self, url, element=None):
+        self.url = url
+        self.element = element
+
+    def __call__(self, driver):
+        if driver.current_url != self.url:
+            return True
+        if self.element is None:
+            return False
+        try:
+            # Calling any method forces a staleness check.
+            self.element.is_enabled()
+        except StaleElementReferenceException:
+            return True
+        return False
+
+
+class WaitTimings:
+    """
+    Records how long each named wait took, to tune the per store timeouts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waits = OrderedDict()
+
+    def record(self, name, seconds, timed_out=False):
+        """Adds a measurement for the wait `name`.
+
+        Args:
+            name (str): The wait, e.g. "page_ready" or "first_result".
+            seconds (float): How long the wait took.
+            timed_out (bool, optional): The condition was never met.
+        """
+        with self._lock:
+            self._waits.setdefault(name, []).append((seconds, timed_out))
+
+    def report(self):
+        """Summarises the recorded waits.
+
+        Returns:
+            list: One dict per wait with its count, time-outs, total, mean and max
+                seconds.
+        """
+        with self._lock:
+            waits = [(name, list(records)) for name, records in self._waits.items()]
+        summary = []
+        for name, records in waits:
+            seconds = [record[0] for record in records]
+            summary.append(
+                {
+                    "wait": name,
+                    "count": len(records),
+                    "timeouts": sum(1 for record in records if record[1]),
+                    "total": sum(seconds),
+                    "mean": sum(seconds) / len(seconds),
+                    "max": max(seconds),
+                }
+            )
+        return summary
+
+    def format_report(self):
+        """Returns the report as a text table."""
+        lines = [
+            f"{'wait':<16}{'count':>7}{'timeouts':>10}{'total':>10}{'mean':>9}{'max':>9}"
+        ]
+        for row in self.report():
+            lines.append(
+                f"{row['wait']:<16}{row['count']:>7}{row['timeouts']:>10}"
+                f"{row['total']:>9.2f}s{row['mean']:>8.2f}s{row['max']:>8.2f}s"
+            )
+        return "\n".join(lines)
+
+
+def wait_until(driver, condition, timeout, name, timings=None):
+    """Waits for an expected condition and records how long it took.
+
+    Args:
+        driver (WebDriver): The browser session.
+        condition (callable): An expected condition, e.g. from `EC`.
+        timeout (float): Seconds before giving up.
+        name (str): Name the wait is recorded under.
+        timings (WaitTimings, optional): Where to record the wait.
+
+    Returns:
+        The value returned by the condition.
+
+    Raises:
+        TimeoutException: If the condition was not met within `timeout`.
+    """
+    start = time.perf_counter()
+    timed_out = True
+    try:
+        result = WebDriverWait(driver, timeout, poll_frequency=POLL_FREQUENCY).until(
+            condition
+        )
+        timed_out = False
+        return result
+    finally:
+        if timings is not None:
+            timings.record(name, time.perf_counter() - start, timed_out)
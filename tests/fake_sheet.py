@@ -0,0 +1,149 @@
+"""An in-memory stand-in for a gspread worksheet laid out like
+`docs/Shopping_List.xlsx`, counting the API calls made against it.
+"""
+
+from collections import Counter
+
+import gspread
+from gspread.exceptions import APIError, WorksheetNotFound
+
+STORES = ["Makro", "Game", "PNP", "Woolworths", "Takealot"]
+
+
+class FakeResponse:
+    def __init__(self, status_code, message="Quota exceeded"):
+        self.status_code = status_code
+        self.text = message
+
+    def json(self):
+        return {"error": {"code": self.status_code, "message": self.text}}
+
+
+def quota_error():
+    return APIError(FakeResponse(429))
+
+
+class FakeWorksheet:
+    def __init__(self, rows=None, title="Sheet1"):
+        self.title = title
+        self.spreadsheet = None
+        self.cells = {}
+        self.calls = Counter()
+        self.errors = []
+        for row, values in enumerate(rows or [], 1):
+            for col, value in enumerate(values, 1):
+                if value != "":
+                    self.cells[(row, col)] = value
+
+    @classmethod
+    def shopping_list(cls, items, stores=STORES, title="Sheet1"):
+        """A worksheet with store names on row 2, headers on row 3 and the items
+        from row 5 onwards."""
+        sheet = cls(title=title)
+        sheet.cells[(3, 2)] = "Item"
+        for count, store in enumerate(stores):
+            col = 3 + count * 3
+            sheet.cells[(2, col)] = store
+            sheet.cells[(3, col)] = "Product Name"
+            sheet.cells[(3, col + 1)] = "Price"
+            sheet.cells[(3, col + 2)] = "URL"
+        for count, item in enumerate(items):
+            sheet.cells[(5 + count, 2)] = item
+        return sheet
+
+    @property
+    def row_count(self):
+        return max((row for row, _ in self.cells), default=0)
+
+    @property
+    def col_count(self):
+        return max((col for _, col in self.cells), default=0)
+
+    def value(self, row, col):
+        return self.cells.get((row, col), "")
+
+    def get_all_values(self):
+        self.calls["get_all_values"] += 1
+        return [
+            [str(self.value(row, col)) for col in range(1, self.col_count + 1)]
+            for row in range(1, self.row_count + 1)
+        ]
+
+    def row_values(self, row):
+        self.calls["row_values"] += 1
+        return self._trim(
+            [self.value(row, col) for col in range(1, self.col_count + 1)]
+        )
+
+    def col_values(self, col):
+        self.calls["col_values"] += 1
+        return self._trim(
+            [self.value(row, col) for row in range(1, self.row_count + 1)]
+        )
+
+    def find(self, query):
+        self.calls["find"] += 1
+        cells = self._findall(query)
+        return cells[0] if cells else None
+
+    def findall(self, query):
+        self.calls["findall"] += 1
+        return self._findall(query)
+
+    def update_cell(self, row, col, value):
+        self.calls["update_cell"] += 1
+        self.cells[(row, col)] = value
+
+    def update_cells(self, cell_list, value_input_option="RAW"):
+        self.calls["update_cells"] += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        for cell in cell_list:
+            if cell.value is not None:
+                self.cells[(cell.row, cell.col)] = cell.value
+
+    def clear(self):
+        self.calls["clear"] += 1
+        self.cells.clear()
+
+    def add_rows(self, rows):
+        self.calls["add_rows"] += 1
+
+    def _findall(self, query):
+        return [
+            gspread.Cell(row, col, str(value))
+            for (row, col), value in sorted(self.cells.items())
+            if str(value) == query
+        ]
+
+    @staticmethod
+    def _trim(values):
+        while values and values[-1] == "":
+            values.pop()
+        return [str(value) for value in values]
+
+
+class FakeSpreadsheet:
+    """Holds `FakeWorksheet`s by title, like a gspread spreadsheet."""
+
+    def __init__(self, worksheets=()):
+        self._worksheets = []
+        for worksheet in worksheets:
+            self._attach(worksheet)
+
+    def worksheets(self):
+        return list(self._worksheets)
+
+    def worksheet(self, title):
+        for worksheet in self._worksheets:
+            if worksheet.title == title:
+                return worksheet
+        raise WorksheetNotFound(title)
+
+    def add_worksheet(self, title, rows, cols):
+        return self._attach(FakeWorksheet(title=title))
+
+    def _attach(self, worksheet):
+        worksheet.spreadsheet = self
+        self._worksheets.append(worksheet)
+        return worksheet
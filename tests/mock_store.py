@@ -0,0 +1,111 @@
+"""A local HTTP server that replays saved store pages from `tests/fixtures`.
+
+Search pages are served from `<store>/search-<query>.html`, falling back to
+`<store>/search.html`, and product pages from `<store>/product-<slug>.html`,
+falling back to `<store>/product.html`.
+"""
+
+import copy
+import pathlib
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES = pathlib.Path(__file__).parent / "fixtures"
+
+
+def slugify(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class MockStoreServer:
+    """Serves the saved pages of every store on localhost.
+
+    Args:
+        root (pathlib.Path, optional): Directory with a sub-directory per store.
+        delay (float, optional): Seconds to wait before answering each request,
+            to mimic the latency of the real stores.
+    """
+
+    def __init__(self, root=FIXTURES, delay=0.0):
+        self.root = pathlib.Path(root)
+        self.delay = delay
+        self.requests = []
+        self.in_flight = {}
+        self.peak_in_flight = {}
+        self._lock = threading.Lock()
+        self._server = _ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def ids(self, ids):
+        """Returns a copy of `ids` with every store searching this server."""
+        ids = copy.deepcopy(ids)
+        for store, store_ids in ids.items():
+            store_ids["search_url"] = f"{self.url}/{store}/search?q={{query}}"
+        return ids
+
+    def page(self, path, query):
+        parts = path.strip("/").split("/")
+        if len(parts) == 2 and parts[1] == "search":
+            names = [f"search-{slugify(query.get('q', [''])[0])}.html", "search.html"]
+        elif len(parts) == 3 and parts[1] == "p":
+            names = [f"product-{parts[2]}.html", "product.html"]
+        else:
+            return None
+        for name in names:
+            page = self.root / parts[0] / name
+            if page.is_file():
+                return page.read_bytes()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                store = url.path.strip("/").split("/")[0]
+                with server._lock:
+                    server.requests.append(self.path)
+                    server.in_flight[store] = server.in_flight.get(store, 0) + 1
+                    server.peak_in_flight[store] = max(
+                        server.peak_in_flight.get(store, 0), server.in_flight[store]
+                    )
+                try:
+                    if server.delay:
+                        time.sleep(server.delay)
+                    body = server.page(url.path, parse_qs(url.query))
+                finally:
+                    with server._lock:
+                        server.in_flight[store] -= 1
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
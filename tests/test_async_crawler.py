@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import time
+import unittest
+
+from shopping_list_bot import IDS, URLS, AsyncCrawler, HttpFetcher, TokenBucket
+
+from mock_store import MockStoreServer
+
+MAKRO, GAME, TAKEALOT = (
+    "https://www.makro.co.za/",
+    "https://www.game.co.za/",
+    "https://www.takealot.com/",
+)
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_rate(self):
+        async def take(bucket, count):
+            for _ in range(count):
+                await bucket.acquire()
+
+        loop = asyncio.new_event_loop()
+        try:
+            start = time.monotonic()
+            loop.run_until_complete(take(TokenBucket(rate=50, capacity=1), 6))
+            elapsed = time.monotonic() - start
+        finally:
+            loop.close()
+        self.assertGreaterEqual(elapsed, 0.09)
+
+
+class AsyncCrawlerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockStoreServer(delay=0.05).__enter__()
+        self.crawler = AsyncCrawler(
+            fetcher=HttpFetcher(ids=self.server.ids(IDS)),
+            concurrency=2,
+            rate=1000,
+            burst=10,
+        )
+
+    def tearDown(self):
+        self.crawler.close()
+        self.server.__exit__(None, None, None)
+
+    def test_crawl_all(self):
+        jobs = {
+            MAKRO: ["oats", "nothing here", "more oats"],
+            GAME: ["pampers pants"],
+            TAKEALOT: ["beer"],
+        }
+        streamed = []
+        results = self.crawler.crawl_all(
+            jobs, on_result=lambda *result: streamed.append(result)
+        )
+        self.assertEqual(
+            [result and result.item_price for result in results[MAKRO]],
+            ["49.99", None, "49.99"],
+        )
+        self.assertEqual(results[GAME][0].item_price, "199.00")
+        self.assertEqual(results[TAKEALOT], [None])
+        self.assertEqual(len(streamed), 5)
+        # The results stream back as they complete, not in submission order.
+        self.assertEqual(streamed[0][:3], (TAKEALOT, 0, "beer"))
+
+    def test_concurrency_is_capped_per_store(self):
+        self.crawler.crawl_all({MAKRO: [f"oats {count}" for count in range(8)]})
+        self.assertEqual(self.server.peak_in_flight["makro"], 2)
+
+    def test_connections_are_reused(self):
+        warnings = []
+        handler = logging.Handler()
+        handler.emit = lambda record: warnings.append(record.getMessage())
+        logger = logging.getLogger("urllib3.connectionpool")
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        fetcher = HttpFetcher(ids=self.server.ids(IDS), workers=2)
+        crawler = AsyncCrawler(fetcher=fetcher, concurrency=4, rate=1000, burst=10)
+        self.addCleanup(crawler.close)
+        self.assertEqual(fetcher.pool_size, 4 * len(URLS))
+
+        # Every store is served from the same host here.
+        crawler.crawl_all(
+            {url: [f"oats {count}" for count in range(8)] for url in URLS}
+        )
+        self.assertEqual(
+            [message for message in warnings if "pool is full" in message], []
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
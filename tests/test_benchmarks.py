@@ -0,0 +1,78 @@
+import argparse
+import copy
+import importlib.util
+import json
+import pathlib
+import tempfile
+import unittest
+from unittest import mock
+
+BENCHMARKS = pathlib.Path(__file__).parents[1] / "benchmarks" / "run.py"
+
+spec = importlib.util.spec_from_file_location("benchmarks_run", str(BENCHMARKS))
+benchmarks = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(benchmarks)
+
+
+class BenchmarksTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        args = argparse.Namespace(
+            items=3,
+            latency=0.0,
+            label="baseline",
+            output=pathlib.Path(cls.directory.name),
+            scenarios=["price_updater"],
+        )
+        cls.results = benchmarks.run(args)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_results_are_saved(self):
+        path = pathlib.Path(self.directory.name) / "baseline.json"
+        saved = json.loads(path.read_text())
+        result = saved["scenarios"]["price_updater"]
+        # Makro, Game and PnP are scraped, the JavaScript stores are left out.
+        self.assertEqual(result["lookups"], 9)
+        self.assertGreater(result["items_per_minute"], 0)
+        self.assertGreater(result["peak_memory_mib"], 0)
+        phases = {(row["phase"], row["store"]) for row in result["phases"]}
+        self.assertIn(("parse_results", "pnp"), phases)
+        self.assertIn(("http_product", "game"), phases)
+        self.assertIn(("sheet_write", ""), phases)
+
+    def test_compare(self):
+        _, regressions = benchmarks.compare(self.results, self.results)
+        self.assertEqual(regressions, [])
+
+        slower = copy.deepcopy(self.results)
+        slower["label"] = "slower"
+        scenario = slower["scenarios"]["price_updater"]
+        scenario["items_per_minute"] /= 2
+        lines, regressions = benchmarks.compare(self.results, slower)
+        self.assertEqual(regressions, ["price_updater throughput"])
+        self.assertTrue(lines[0].startswith("baseline -> slower"))
+
+    def test_failed_stores_fail_the_scenario(self):
+        def broken(price_updater, items, url):
+            raise TypeError("unexpected keyword argument 'on_result'")
+
+        args = argparse.Namespace(
+            items=1,
+            latency=0.0,
+            label="broken",
+            output=pathlib.Path(self.directory.name),
+            scenarios=["price_updater"],
+        )
+        with mock.patch.object(
+            benchmarks.ReplayPriceUpdater, "_search_with_browser", broken
+        ):
+            with self.assertRaisesRegex(RuntimeError, "Failed to retrieve"):
+                benchmarks.run(args)
+
+
+if __name__ == "__main__":
+    unittest.main()
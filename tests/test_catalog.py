@@ -0,0 +1,107 @@
+import tempfile
+import unittest
+
+from shopping_list_bot import (
+    IDS,
+    HttpFetcher,
+    PriceHistory,
+    ProductCatalog,
+    ShoppingList,
+    product_tokens,
+    similarity,
+)
+
+from mock_store import MockStoreServer
+
+GAME = "https://www.game.co.za/"
+
+
+class SimilarityTest(unittest.TestCase):
+    def test_sizes_are_normalized(self):
+        for text, tokens in [
+            ("Jungle Oats 1Kg", ["1000g", "jungle", "oats"]),
+            ("jungle oats 1000 g", ["1000g", "jungle", "oats"]),
+            ("Coca-Cola 1,5 Litre", ["1500ml", "coca", "cola"]),
+            ("Pampers Pants 44S", ["44pk", "pampers", "pants"]),
+            ("Size 4", ["size", "4"]),
+        ]:
+            with self.subTest(text=text):
+                self.assertEqual(product_tokens(text), tokens)
+
+    def test_similarity(self):
+        self.assertEqual(similarity("jungle oats 1kg", "Jungle Oats 1000g"), 1.0)
+        self.assertGreater(
+            similarity("jungle oat 1kg", "Jungle Oats 1Kg"),
+            similarity("jungle oats 1kg", "Jungle Oats 500G"),
+        )
+        self.assertEqual(similarity("milk", "Jungle Oats 1Kg"), 0.0)
+        self.assertEqual(similarity("milk", None), 0.0)
+
+
+class ProductCatalogTest(unittest.TestCase):
+    def setUp(self):
+        self.catalog = ProductCatalog()
+        self.catalog.add("Makro", "jungle oats", "Jungle Oats 1Kg", "/oats-1kg")
+        self.catalog.add("makro", None, "Jungle Oats 500G", "/oats-500g")
+        self.catalog.add("makro", "pampers", "Huggies Dry Comfort", "/huggies")
+
+    def test_past_searches(self):
+        match = self.catalog.lookup("makro", "Jungle  Oats")
+        self.assertEqual(match.item_url, "/oats-1kg")
+        self.assertIsNone(self.catalog.lookup("game", "jungle oats"))
+        # The product found back then does not look like the item.
+        self.assertIsNone(self.catalog.lookup("makro", "pampers"))
+
+    def test_fuzzy_matches(self):
+        self.assertEqual(
+            self.catalog.lookup("makro", "jungle oat 500 g").item_url, "/oats-500g"
+        )
+        self.assertIsNone(self.catalog.lookup("makro", "jungle oats 2kg"))
+        # Both sizes are as close.
+        self.assertIsNone(self.catalog.lookup("makro", "oats"))
+
+    def test_from_history(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            history = PriceHistory(f"{tmp}/history.db", clock=iter(range(10)).__next__)
+            items = ["jungle oats", "flour"]
+            history.record(
+                {"Makro": [ShoppingList("Jungle Oats", "1.00", "/old"), None]}, items
+            )
+            history.record(
+                {"Makro": [ShoppingList("Jungle Oats 1Kg", "1.00", "/new"), None]},
+                items,
+            )
+            catalog = ProductCatalog.from_history(history)
+            history.close()
+        self.assertEqual(len(catalog), 1)
+        self.assertEqual(catalog.lookup("makro", "jungle oats").item_url, "/new")
+
+
+class CatalogFetchTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockStoreServer().__enter__()
+        self.catalog = ProductCatalog()
+        self.fetcher = HttpFetcher(ids=self.server.ids(IDS), catalog=self.catalog)
+
+    def tearDown(self):
+        self.fetcher.close()
+        self.server.__exit__(None, None, None)
+
+    def test_known_products_skip_the_search(self):
+        url = f"{self.server.url}/game/p/pampers-pants-size-4-44"
+        self.catalog.add("game", "pampers pants", "Pampers Pants Size 4 44S", url)
+        product = self.fetcher.search_item("pampers pants", GAME)
+        self.assertEqual(product.item_price, "199.00")
+        self.assertEqual(self.server.requests, ["/game/p/pampers-pants-size-4-44"])
+
+    def test_moved_products_are_searched_for(self):
+        url = f"{self.server.url}/game/gone/pampers-pants"
+        self.catalog.add("game", "pampers pants", "Pampers Pants Size 4 44S", url)
+        product = self.fetcher.search_item("pampers pants", GAME)
+        self.assertEqual(product.item_name, "Pampers Pants Size 4 44S")
+        self.assertEqual(self.server.requests[0], "/game/gone/pampers-pants")
+        self.assertEqual(self.server.requests[1], "/game/search?q=pampers+pants")
+
+
+if __name__ == "__main__":
+    unittest.main()
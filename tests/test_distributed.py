@@ -0,0 +1,226 @@
+import multiprocessing
+import tempfile
+import threading
+import unittest
+
+from shopping_list_bot import (
+    IDS,
+    Coordinator,
+    HttpFetcher,
+    JobQueue,
+    PriceUpdater,
+    ShoppingList,
+    Worker,
+)
+
+from fake_sheet import FakeWorksheet
+from mock_store import MockStoreServer
+
+MAKRO = "https://www.makro.co.za/"
+GAME = "https://www.game.co.za/"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def replay_ids(server):
+    """Returns `IDS` searching the mock store, without a browser at any store."""
+    ids = server.ids(IDS)
+    for store_ids in ids.values():
+        store_ids["requires_js"] = False
+    return ids
+
+
+def run_worker(path, ids, name, leased):
+    fetcher = HttpFetcher(ids=ids)
+    worker = Worker(
+        JobQueue(path),
+        search=fetcher.search_items,
+        name=name,
+        batch_size=1,
+        poll_interval=0.01,
+    )
+    try:
+        leased.put(worker.run(idle_timeout=1.0))
+    finally:
+        fetcher.close()
+        worker.close()
+
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.clock = Clock()
+        self.queue = JobQueue(f"{self.tmp.name}/queue.db", clock=self.clock)
+
+    def tearDown(self):
+        self.queue.close()
+        self.tmp.cleanup()
+
+    def test_batches_hold_one_store(self):
+        makro = self.queue.submit(MAKRO, ["oats", "eggs", "milk"])
+        game = self.queue.submit(GAME, ["soap"])
+        jobs = self.queue.lease("a", limit=2)
+        self.assertEqual([job.job_id for job in jobs], makro[:2])
+        self.assertEqual(
+            [job.job_id for job in self.queue.lease("b", limit=2)], [makro[2]]
+        )
+        self.assertEqual([job.job_id for job in self.queue.lease("b", limit=2)], game)
+        self.assertEqual(self.queue.lease("c"), [])
+        self.assertEqual(self.queue.counts(), {"leased": 4})
+
+    def test_failed_jobs_are_retried(self):
+        (job_id,) = self.queue.submit(MAKRO, ["oats"], max_attempts=2)
+        for attempt in [1, 2]:
+            (job,) = self.queue.lease("a")
+            self.assertEqual(job.attempts, attempt)
+            self.assertEqual(self.queue.finished([job_id]), {})
+            self.queue.fail("a", job_id, "ConnectionError()")
+        self.assertEqual(self.queue.lease("a"), [])
+        self.assertEqual(
+            self.queue.finished([job_id]), {job_id: (None, "ConnectionError()")}
+        )
+
+    def test_expired_leases(self):
+        job_ids = self.queue.submit(MAKRO, ["oats", "jungle oats"], max_attempts=2)
+        self.queue.lease("dead", limit=2, duration=60)
+        self.clock.now += 30
+        self.assertEqual(self.queue.lease("b", limit=2), [])
+        self.queue.extend("dead", [job_ids[1]], duration=60)
+
+        self.clock.now += 31
+        (job,) = self.queue.lease("b", limit=2)
+        self.assertEqual((job.job_id, job.attempts), (job_ids[0], 2))
+        # The first worker lost the job, its late result is dropped.
+        self.assertFalse(
+            self.queue.complete("dead", job_ids[0], ShoppingList("x", 1, "u"))
+        )
+        self.assertTrue(
+            self.queue.complete("b", job_ids[0], ShoppingList("Oats", "49.99", "u"))
+        )
+        self.assertTrue(
+            self.queue.complete("dead", job_ids[1], ShoppingList(None, None, None))
+        )
+
+        oats, eggs = (result for result, _ in self.queue.finished(job_ids).values())
+        self.assertEqual((oats.item_name, oats.item_price), ("Oats", "49.99"))
+        self.assertIsNone(eggs.item_name)
+
+        (job_id,) = self.queue.submit(MAKRO, ["milk"], max_attempts=1)
+        self.queue.lease("dead", duration=60)
+        self.clock.now += 61
+        self.assertEqual(
+            self.queue.finished([job_id]), {job_id: (None, "lease expired")}
+        )
+
+
+class WorkerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = f"{self.tmp.name}/queue.db"
+        self.server = MockStoreServer(delay=0.01).__enter__()
+        self.coordinator = Coordinator(
+            JobQueue(self.path), poll_interval=0.01, timeout=30
+        )
+
+    def tearDown(self):
+        self.coordinator.close()
+        self.server.__exit__(None, None, None)
+        self.tmp.cleanup()
+
+    def test_worker_processes(self):
+        leased = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(
+                target=run_worker,
+                args=(self.path, replay_ids(self.server), f"worker-{count}", leased),
+            )
+            for count in range(3)
+        ]
+        for worker in workers:
+            worker.start()
+        items = [f"oats {count}" for count in range(6)] + ["nothing here"]
+        found = []
+        results = self.coordinator.search(
+            items, MAKRO, on_result=lambda count, result: found.append(count)
+        )
+        for worker in workers:
+            worker.join(10)
+            self.assertEqual(worker.exitcode, 0)
+
+        self.assertEqual(sorted(found), list(range(6)))
+        self.assertEqual(results[0].item_price, "49.99")
+        # Needs a browser, so every attempt fails.
+        self.assertIsNone(results[-1])
+        self.assertEqual(sum(leased.get(timeout=1) for _ in workers), 6 + 3)
+        self.assertEqual(self.coordinator.queue.counts(), {})
+
+    def test_failures_are_retried_by_another_worker(self):
+        fetcher = HttpFetcher(ids=replay_ids(self.server))
+        self.addCleanup(fetcher.close)
+
+        def crashes(items, url, on_result=None):
+            raise SystemExit(1)
+
+        def worker(name, search):
+            worker = Worker(JobQueue(self.path), search=search, name=name)
+            self.addCleanup(worker.close)
+            return worker
+
+        job_ids = self.coordinator.queue.submit(
+            MAKRO, ["oats", "jungle oats"], max_attempts=2
+        )
+        self.assertEqual(worker("crashes", crashes).work_once(), 2)
+        self.assertEqual(worker("works", fetcher.search_items).work_once(), 2)
+        finished = self.coordinator.queue.finished(job_ids)
+        self.assertEqual(
+            [result.item_price for result, _ in finished.values()], ["49.99"] * 2
+        )
+
+
+class PriceUpdaterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server = MockStoreServer().__enter__()
+        self.sheet = FakeWorksheet.shopping_list(["jungle oats 1kg", "nothing here"])
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        self.tmp.cleanup()
+
+    def test_browser_lookups_go_to_the_workers(self):
+        path = f"{self.tmp.name}/queue.db"
+        fetcher = HttpFetcher(ids=replay_ids(self.server))
+        worker = Worker(JobQueue(path), search=fetcher.search_items, poll_interval=0.01)
+        thread = threading.Thread(target=worker.run)
+        thread.start()
+        price_updater = PriceUpdater.from_worksheet(
+            self.sheet,
+            http_first=False,
+            coordinator=Coordinator(JobQueue(path), poll_interval=0.01, timeout=30),
+        )
+        try:
+            price_updater.process_item_list()
+        finally:
+            worker.stop()
+            thread.join()
+            worker.close()
+            fetcher.close()
+            price_updater.close()
+
+        self.assertEqual(price_updater.workers, 5)
+        self.assertEqual(self.sheet.value(5, 4), "49.99")
+        # Every store was searched, only Makro and Woolworths list oats.
+        searched = {path.split("/")[1] for path in self.server.requests}
+        self.assertEqual(searched, set(IDS))
+        for col in [3, 12]:
+            self.assertNotEqual(self.sheet.value(5, col), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
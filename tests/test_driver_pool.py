@@ -0,0 +1,154 @@
+import threading
+import unittest
+
+from selenium.common.exceptions import WebDriverException
+
+from shopping_list_bot import (
+    URLS,
+    PoolClosedError,
+    PriceUpdater,
+    ShoppingBot,
+    WebDriverPool,
+)
+
+from fake_sheet import FakeWorksheet
+
+
+class FakeDriver:
+    def __init__(self):
+        self.quit_called = False
+        self.broken = False
+
+    @property
+    def current_url(self):
+        if self.broken:
+            raise WebDriverException("session deleted")
+        return "about:blank"
+
+    def quit(self):
+        self.quit_called = True
+
+
+class WebDriverPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.started = []
+
+        def factory():
+            driver = FakeDriver()
+            self.started.append(driver)
+            return driver
+
+        self.pool = WebDriverPool(size=2, max_uses=3, factory=factory)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_warm_up(self):
+        self.pool.warm_up()
+        self.assertEqual(len(self.started), 2)
+        self.pool.warm_up()
+        self.assertEqual(len(self.started), 2)
+
+    def test_reuses_driver(self):
+        with self.pool.lease() as first:
+            pass
+        with self.pool.lease() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(len(self.started), 1)
+
+    def test_recycles_after_max_uses(self):
+        for _ in range(3):
+            with self.pool.lease() as driver:
+                pass
+        self.assertTrue(driver.quit_called)
+        with self.pool.lease() as new_driver:
+            self.assertIsNot(driver, new_driver)
+
+    def test_replaces_unhealthy_driver(self):
+        with self.pool.lease() as driver:
+            pass
+        driver.broken = True
+        with self.pool.lease() as new_driver:
+            self.assertIsNot(driver, new_driver)
+        self.assertTrue(driver.quit_called)
+
+    def test_blocks_when_exhausted(self):
+        first = self.pool.acquire()
+        second = self.pool.acquire()
+        with self.assertRaises(TimeoutError):
+            self.pool.acquire(timeout=0.05)
+        threading.Timer(0.05, self.pool.release, args=(first,)).start()
+        self.assertIs(self.pool.acquire(timeout=5), first)
+        self.pool.release(first)
+        self.pool.release(second)
+
+    def test_shutdown(self):
+        leased = self.pool.acquire()
+        self.pool.warm_up(2)
+        self.pool.shutdown()
+        self.assertTrue(all(d.quit_called for d in self.started if d is not leased))
+        self.pool.release(leased)
+        self.assertTrue(leased.quit_called)
+        with self.assertRaises(PoolClosedError):
+            self.pool.acquire()
+
+
+class FailingDriver(FakeDriver):
+    """A browser session whose scripts fail, as when Firefox crashed mid-search."""
+
+    def __init__(self):
+        super().__init__()
+        self.loaded = []
+
+    def get(self, url):
+        self.loaded.append(url)
+
+    def execute_script(self, script):
+        raise WebDriverException("Failed to decode response from marionette")
+
+
+class FailedSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.started = []
+
+        def factory():
+            driver = FailingDriver()
+            self.started.append(driver)
+            return driver
+
+        self.pool = WebDriverPool(size=1, factory=factory)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_failed_search_frees_the_pool(self):
+        bot = ShoppingBot(["beer"], "https://www.makro.co.za/", pool=self.pool)
+        with self.assertRaises(WebDriverException):
+            bot.search_items()
+        # The broken browser is quit instead of being leased again.
+        self.assertTrue(self.started[0].quit_called)
+        driver = self.pool.acquire(timeout=1)
+        self.assertIsNot(driver, self.started[0])
+        self.pool.release(driver)
+
+    def test_failing_stores_do_not_hang_the_run(self):
+        price_updater = PriceUpdater.from_worksheet(
+            FakeWorksheet.shopping_list(["beer"]), http_first=False
+        )
+        price_updater.pool = self.pool
+        carts = {}
+        run = threading.Thread(
+            target=lambda: carts.update(price_updater.get_shopping_cart(items=["beer"]))
+        )
+        run.start()
+        run.join(10)
+        self.assertFalse(run.is_alive())
+        self.assertEqual(carts, {})
+        # Every store got a fresh browser.
+        self.assertEqual(len(self.started), len(URLS))
+        self.assertTrue(all(driver.quit_called for driver in self.started))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import copy
+import tempfile
+import unittest
+
+from selenium.common.exceptions import NoSuchElementException
+
+from shopping_list_bot import IDS, HealthMonitor, ShoppingBot, WebDriverPool
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class HealthMonitorTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.health = HealthMonitor(clock=self.clock)
+
+    def test_adaptive_timeouts(self):
+        self.assertEqual(self.health.timeout("makro", "first_result", 20), 20)
+        for seconds in [0.5, 0.6, 0.7, 0.8, 1.0]:
+            self.health.record_wait("makro", "first_result", seconds)
+        # Three times the p95 plus a second.
+        self.assertAlmostEqual(self.health.timeout("makro", "first_result", 20), 4.0)
+        self.assertEqual(self.health.timeout("makro", "first_result", 3), 3)
+        self.assertEqual(self.health.timeout("game", "first_result", 20), 20)
+
+        for _ in range(5):
+            self.health.record_wait("makro", "page_ready", 0.01)
+        self.assertEqual(self.health.timeout("makro", "page_ready", 30), 2.0)
+
+    def test_circuit_opens_after_consecutive_selector_failures(self):
+        for name in ["first_result", "price", "page_ready", "first_result"]:
+            self.assertFalse(self.health.is_open("makro"))
+            self.health.record_wait("makro", name, 20, timed_out=True)
+        self.assertTrue(self.health.is_open("makro"))
+        self.assertEqual(self.health.open_circuits(), {"makro": "first_result"})
+
+        report = {(row["store"], row["wait"]): row for row in self.health.report()}
+        self.assertEqual(report[("makro", "first_result")]["timeouts"], 2)
+        self.assertTrue(report[("makro", "price")]["open"])
+        self.assertIn("circuit open", self.health.format_report())
+
+    def test_slow_stores_are_not_stopped(self):
+        for _ in range(5):
+            self.health.record_wait("makro", "first_result", 0.5)
+        # Makro slows down to 5s a result, but every result still shows.
+        waited = []
+        for _ in range(6):
+            timeout = self.health.timeout("makro", "first_result", 20)
+            waited.append(timeout)
+            self.health.record_wait(
+                "makro", "first_result", min(5, timeout), 5 > timeout
+            )
+        self.assertFalse(self.health.is_open("makro"))
+        self.assertEqual(waited[:2], [2.5, 20])
+
+    def test_time_outs_count_once_given_the_full_timeout(self):
+        for _ in range(5):
+            self.health.record_wait("makro", "first_result", 0.5)
+        waited = []
+        while not self.health.is_open("makro"):
+            timeout = self.health.timeout("makro", "first_result", 20)
+            waited.append(timeout)
+            self.health.record_wait("makro", "first_result", timeout, timed_out=True)
+        self.assertEqual(waited, [2.5, 20, 20, 20])
+
+    def test_successes_reset_the_failures(self):
+        for timed_out in [True, True, False, True, True]:
+            self.health.record_wait("makro", "price", 1, timed_out=timed_out)
+        self.assertFalse(self.health.is_open("makro"))
+
+    def test_cooldown(self):
+        health = HealthMonitor(failure_threshold=1, cooldown=60, clock=self.clock)
+        health.record_wait("game", "first_result", 20, timed_out=True)
+        self.assertTrue(health.is_open("game"))
+        self.clock.now += 61
+        self.assertFalse(health.is_open("game"))
+        health.record_wait("game", "first_result", 1)
+        self.assertEqual(health.open_circuits(), {})
+
+    def test_save_and_load(self):
+        for seconds in [0.5, 0.6, 0.7, 0.8, 1.0]:
+            self.health.record_wait("makro", "first_result", seconds)
+        with tempfile.TemporaryDirectory() as tmp:
+            self.health.save(f"{tmp}/health.json")
+            health = HealthMonitor.load(f"{tmp}/health.json")
+            self.assertEqual(
+                HealthMonitor.load(f"{tmp}/missing.json").timeout("makro", "price", 9),
+                9,
+            )
+        self.assertAlmostEqual(health.timeout("makro", "first_result", 20), 4.0)
+
+
+class BrokenLayoutDriver:
+    """A browser session on a store whose selectors no longer match anything."""
+
+    title = "Search Results | Game"
+    page_source = "<html><body></body></html>"
+
+    def __init__(self):
+        self.current_url = "about:blank"
+        self.loaded = []
+
+    def get(self, url):
+        self.loaded.append(url)
+        self.current_url = url
+
+    def execute_script(self, script):
+        return "complete"
+
+    def find_element(self, by, value):
+        raise NoSuchElementException(value)
+
+    def find_element_by_class_name(self, name):
+        raise NoSuchElementException(name)
+
+    def quit(self):
+        pass
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_broken_store_is_skipped(self):
+        ids = copy.deepcopy(IDS)
+        ids["game"]["search_url"] = "https://www.game.co.za/search?q={query}"
+        ids["game"]["timeouts"] = {"first_result": 0.1, "price": 0.1}
+        driver = BrokenLayoutDriver()
+        health = HealthMonitor()
+        items = [f"item {count}" for count in range(10)]
+        with WebDriverPool(size=1, factory=lambda: driver) as pool:
+            bot = ShoppingBot(
+                items, "https://www.game.co.za/", ids=ids, pool=pool, health=health
+            )
+            bot.search_items()
+        self.assertEqual(health.open_circuits(), {"game": "first_result"})
+        # Two items tried, the store page and two searches loaded.
+        self.assertEqual(len(bot.results), 2)
+        self.assertEqual(len(driver.loaded), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+from shopping_list_bot import IDS, HttpFetcher, NeedsBrowser
+
+from mock_store import MockStoreServer
+
+
+class HttpFetcherTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockStoreServer().__enter__()
+        cls.fetcher = HttpFetcher(ids=cls.server.ids(IDS), workers=4, timeout=5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fetcher.close()
+        cls.server.__exit__(None, None, None)
+
+    def test_search_item(self):
+        product = self.fetcher.search_item(
+            "jungle oats 1kg", "https://www.makro.co.za/"
+        )
+        self.assertEqual(product.item_name, "Jungle Oats 1Kg")
+        self.assertEqual(product.item_price, "49.99")
+        self.assertEqual(product.item_url, f"{self.server.url}/makro/p/jungle-oats-1kg")
+
+    def test_promotion_price(self):
+        product = self.fetcher.get_product(f"{self.server.url}/pnp/p/flour", "pnp")
+        self.assertEqual(product.item_price, "29.99")
+
+    def test_no_result_needs_browser(self):
+        with self.assertRaises(NeedsBrowser):
+            self.fetcher.search_item("nothing here", "https://www.makro.co.za/")
+
+    def test_search_items_keeps_order(self):
+        items = ["pampers pants", "nothing here", "pampers pants"]
+        found = []
+        results = self.fetcher.search_items(
+            items, "https://www.game.co.za/", on_result=lambda *args: found.append(args)
+        )
+        self.assertEqual(sorted(count for count, _ in found), [0, 2])
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0].item_price, "199.00")
+        self.assertIsNone(results[1])
+        self.assertEqual(results[2].item_name, "Pampers Pants Size 4 44S")
+
+    def test_javascript_stores_are_left_for_the_browser(self):
+        self.assertFalse(self.fetcher.can_fetch("https://www.takealot.com/"))
+        requests_made = len(self.server.requests)
+        results = self.fetcher.search_items(["beer"], "https://www.takealot.com/")
+        self.assertEqual(results, [None])
+        self.assertEqual(len(self.server.requests), requests_made)
+
+
+if __name__ == "__main__":
+    unittest.main()
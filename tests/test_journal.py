@@ -0,0 +1,102 @@
+import tempfile
+import unittest
+
+from shopping_list_bot import IDS, HttpFetcher, PriceUpdater, RunJournal, ShoppingList
+
+from fake_sheet import FakeWorksheet
+from mock_store import MockStoreServer
+
+
+class RunJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = f"{self.tmp.name}/journal.db"
+        self.items = ["Jungle Oats 1kg", "nothing here"]
+        journal = RunJournal(self.path)
+        self.run_id = journal.begin(self.items)
+        journal.put("Makro", "jungle oats 1KG", ShoppingList("Oats", "49.99", "u"))
+        journal.put_many("Game", self.items, [ShoppingList(None, None, None), None])
+        journal.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def open(self, resume=True):
+        journal = RunJournal(self.path, resume=resume)
+        self.addCleanup(journal.close)
+        return journal
+
+    def test_resume(self):
+        journal = self.open()
+        self.assertEqual(journal.begin(self.items), self.run_id)
+        oats, nothing = journal.get_many("Makro", self.items)
+        self.assertEqual((oats.item_name, oats.item_price), ("Oats", "49.99"))
+        self.assertIsNone(nothing)
+        # Searched for and not found is done as well.
+        not_found, pending = journal.get_many("Game", self.items)
+        self.assertIsNone(not_found.item_name)
+        self.assertIsNone(pending)
+
+    def test_start_over(self):
+        for journal, items in [(self.open(False), self.items), (self.open(), ["eggs"])]:
+            with self.subTest(resume=journal.resume, items=items):
+                self.assertNotEqual(journal.begin(items), self.run_id)
+                self.assertEqual(journal.get_many("Makro", self.items), [None, None])
+
+    def test_finished_runs_are_not_resumed(self):
+        journal = self.open()
+        journal.begin(self.items)
+        journal.finish()
+        self.assertNotEqual(journal.begin(self.items), self.run_id)
+
+
+class ResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server = MockStoreServer().__enter__()
+        self.sheet = FakeWorksheet.shopping_list(["jungle oats 1kg", "nothing here"])
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        self.tmp.cleanup()
+
+    def run_price_updater(self, search_with_browser):
+        price_updater = PriceUpdater.from_worksheet(
+            self.sheet,
+            journal=RunJournal(f"{self.tmp.name}/journal.db", resume=True),
+        )
+        price_updater.fetcher = HttpFetcher(ids=self.server.ids(IDS))
+        price_updater._search_with_browser = search_with_browser
+        try:
+            price_updater.process_item_list()
+        finally:
+            price_updater.close()
+
+    def test_resume_skips_completed_lookups(self):
+        def interrupted(items, url, on_result=None):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            self.run_price_updater(interrupted)
+        self.assertEqual(
+            sorted(self.server.requests),
+            ["/makro/search?q=jungle+oats+1kg", "/makro/search?q=nothing+here"],
+        )
+
+        browsed = []
+
+        def not_found(items, url, on_result=None):
+            browsed.append((url, items))
+            return [ShoppingList(None, None, None) for _ in items]
+
+        self.run_price_updater(not_found)
+        self.assertEqual(browsed[0], ("https://www.makro.co.za/", ["nothing here"]))
+        self.assertEqual(
+            self.server.requests.count("/makro/search?q=jungle+oats+1kg"), 1
+        )
+        self.assertEqual(self.server.requests.count("/makro/search?q=nothing+here"), 2)
+        self.assertEqual(self.sheet.value(5, 4), "49.99")
+
+
+if __name__ == "__main__":
+    unittest.main()
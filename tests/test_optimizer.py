@@ -0,0 +1,159 @@
+import importlib.util
+import itertools
+import random
+import unittest
+
+from shopping_list_bot import PriceMatrix, PriceUpdater, ShoppingList
+
+from fake_sheet import FakeSpreadsheet, FakeWorksheet
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+ITEMS = ["oats", "milk", "eggs"]
+
+
+def carts():
+    return {
+        "Makro": [
+            ShoppingList("Oats", "10.00", "u"),
+            ShoppingList("Milk", "20", "u"),
+            None,
+        ],
+        "Game": [
+            ShoppingList("Oats", "12.00", "u"),
+            ShoppingList("Milk", "15.00", "u"),
+            ShoppingList("Eggs", "5.00", "u"),
+        ],
+        "Pnp": [
+            None,
+            ShoppingList("Milk", "14.00", "u"),
+            ShoppingList("Eggs", "6", "u"),
+        ],
+    }
+
+
+def brute_force(matrix, max_stores, fees):
+    """Prices every combination of stores one by one."""
+    best = None
+    for size in range(1, max_stores + 1):
+        for stores in itertools.combinations(range(len(matrix.stores)), size):
+            total, missing = 0, 0
+            for row in range(len(matrix.items)):
+                prices = [
+                    matrix.cents[row, col]
+                    for col in stores
+                    if matrix.available[row, col]
+                ]
+                if prices:
+                    total += min(prices)
+                else:
+                    missing += 1
+            total += sum(fees[col] for col in stores)
+            key = (missing, total, size)
+            best = key if best is None else min(best, key)
+    return best
+
+
+@unittest.skipUnless(HAS_NUMPY, "numpy is not installed")
+class PriceMatrixTest(unittest.TestCase):
+    def setUp(self):
+        self.matrix = PriceMatrix.from_carts(ITEMS, carts())
+
+    def test_missing_prices_are_masked(self):
+        prices = self.matrix.prices
+        self.assertEqual(prices.count(), 7)
+        self.assertTrue(prices.mask[2, 0])
+        self.assertEqual(prices.sum(axis=0).tolist(), [3000, 3200, 2000])
+
+    def test_store_baskets(self):
+        baskets = self.matrix.store_baskets()
+        self.assertEqual(
+            [(b.stores, b.total_cents, b.missing) for b in baskets],
+            [(("Game",), 3200, 0), (("Pnp",), 2000, 1), (("Makro",), 3000, 1)],
+        )
+
+    def test_best_split(self):
+        split = self.matrix.best_split(max_stores=2)
+        self.assertEqual((split.stores, split.total_cents), (("Makro", "Game"), 3000))
+        self.assertEqual(split.assignment, ["Makro", "Game", "Game"])
+
+        # Delivering from Makro costs more than it saves.
+        split = self.matrix.best_split(2, delivery_fees={"makro": 500})
+        self.assertEqual(split.stores, ("Game", "Pnp"))
+        self.assertEqual((split.total_cents, split.delivery_cents), (3100, 0))
+
+    def test_what_if(self):
+        split = self.matrix.best_split(3, stores=["Makro"])
+        self.assertEqual((split.missing, split.assignment[2]), (1, None))
+        with self.assertRaises(ValueError):
+            self.matrix.best_split(2, stores=["Checkers"])
+        with self.assertRaises(ValueError):
+            self.matrix.best_split(0)
+
+    def test_matches_brute_force(self):
+        rng = random.Random(7)
+        stores = [f"store {count}" for count in range(6)]
+        for _ in range(20):
+            cents = [[rng.randint(100, 5000) for _ in stores] for _ in range(40)]
+            available = [[rng.random() > 0.3 for _ in stores] for _ in range(40)]
+            fees = [rng.choice([0, 500, 3000]) for _ in stores]
+            matrix = PriceMatrix(range(40), stores, cents, available)
+            max_stores = rng.randint(1, 4)
+            split = matrix.best_split(max_stores, dict(zip(stores, fees)))
+            self.assertEqual(
+                (split.missing, split.total_cents, len(split.stores)),
+                brute_force(matrix, max_stores, fees),
+            )
+
+    def test_from_prices(self):
+        matrix = PriceMatrix.from_prices(
+            ITEMS, {"Makro": ["10.00", "", "n/a"], "Game": ["R 1,299.50"]}
+        )
+        self.assertEqual(
+            matrix.available.tolist(), [[True, True], [False, False], [False, False]]
+        )
+        self.assertEqual(matrix.cents[0].tolist(), [1000, 129950])
+
+
+@unittest.skipUnless(HAS_NUMPY, "numpy is not installed")
+class OptimizeBasketTest(unittest.TestCase):
+    def setUp(self):
+        self.sheet = FakeWorksheet.shopping_list(ITEMS)
+        self.spreadsheet = FakeSpreadsheet([self.sheet])
+        for col, (_, cart) in zip([4, 7, 10], carts().items()):
+            for count, result in enumerate(cart):
+                if result is not None:
+                    self.sheet.cells[(5 + count, col)] = result.item_price
+        self.price_updater = PriceUpdater.from_worksheet(self.sheet)
+
+    def tearDown(self):
+        self.price_updater.close()
+
+    def test_reads_the_sheet_and_writes_a_tab(self):
+        for _ in range(2):
+            matrix, split = self.price_updater.optimize_basket(
+                2, delivery_fees={"Game": 100}
+            )
+        self.assertEqual(
+            matrix.stores, ["Makro", "Game", "Pnp", "Woolworths", "Takealot"]
+        )
+        # Game's delivery fee makes Pnp the cheaper second store.
+        self.assertEqual(split.stores, ("Makro", "Pnp"))
+        self.assertEqual(split.total_cents, 3000)
+
+        tab = self.spreadsheet.worksheet("Basket")
+        self.assertEqual(tab.calls["clear"], 1)
+        self.assertEqual(tab.col_values(1)[:2], ["Store", "Game"])
+        rows = tab.get_all_values()
+        self.assertIn(["Best split", "30.00", "0.00", "0"], rows)
+        self.assertIn(["eggs", "Pnp", "6.00", ""], rows)
+
+    def test_crawled_carts(self):
+        _, split = self.price_updater.optimize_basket(
+            1, shopping_carts=carts(), items=ITEMS, tab=None
+        )
+        self.assertEqual(split.stores, ("Game",))
+        self.assertEqual(self.spreadsheet.worksheets(), [self.sheet])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import threading
+import time
+import unittest
+
+from gspread.exceptions import APIError
+
+from shopping_list_bot import (
+    IDS,
+    HttpFetcher,
+    PriceUpdater,
+    SheetPipeline,
+    SheetWriter,
+    ShoppingList,
+)
+
+from fake_sheet import FakeResponse, FakeWorksheet
+from mock_store import MockStoreServer
+
+COLUMNS = {"Makro": (5, 3), "Game": (5, 6)}
+
+
+def product(count):
+    return ShoppingList(f"item {count}", f"{count}.99", f"https://makro/{count}")
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed-out waiting for the writer.")
+        time.sleep(0.01)
+
+
+class BlockedWriter(SheetWriter):
+    def __init__(self, sheet):
+        super().__init__(sheet)
+        self.release = threading.Event()
+
+    def write(self, cells):
+        self.release.wait()
+        return super().write(cells)
+
+
+class SheetPipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.sheet = FakeWorksheet.shopping_list(["eggs", "milk"])
+
+    def test_results_are_written_before_close(self):
+        with SheetPipeline(
+            SheetWriter(self.sheet), COLUMNS, flush_interval=0.01
+        ) as pipeline:
+            pipeline.put("Makro", 1, product(1))
+            wait_for(lambda: self.sheet.value(6, 4) == "1.99")
+            pipeline.put("Game", 0, product(0))
+        self.assertEqual(self.sheet.value(5, 6), "item 0")
+        self.assertEqual(pipeline.cells, 6)
+
+    def test_micro_batches(self):
+        with SheetPipeline(
+            SheetWriter(self.sheet), COLUMNS, batch_size=6, flush_interval=60
+        ) as pipeline:
+            for count in range(5):
+                pipeline.put("Makro", count, product(count))
+                # Written again, or not at all.
+                pipeline.put("Makro", count, product(count))
+                pipeline.put("Checkers", count, product(count))
+                pipeline.put("Game", count, None)
+        self.assertEqual(self.sheet.value(9, 3), "item 4")
+        # Two full batches of two results and the last result on close.
+        self.assertEqual(self.sheet.calls["update_cells"], 3)
+        self.assertEqual(pipeline.cells, 15)
+
+    def test_queue_is_bounded(self):
+        writer = BlockedWriter(self.sheet)
+        pipeline = SheetPipeline(writer, COLUMNS, batch_size=3, max_queued=2)
+        pipeline.start()
+        producer = threading.Thread(
+            target=lambda: [pipeline.put("Makro", c, product(c)) for c in range(10)]
+        )
+        producer.start()
+        producer.join(0.2)
+        # One batch waits on the writer and two results on the queue.
+        self.assertTrue(producer.is_alive())
+        self.assertLessEqual(pipeline._queue.qsize(), 2)
+
+        writer.release.set()
+        producer.join()
+        pipeline.close()
+        self.assertEqual(self.sheet.value(14, 3), "item 9")
+
+    def test_failed_writes_raise_on_close(self):
+        self.sheet.errors = [APIError(FakeResponse(400, "Bad request"))]
+        pipeline = SheetPipeline(
+            SheetWriter(self.sheet), COLUMNS, batch_size=3, max_queued=1
+        )
+        with self.assertRaises(APIError):
+            with pipeline:
+                for count in range(20):
+                    pipeline.put("Makro", count, product(count))
+        self.assertEqual(self.sheet.calls["update_cells"], 1)
+
+
+class StreamingProcessItemListTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockStoreServer().__enter__()
+        self.sheet = FakeWorksheet.shopping_list(["jungle oats 1kg", "nothing here"])
+        self.price_updater = PriceUpdater.from_worksheet(self.sheet)
+        self.price_updater.fetcher = HttpFetcher(ids=self.server.ids(IDS))
+
+    def tearDown(self):
+        self.price_updater.close()
+        self.server.__exit__(None, None, None)
+
+    def test_crash_keeps_the_results_found_so_far(self):
+        def search_with_browser(items, url, on_result=None):
+            raise KeyboardInterrupt
+
+        self.price_updater._search_with_browser = search_with_browser
+        with self.assertRaises(KeyboardInterrupt):
+            self.price_updater.process_item_list()
+        self.assertEqual(self.sheet.value(5, 3), "Jungle Oats 1Kg")
+        self.assertEqual(self.sheet.value(5, 4), "49.99")
+        self.assertEqual(self.sheet.value(6, 3), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import tempfile
+import unittest
+
+import shopping_list_bot
+from shopping_list_bot import PriceCache, PriceUpdater, ShoppingList
+
+from fake_sheet import FakeWorksheet
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class PriceCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.clock = Clock()
+        self.cache = PriceCache(
+            f"{self.tmp.name}/prices.db",
+            ids={"takealot": {"cache_ttl": 60}},
+            default_ttl=3600,
+            max_entries=3,
+            clock=self.clock,
+        )
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_hit(self):
+        self.cache.put("Makro", "Jungle  Oats 1kg", ShoppingList("Oats", "49.99", "u"))
+        result = self.cache.get("Makro", "jungle oats 1KG")
+        self.assertEqual(
+            (result.item_name, result.item_price, result.item_url),
+            ("Oats", "49.99", "u"),
+        )
+        self.assertIsNone(self.cache.get("Game", "jungle oats 1kg"))
+
+    def test_per_store_ttl(self):
+        self.cache.put("Makro", "oats", ShoppingList("Oats", "49.99", "u"))
+        self.cache.put("Takealot", "oats", ShoppingList("Oats", "45.00", "u"))
+        self.clock.now += 120
+        self.assertIsNotNone(self.cache.get("Makro", "oats"))
+        self.assertIsNone(self.cache.get("Takealot", "oats"))
+        self.assertIsNone(self.cache.get("Makro", "oats", max_age=60))
+
+    def test_products_not_found_are_not_cached(self):
+        self.cache.put_many("Makro", ["a", "b"], [ShoppingList(None, None, None), None])
+        self.assertEqual(self.cache.get_many("Makro", ["a", "b"]), [None, None])
+
+    def test_least_recently_used_are_evicted(self):
+        for item in "abc":
+            self.clock.now += 1
+            self.cache.put("Makro", item, ShoppingList(item, "1.00", item))
+        self.clock.now += 1
+        self.cache.get("Makro", "a")
+        self.cache.put("Makro", "d", ShoppingList("d", "1.00", "d"))
+        found = self.cache.get_many("Makro", list("abcd"))
+        self.assertEqual(
+            [result is not None for result in found], [True, False, True, True]
+        )
+
+
+class CachedCrawlTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = PriceCache(f"{self.tmp.name}/prices.db")
+        self.searched = []
+
+        test = self
+
+        class FakeBot:
+            def __init__(self, items, url, **kwargs):
+                self.items = items
+                self.shopping_cart = {"Makro": []}
+
+            def search_items(self):
+                test.searched.extend(self.items)
+                self.shopping_cart["Makro"] = [
+                    ShoppingList(item.title(), "1.00", item) for item in self.items
+                ]
+
+        self.bot = shopping_list_bot.ShoppingBot
+        shopping_list_bot.ShoppingBot = FakeBot
+        self.price_updater = PriceUpdater.from_worksheet(
+            FakeWorksheet.shopping_list(["eggs", "milk"]),
+            http_first=False,
+            cache=self.cache,
+        )
+
+    def tearDown(self):
+        shopping_list_bot.ShoppingBot = self.bot
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_cache_hits_skip_the_browser(self):
+        self.cache.put("Makro", "eggs", ShoppingList("Cached Eggs", "2.00", "eggs"))
+        cart = self.price_updater._crawl_store(
+            ["eggs", "milk"], "https://www.makro.co.za/"
+        )
+        self.assertEqual(self.searched, ["milk"])
+        self.assertEqual(
+            [result.item_name for result in cart["Makro"]], ["Cached Eggs", "Milk"]
+        )
+        self.assertEqual(self.cache.get("Makro", "milk").item_name, "Milk")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import tempfile
+import unittest
+
+from shopping_list_bot import PriceHistory, ShoppingList, to_cents
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def carts(**prices):
+    return {
+        store: [ShoppingList(f"Oats {store}", price, f"https://{store}/oats")]
+        for store, price in prices.items()
+    }
+
+
+class PriceHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.clock = Clock()
+        self.history = PriceHistory(f"{self.tmp.name}/history.db", clock=self.clock)
+
+    def tearDown(self):
+        self.history.close()
+        self.tmp.cleanup()
+
+    def run_day(self, **prices):
+        self.clock.now += 86400
+        return self.history.record(carts(**prices), ["Jungle Oats"])
+
+    def test_to_cents(self):
+        self.assertEqual(to_cents("49.99"), 4999)
+        self.assertEqual(to_cents(" 1,299"), 129900)
+        self.assertEqual(to_cents(199.0), 19900)
+        self.assertIsNone(to_cents(None))
+
+    def test_query(self):
+        self.run_day(Makro="49.99", Game=45.0)
+        self.run_day(Makro="47.99", Game=45.0)
+        records = self.history.query(item="jungle  oats", store="Makro")
+        self.assertEqual([record.price_cents for record in records], [4999, 4799])
+        self.assertEqual(len(self.history.query(since=2 * 86400)), 2)
+        self.assertEqual(len(self.history.query(until=2 * 86400)), 2)
+        columns = self.history.columns(store="game")
+        self.assertEqual(columns["price_cents"], [4500, 4500])
+        self.assertEqual(self.history.columns(store="pnp")["store"], [])
+
+    def test_changes(self):
+        self.run_day(Makro="49.99", Game=45.0)
+        run_id = self.run_day(Makro="47.99", Game=45.0, Pnp="50.00")
+        changes = self.history.changes(run_id)
+        self.assertEqual(
+            [(c.store, c.old_cents, c.new_cents) for c in changes],
+            [("makro", 4999, 4799), ("pnp", None, 5000)],
+        )
+        self.assertEqual(self.history.changes(), changes)
+
+    def test_compact_keeps_changes(self):
+        for price in ["49.99", "49.99", "47.99", "47.99", "49.99"]:
+            self.run_day(Makro=price)
+        self.run_day(Makro="49.99")
+        self.assertEqual(self.history.compact(older_than=1.5 * 86400), 2)
+        self.assertEqual(
+            [record.price_cents for record in self.history.query()],
+            [4999, 4799, 4999, 4999],
+        )
+        self.assertEqual(self.history.changes(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
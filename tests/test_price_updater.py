@@ -0,0 +1,420 @@
+import tempfile
+import threading
+import time
+import unittest
+
+import gspread
+from gspread.exceptions import APIError
+from selenium.common.exceptions import WebDriverException
+
+import shopping_list_bot
+from shopping_list_bot import (
+    IDS,
+    URLS,
+    HttpFetcher,
+    PriceCache,
+    PriceHistory,
+    PriceUpdater,
+    SheetSnapshot,
+    SheetWriter,
+    ShoppingList,
+    WebDriverPool,
+    store_key,
+)
+
+from fake_sheet import STORES, FakeResponse, FakeWorksheet, quota_error
+from mock_store import MockStoreServer
+
+
+def shopping_carts(items, stores=STORES):
+    return {
+        store.title(): [
+            ShoppingList(
+                f"{item} at {store}", f"{count}.99", f"https://{store}/{count}"
+            )
+            for count, item in enumerate(items)
+        ]
+        for store in stores
+    }
+
+
+class ProcessItemListTest(unittest.TestCase):
+    def setUp(self):
+        self.items = [f"item {count}" for count in range(250)]
+        self.sheet = FakeWorksheet.shopping_list(self.items)
+        self.price_updater = PriceUpdater.from_worksheet(self.sheet, http_first=False)
+        self.price_updater.get_shopping_cart = lambda on_result=None: shopping_carts(
+            self.items
+        )
+
+    def test_writes_every_store(self):
+        self.price_updater.process_item_list()
+        for count, store in enumerate(STORES):
+            col = 3 + count * 3
+            self.assertEqual(self.sheet.value(5, col), f"item 0 at {store}")
+            self.assertEqual(self.sheet.value(254, col + 1), "249.99")
+            self.assertEqual(self.sheet.value(254, col + 2), f"https://{store}/249")
+
+    def test_writes_in_a_few_calls(self):
+        self.price_updater.process_item_list()
+        self.assertEqual(self.sheet.calls["update_cell"], 0)
+        self.assertLessEqual(self.sheet.calls["update_cells"], 4)
+
+    def test_missing_products_are_skipped(self):
+        carts = shopping_carts(self.items[:2], stores=["Makro"])
+        carts["Makro"][0] = ShoppingList(None, None, None)
+        carts["Makro"][1] = None
+        self.price_updater.get_shopping_cart = lambda on_result=None: carts
+        self.sheet.cells[(5, 3)] = "old name"
+        self.price_updater.process_item_list()
+        self.assertEqual(self.sheet.value(5, 3), "old name")
+        self.assertEqual(self.sheet.value(6, 3), "")
+
+
+class ConcurrentCrawlTest(unittest.TestCase):
+    def setUp(self):
+        self.items = ["eggs", "milk", "oats"]
+        # Store key mapped to what its fake browser does: "fails", "hangs" or a
+        # delay in seconds before each item.
+        self.behaviour = {}
+        self.release = threading.Event()
+        self.searched = []
+        self.stopped = {}
+        self.started = None
+        test = self
+
+        class FakeBot:
+            def __init__(self, items, url, on_result=None, **kwargs):
+                self.items = items
+                self.store = store_key(url)
+                self.on_result = on_result
+                self.results = []
+                test.stopped[self.store] = threading.Event()
+
+            @property
+            def shopping_cart(self):
+                return {self.store.title(): self.results}
+
+            def search_items(self):
+                try:
+                    if test.started is not None:
+                        test.started.wait()
+                    for count, item in enumerate(self.items):
+                        behaviour = test.behaviour.get(self.store, 0)
+                        if behaviour == "fails":
+                            raise WebDriverException("Browsing context discarded")
+                        if behaviour == "hangs" and count == 1:
+                            test.release.wait(10)
+                        elif behaviour != "hangs":
+                            time.sleep(behaviour)
+                        test.searched.append((self.store, item))
+                        result = ShoppingList(f"{item} at {self.store}", "1.00", "u")
+                        self.results.append(result)
+                        self.on_result(count, result)
+                finally:
+                    test.stopped[self.store].set()
+
+        self.bot = shopping_list_bot.ShoppingBot
+        shopping_list_bot.ShoppingBot = FakeBot
+        self.price_updater = PriceUpdater.from_worksheet(
+            FakeWorksheet.shopping_list(self.items),
+            http_first=False,
+            workers=len(URLS),
+            crawl_timeout=5,
+        )
+
+    def tearDown(self):
+        self.release.set()
+        shopping_list_bot.ShoppingBot = self.bot
+        self.price_updater.close()
+
+    def test_stores_are_crawled_at_once(self):
+        # Only passed once every store is being crawled.
+        self.started = threading.Barrier(len(URLS), timeout=5)
+        # The last stores finish first, yet the carts keep the order of URLS.
+        for count, url in enumerate(URLS):
+            self.behaviour[store_key(url)] = 0.02 * (len(URLS) - count)
+        carts = self.price_updater.get_shopping_cart(items=self.items)
+        self.assertEqual(list(carts), [store_key(url).title() for url in URLS])
+        self.assertEqual(carts["Game"][2].item_name, "oats at game")
+
+    def test_failing_store_is_isolated(self):
+        self.behaviour["makro"] = "fails"
+        found = []
+        carts = self.price_updater.get_shopping_cart(
+            on_result=lambda *result: found.append(result), items=self.items
+        )
+        self.assertNotIn("Makro", carts)
+        self.assertEqual(len(carts), len(URLS) - 1)
+        self.assertEqual(len(found), 3 * (len(URLS) - 1))
+
+    def test_unexpected_errors_are_isolated(self):
+        class BrokenFetcher:
+            def can_fetch(self, url):
+                return store_key(url) == "pnp"
+
+            def search_items(self, items, url, on_result=None):
+                raise ValueError("Unexpected page layout")
+
+            def close(self):
+                pass
+
+        self.price_updater.fetcher = BrokenFetcher()
+        carts = self.price_updater.get_shopping_cart(items=self.items)
+        self.assertNotIn("Pnp", carts)
+        self.assertEqual(len(carts), len(URLS) - 1)
+
+    def test_only_crawled_results_are_recorded(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        cache = PriceCache(f"{tmp.name}/prices.db")
+        cache.put("Makro", "eggs", ShoppingList("Cached Eggs", "2.00", "eggs"))
+        self.price_updater.cache = cache
+        self.price_updater.history = PriceHistory(f"{tmp.name}/history.db")
+        self.price_updater.get_shopping_cart(items=self.items)
+        records = self.price_updater.history.query()
+        self.assertEqual(len(records), 3 * len(URLS) - 1)
+        self.assertEqual(
+            [record.item for record in records if record.store == "makro"],
+            ["milk", "oats"],
+        )
+
+    def test_timed_out_stores_stop(self):
+        self.behaviour["takealot"] = "hangs"
+        self.price_updater.crawl_timeout = 0.5
+        found = []
+        carts = self.price_updater.get_shopping_cart(
+            on_result=lambda *result: found.append(result), items=self.items
+        )
+        self.assertNotIn("Takealot", carts)
+        self.assertEqual(len(carts), len(URLS) - 1)
+        reported = list(found)
+
+        # The store finishes its item in progress, reports nothing and stops.
+        self.release.set()
+        self.assertTrue(self.stopped["takealot"].wait(5))
+        self.assertEqual(found, reported)
+        self.assertNotIn(("takealot", "oats"), self.searched)
+
+
+class ProcessWorksheetsTest(unittest.TestCase):
+    def setUp(self):
+        self.sheets = [
+            FakeWorksheet.shopping_list(["Self Raising Flour", "eggs"], title="Home"),
+            FakeWorksheet.shopping_list(["milk", "self  raising flour"], title="Shop"),
+            FakeWorksheet([["Notes"]], title="Notes"),
+        ]
+        self.price_updater = PriceUpdater.from_worksheet(
+            self.sheets[0], http_first=False
+        )
+
+    def test_items_are_crawled_once(self):
+        searched = []
+
+        def get_shopping_cart(on_result=None, items=None):
+            searched.extend(items)
+            return shopping_carts(items)
+
+        self.price_updater.get_shopping_cart = get_shopping_cart
+        self.price_updater.process_worksheets(self.sheets)
+        self.assertEqual(searched, ["Self Raising Flour", "eggs", "milk"])
+        home, shop, notes = self.sheets
+        self.assertEqual(home.value(5, 3), "Self Raising Flour at Makro")
+        self.assertEqual(home.value(6, 7), "1.99")
+        self.assertEqual(shop.value(5, 3), "milk at Makro")
+        self.assertEqual(shop.value(6, 15), "Self Raising Flour at Takealot")
+        self.assertEqual(notes.calls["update_cells"], 0)
+        self.assertIs(self.price_updater.sheet, home)
+
+    def test_results_are_fanned_out_while_crawling(self):
+        with MockStoreServer() as server:
+            self.price_updater.fetcher = HttpFetcher(ids=server.ids(IDS))
+            self.price_updater._search_with_browser = (
+                lambda items, url, on_result=None: [None] * len(items)
+            )
+            self.price_updater.process_worksheets(self.sheets[:2])
+            self.price_updater.close()
+        searches = [path for path in server.requests if "/search?" in path]
+        # Makro, Game and PnP are scraped, each unique item once.
+        self.assertEqual(len(searches), 9)
+        self.assertEqual(len(set(searches)), 9)
+        self.assertEqual(self.sheets[0].value(5, 10), self.sheets[1].value(6, 10))
+        self.assertNotEqual(self.sheets[0].value(5, 10), "")
+
+
+class SheetSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.sheet = FakeWorksheet.shopping_list(["eggs", "milk"])
+        self.price_updater = PriceUpdater.from_worksheet(self.sheet, http_first=False)
+
+    def test_lookups_read_the_sheet_once(self):
+        self.assertEqual(self.price_updater.get_all_items(), ["eggs", "milk"])
+        self.assertEqual(
+            self.price_updater.get_all_stores(),
+            {
+                "Makro": (2, 3),
+                "Game": (2, 6),
+                "Pnp": (2, 9),
+                "Woolworths": (2, 12),
+                "Takealot": (2, 15),
+            },
+        )
+        self.assertEqual(self.price_updater.get_all_product_name_coord()[0], (5, 3))
+        self.assertEqual(self.price_updater.get_all_price_coord()[1], (5, 7))
+        self.assertEqual(self.price_updater.get_all_url_coord()[-1], (5, 17))
+        self.assertEqual(self.sheet.calls["get_all_values"], 1)
+        self.assertEqual(
+            sum(self.sheet.calls[call] for call in ("find", "findall", "col_values")), 0
+        )
+
+    def test_invalidated_after_writes(self):
+        self.price_updater.get_shopping_cart = lambda on_result=None: shopping_carts(
+            ["eggs", "milk"], stores=["Makro"]
+        )
+        self.price_updater.process_item_list()
+        self.assertEqual(self.price_updater.snapshot.cell_value(5, 3), "eggs at Makro")
+        self.assertEqual(self.sheet.calls["get_all_values"], 2)
+
+    def test_snapshot(self):
+        snapshot = SheetSnapshot(self.sheet)
+        self.assertIsNone(snapshot.find("bread"))
+        self.assertEqual(snapshot.find("Price").col, 4)
+        self.assertEqual(snapshot.row_values(5), ["", "eggs"])
+        self.assertEqual(snapshot.col_values(2), ["", "", "Item", "", "eggs", "milk"])
+        self.assertEqual(snapshot.cell_value(100, 100), "")
+
+
+class PriceElement:
+    text = "R 4999"
+
+
+class ProductPageDriver:
+    """A browser session on product pages that all show the same price."""
+
+    title = "Product | Store"
+
+    def __init__(self):
+        self.current_url = "about:blank"
+        self.loaded = []
+
+    def get(self, url):
+        self.loaded.append(url)
+        self.current_url = url
+
+    def execute_script(self, script):
+        return "complete"
+
+    def find_element_by_class_name(self, name):
+        return PriceElement()
+
+    def quit(self):
+        pass
+
+
+class UpdateSpreadsheetPriceTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server = MockStoreServer().__enter__()
+        self.sheet = FakeWorksheet.shopping_list(["oats", "more oats", "flour"])
+        self.history = PriceHistory(f"{self.tmp.name}/history.db")
+        self.price_updater = PriceUpdater.from_worksheet(
+            self.sheet, history=self.history
+        )
+        self.price_updater.fetcher = HttpFetcher(ids=self.server.ids(IDS))
+        # Makro: unchanged, changed and never found; PnP: changed.
+        self.sheet.cells.update(
+            {
+                (5, 3): "Jungle Oats 1Kg",
+                (6, 3): "Jungle Oats 1Kg",
+                (5, 9): "Snowflake Flour",
+                (5, 4): "R49.99",
+                (5, 5): f"{self.server.url}/makro/p/oats",
+                (6, 4): "55.00",
+                (6, 5): f"{self.server.url}/makro/p/more-oats",
+                (5, 10): "32.99",
+                (5, 11): f"{self.server.url}/pnp/p/flour",
+            }
+        )
+
+    def tearDown(self):
+        self.price_updater.close()
+        self.server.__exit__(None, None, None)
+        self.tmp.cleanup()
+
+    def test_only_changed_prices_are_written(self):
+        self.price_updater.update_spreadsheet_price()
+        self.assertEqual(self.sheet.value(5, 4), "R49.99")
+        self.assertEqual(self.sheet.value(6, 4), "49.99")
+        self.assertEqual(self.sheet.value(5, 10), "29.99")
+        self.assertEqual(self.sheet.value(7, 4), "")
+        self.assertEqual(self.sheet.calls["update_cells"], 1)
+        self.assertEqual(
+            sorted(self.server.requests),
+            ["/makro/p/more-oats", "/makro/p/oats", "/pnp/p/flour"],
+        )
+
+    def test_browser_only_opens_the_product_pages(self):
+        driver = ProductPageDriver()
+        self.price_updater.fetcher = None
+        self.price_updater.pool = WebDriverPool(size=1, factory=lambda: driver)
+        self.price_updater.update_spreadsheet_price()
+        # No store homepage is loaded before the product pages.
+        self.assertEqual(
+            driver.loaded,
+            [
+                f"{self.server.url}/makro/p/oats",
+                f"{self.server.url}/makro/p/more-oats",
+                f"{self.server.url}/pnp/p/flour",
+            ],
+        )
+        self.assertEqual(self.sheet.value(6, 4), "49.99")
+
+    def test_refreshed_prices_are_recorded(self):
+        self.price_updater.update_spreadsheet_price()
+        self.assertEqual(
+            sorted(
+                (record.store, record.item, record.price_cents)
+                for record in self.history.query()
+            ),
+            [
+                ("makro", "more oats", 4999),
+                ("makro", "oats", 4999),
+                ("pnp", "oats", 2999),
+            ],
+        )
+
+
+class SheetWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.sheet = FakeWorksheet()
+        self.sleeps = []
+        self.writer = SheetWriter(self.sheet, chunk_size=2, sleep=self.sleeps.append)
+        self.cells = [gspread.Cell(row, 1, str(row)) for row in range(3, 0, -1)]
+
+    def test_chunks(self):
+        self.assertEqual(self.writer.write(self.cells), 2)
+        self.assertEqual(
+            [self.sheet.value(row, 1) for row in (1, 2, 3)], ["1", "2", "3"]
+        )
+
+    def test_backs_off_on_quota_errors(self):
+        self.sheet.errors = [quota_error(), quota_error()]
+        self.assertEqual(self.writer.write(self.cells), 4)
+        self.assertEqual(self.sleeps, [2.0, 4.0])
+        self.assertEqual(self.sheet.value(3, 1), "3")
+
+    def test_gives_up(self):
+        self.sheet.errors = [quota_error()] * 5
+        with self.assertRaises(APIError):
+            self.writer.write(self.cells)
+        self.assertEqual(len(self.sleeps), 4)
+
+    def test_does_not_retry_bad_requests(self):
+        self.sheet.errors = [APIError(FakeResponse(400, "Bad request"))]
+        with self.assertRaises(APIError):
+            self.writer.write(self.cells)
+        self.assertEqual(self.sleeps, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
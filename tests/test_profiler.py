@@ -0,0 +1,100 @@
+import json
+import os
+import tempfile
+import unittest
+
+from shopping_list_bot import IDS, HttpFetcher, PriceUpdater, RunProfiler
+
+from fake_sheet import FakeWorksheet
+from mock_store import MockStoreServer
+
+
+def skip_browser(items, url, on_result=None):
+    return [None] * len(items)
+
+
+class RunProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.profiler = RunProfiler()
+        for seconds in range(1, 21):
+            self.profiler.record("page_load", seconds / 10, store="makro", item="oats")
+        self.profiler.record("page_load", 5.0, store="pnp", failed=True)
+
+    def test_summary_per_phase_and_store(self):
+        makro, pnp = self.profiler.summary()
+        self.assertEqual((makro["phase"], makro["store"]), ("page_load", "makro"))
+        self.assertEqual(makro["count"], 20)
+        self.assertAlmostEqual(makro["p50"], 1.0)
+        self.assertAlmostEqual(makro["p95"], 1.9)
+        self.assertAlmostEqual(makro["max"], 2.0)
+        self.assertAlmostEqual(makro["total"], 21.0)
+        self.assertEqual((pnp["count"], pnp["failed"]), (1, 1))
+
+    def test_phase_records_failures(self):
+        with self.assertRaises(ValueError):
+            with self.profiler.phase("parse_price", "game", "beer"):
+                raise ValueError("R--")
+        sample = self.profiler.samples()[-1]
+        self.assertEqual(sample.phase, "parse_price")
+        self.assertEqual(sample.item, "beer")
+        self.assertTrue(sample.failed)
+
+    def test_disabled(self):
+        profiler = RunProfiler(enabled=False)
+        with profiler.phase("page_load", "makro"):
+            pass
+        profiler.record("sheet_write", 1.0)
+        self.assertEqual(profiler.samples(), [])
+        self.assertEqual(profiler.summary(), [])
+
+    def test_exports(self):
+        report = json.loads(self.profiler.to_json())
+        self.assertEqual(len(report["samples"]), 21)
+        self.assertEqual(report["phases"][0]["count"], 20)
+
+        metrics = self.profiler.to_prometheus()
+        self.assertIn("# TYPE shopping_list_bot_phase_seconds summary", metrics)
+        self.assertIn(
+            'shopping_list_bot_phase_seconds_count{phase="page_load",store="makro"} 20',
+            metrics,
+        )
+        self.assertIn(
+            'shopping_list_bot_phase_failures_total{phase="page_load",store="pnp"} 1',
+            metrics,
+        )
+        self.assertIn("p95", self.profiler.format_report())
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "profile.prom")
+            self.profiler.save(path)
+            with open(path) as profile:
+                self.assertEqual(profile.read(), metrics)
+
+
+class ProfiledRunTest(unittest.TestCase):
+    def test_phases_are_recorded(self):
+        profiler = RunProfiler()
+        sheet = FakeWorksheet.shopping_list(["oats", "pampers pants"])
+        with MockStoreServer() as server:
+            price_updater = PriceUpdater.from_worksheet(sheet, profiler=profiler)
+            price_updater.fetcher = HttpFetcher(ids=server.ids(IDS), profiler=profiler)
+            price_updater._search_with_browser = skip_browser
+            price_updater.process_item_list()
+            price_updater.close()
+
+        phases = {(row["phase"], row["store"]) for row in profiler.summary()}
+        for phase in ("http_search", "parse_results", "store"):
+            self.assertIn((phase, "makro"), phases)
+        # Game's results page shows no prices, its product pages are read.
+        self.assertIn(("http_product", "game"), phases)
+        self.assertIn(("parse_price", "game"), phases)
+        self.assertIn(("sheet_read", ""), phases)
+        self.assertIn(("sheet_write", ""), phases)
+        self.assertEqual(
+            {sample.item for sample in profiler.samples() if sample.store == "makro"},
+            {"", "oats", "pampers pants"},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
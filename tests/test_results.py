@@ -0,0 +1,104 @@
+import unittest
+
+from shopping_list_bot import IDS, HttpFetcher, ResultsExtractor, match_score
+
+from mock_store import FIXTURES, MockStoreServer
+
+MAKRO = "https://www.makro.co.za/"
+
+
+class ResultsExtractorTest(unittest.TestCase):
+    def setUp(self):
+        self.extractor = ResultsExtractor()
+        self.page = (FIXTURES / "makro" / "search.html").read_text()
+
+    def test_extract_every_tile(self):
+        tiles = self.extractor.extract(self.page, "makro", "https://www.makro.co.za/s")
+        self.assertEqual(
+            [(tile.item_name, tile.item_price) for tile in tiles],
+            [("Jungle Oats 1Kg", "49.99"), ("Jungle Oats 500G", "29.99")],
+        )
+        self.assertEqual(
+            tiles[1].item_url, "https://www.makro.co.za/makro/p/jungle-oats-500g"
+        )
+
+    def test_best_match(self):
+        best = self.extractor.best_match("jungle oats 500g", self.page, "makro")
+        self.assertEqual(best.item_name, "Jungle Oats 500G")
+        # Equally good matches keep the page order.
+        self.assertEqual(
+            self.extractor.best_match("oats", self.page, "makro").item_name,
+            "Jungle Oats 1Kg",
+        )
+
+    def test_cheapest_candidate(self):
+        candidates = self.extractor.rank(
+            "oats", self.extractor.extract(self.page, "makro")
+        )
+        self.assertEqual(self.extractor.cheapest(candidates).item_price, "29.99")
+        self.assertIsNone(self.extractor.cheapest([]))
+
+    def test_tiles_without_prices(self):
+        page = (FIXTURES / "game" / "search.html").read_text()
+        (tile,) = self.extractor.extract(page, "game")
+        self.assertEqual(tile.item_name, "Pampers Pants Size 4 44S")
+        self.assertIsNone(tile.item_price)
+        self.assertEqual(tile.item_url, "/game/p/pampers-pants-size-4-44")
+
+    def test_unrelated_tiles_do_not_match(self):
+        page = (FIXTURES / "makro" / "search-quinoa-flakes.html").read_text()
+        self.assertEqual(len(self.extractor.extract(page, "makro")), 2)
+        self.assertIsNone(self.extractor.best_match("quinoa flakes", page, "makro"))
+        self.assertEqual(
+            self.extractor.rank("jungle oats", self.extractor.extract(page, "makro")),
+            [],
+        )
+
+    def test_stores_without_tiles(self):
+        ids = {"makro": dict(IDS["makro"], result_tile_css=None)}
+        self.assertEqual(ResultsExtractor(ids).extract(self.page, "makro"), [])
+
+    def test_match_score(self):
+        self.assertEqual(match_score("jungle oats", "Jungle Oats 1kg")[0], 1.0)
+        self.assertGreater(
+            match_score("oats 1kg", "Jungle Oats 1kg"),
+            match_score("oats 1kg", "Jungle Oats 500g"),
+        )
+        self.assertEqual(match_score("oats 1kg", "Jungle Oats 1000 g")[0], 1.0)
+        self.assertEqual(match_score("oats", None), (0.0, 0.0))
+
+
+class ResultsPageFetchTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockStoreServer().__enter__()
+        self.fetcher = HttpFetcher(ids=self.server.ids(IDS))
+
+    def tearDown(self):
+        self.fetcher.close()
+        self.server.__exit__(None, None, None)
+
+    def test_priced_tiles_skip_the_product_page(self):
+        product = self.fetcher.search_item("jungle oats 500g", MAKRO)
+        self.assertEqual(product.item_price, "29.99")
+        self.assertEqual(
+            product.item_url, f"{self.server.url}/makro/p/jungle-oats-500g"
+        )
+        self.assertEqual(self.server.requests, ["/makro/search?q=jungle+oats+500g"])
+
+    def test_unrelated_tiles_are_not_found(self):
+        product = self.fetcher.search_item("quinoa flakes", MAKRO)
+        self.assertEqual(
+            (product.item_name, product.item_price, product.item_url),
+            (None, None, None),
+        )
+        # Neither the promotions' product pages nor a browser are needed.
+        self.assertEqual(self.server.requests, ["/makro/search?q=quinoa+flakes"])
+
+    def test_search_candidates(self):
+        candidates = self.fetcher.search_candidates("jungle oats", MAKRO, top_n=1)
+        self.assertEqual([c.item_name for c in candidates], ["Jungle Oats 1Kg"])
+        self.assertEqual(len(self.server.requests), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import copy
+import unittest
+from urllib.parse import quote_plus
+
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.keys import Keys
+
+from shopping_list_bot import IDS, URLS, ShoppingBot, WebDriverPool, store_key
+
+from mock_store import FIXTURES
+
+ITEM = "jungle oats 1kg & milk"
+
+
+class SearchInput:
+    def __init__(self, driver):
+        self.driver = driver
+        self.typed = ""
+
+    def send_keys(self, keys):
+        if keys == Keys.RETURN:
+            self.driver.submitted.append(self.typed)
+            self.driver.current_url += f"search?q={quote_plus(self.typed)}"
+        else:
+            self.typed += keys
+
+    def is_enabled(self):
+        return True
+
+
+class SearchDriver:
+    """A browser session on a store showing no products, recording the pages
+    loaded and the search bar typed into."""
+
+    title = "Search Results"
+    page_source = "<html><body></body></html>"
+    ready_state = "complete"
+
+    def __init__(self, search_input_id):
+        self.current_url = "about:blank"
+        self.loaded = []
+        self.submitted = []
+        self.search_input_id = search_input_id
+        self.search_input = None
+
+    def get(self, url):
+        self.loaded.append(url)
+        self.current_url = url
+
+    def execute_script(self, script):
+        return self.ready_state
+
+    def find_element(self, by, value):
+        if value == self.search_input_id:
+            self.search_input = SearchInput(self)
+            return self.search_input
+        raise NoSuchElementException(value)
+
+    def find_element_by_class_name(self, name):
+        raise NoSuchElementException(name)
+
+    def quit(self):
+        pass
+
+
+class SearchTest(unittest.TestCase):
+    def search(self, url, items=(ITEM,), ready_state="complete", page_source=None):
+        ids = copy.deepcopy(IDS)
+        store = store_key(url)
+        ids[store]["timeouts"] = {
+            name: 0.1
+            for name in ("page_ready", "first_result", "price", "search_submit")
+        }
+        driver = SearchDriver(ids[store].get("search_input_id"))
+        driver.ready_state = ready_state
+        if page_source is not None:
+            driver.page_source = page_source
+        with WebDriverPool(size=1, factory=lambda: driver) as pool:
+            bot = ShoppingBot(list(items), url, ids=ids, pool=pool)
+            bot.search_items()
+        self.results = bot.results
+        return driver
+
+    def test_results_page_is_loaded_directly(self):
+        cases = {
+            "makro": "https://www.makro.co.za/search/?text=jungle+oats+1kg+%26+milk",
+            "pnp": "https://www.pnp.co.za/pnpstorefront/pnp/en/search/"
+            "?text=jungle+oats+1kg+%26+milk",
+            "woolworths": "https://www.woolworths.co.za/cat"
+            "?Ntt=jungle+oats+1kg+%26+milk&Dy=1",
+            "takealot": "https://www.takealot.com/all?qsearch=jungle+oats+1kg+%26+milk",
+        }
+        for url in URLS:
+            store = store_key(url)
+            if store not in cases:
+                continue
+            with self.subTest(store=store):
+                driver = self.search(url)
+                # The store page opened with the session, then the results.
+                self.assertEqual(driver.loaded[:2], [url, cases[store]])
+                self.assertIsNone(driver.search_input)
+
+    def test_stores_without_a_search_url_use_the_form(self):
+        self.assertNotIn("search_url", IDS["game"])
+        driver = self.search("https://www.game.co.za/")
+        self.assertEqual(
+            driver.loaded[:2], ["https://www.game.co.za/", "https://www.game.co.za/"]
+        )
+        self.assertEqual(driver.search_input.typed, ITEM)
+        self.assertEqual(
+            driver.current_url,
+            "https://www.game.co.za/search?q=jungle+oats+1kg+%26+milk",
+        )
+
+    def test_search_form_on_a_page_still_loading(self):
+        # The homepage never reaches readyState complete, the search bar is there.
+        driver = self.search(
+            "https://www.game.co.za/", ["oats", "milk"], ready_state="loading"
+        )
+        self.assertEqual(driver.submitted, ["oats", "milk"])
+        self.assertEqual(len(self.results), 2)
+
+    def test_unrelated_results_are_not_opened(self):
+        page = (FIXTURES / "makro" / "search-quinoa-flakes.html").read_text()
+        driver = self.search(
+            "https://www.makro.co.za/", ["quinoa flakes"], page_source=page
+        )
+        (result,) = self.results
+        self.assertEqual(
+            (result.item_name, result.item_price, result.item_url), (None, None, None)
+        )
+        self.assertEqual(
+            driver.loaded,
+            [
+                "https://www.makro.co.za/",
+                "https://www.makro.co.za/search/?text=quinoa+flakes",
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import tracemalloc
+import unittest
+
+from shopping_list_bot import ShoppingList
+
+
+class ShoppingListTest(unittest.TestCase):
+    def test_prices_are_kept_in_cents(self):
+        for price, cents, text in [
+            ("49.99", 4999, "49.99"),
+            (199.0, 19900, "199.00"),
+            (" 104", 10400, "104.00"),
+            ("1,299.5", 129950, "1299.50"),
+            (None, None, None),
+        ]:
+            with self.subTest(price=price):
+                product = ShoppingList("Oats", price, "https://makro/oats")
+                self.assertEqual(product.price_cents, cents)
+                self.assertEqual(product.item_price, text)
+
+        product.item_price = "R5.05"
+        self.assertEqual(product.price_cents, 505)
+
+    def test_slots(self):
+        product = ShoppingList("Oats", "49.99", "https://makro/oats")
+        self.assertFalse(hasattr(product, "__dict__"))
+        with self.assertRaises(AttributeError):
+            product.html = "<html></html>"
+
+    def test_thousands_of_results_stay_small(self):
+        name, url = "Jungle Oats 1kg", "https://www.makro.co.za/p/oats"
+        tracemalloc.start()
+        try:
+            carts = [ShoppingList(name, "49.99", url) for _ in range(10000)]
+            size, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(len(carts), 10000)
+        self.assertLess(size / len(carts), 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
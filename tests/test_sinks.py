@@ -0,0 +1,165 @@
+import csv
+import importlib.util
+import sqlite3
+import tempfile
+import unittest
+
+from shopping_list_bot import (
+    IDS,
+    CsvSink,
+    HttpFetcher,
+    ParquetSink,
+    PriceUpdater,
+    ResultPipeline,
+    ShoppingList,
+    SqliteSink,
+    sink_for_path,
+)
+
+from fake_sheet import FakeWorksheet
+from mock_store import MockStoreServer
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+ITEMS = ["eggs", "milk", "oats"]
+
+
+def product(count):
+    return ShoppingList(f"item {count}", f"{count}.99", f"https://makro/{count}")
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as csv_file:
+        return list(csv.DictReader(csv_file))
+
+
+def skip_browser(items, url, on_result=None):
+    return [None] * len(items)
+
+
+class SinkTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.results = [("Makro", count, product(count)) for count in range(3)]
+
+    def test_csv(self):
+        sink = CsvSink(f"{self.tmp.name}/out/results.csv")
+        sink.open(ITEMS)
+        self.assertEqual(sink.write(self.results[:2]), 1)
+        # Flushed, so readable before the sink is closed.
+        self.assertEqual(len(read_csv(sink.path)), 2)
+        sink.write(self.results[2:])
+        sink.close()
+
+        rows = read_csv(sink.path)
+        self.assertEqual(
+            [(row["item"], row["item_name"], row["price_cents"]) for row in rows],
+            [
+                ("eggs", "item 0", "99"),
+                ("milk", "item 1", "199"),
+                ("oats", "item 2", "299"),
+            ],
+        )
+        self.assertEqual(sink.results, 3)
+
+    def test_sqlite_appends(self):
+        path = f"{self.tmp.name}/results.sqlite"
+        for _ in range(2):
+            sink = SqliteSink(path)
+            sink.open(ITEMS)
+            sink.write(self.results)
+            sink.close()
+
+        db = sqlite3.connect(path)
+        self.addCleanup(db.close)
+        rows = db.execute(
+            "SELECT store, item, price_cents FROM results ORDER BY position"
+        ).fetchall()
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0], ("Makro", "eggs", 99))
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_parquet_row_groups(self):
+        import pyarrow.parquet
+
+        sink = ParquetSink(f"{self.tmp.name}/results.parquet")
+        sink.open(ITEMS)
+        sink.write(self.results[:2])
+        sink.write(self.results[2:])
+        sink.close()
+
+        parquet_file = pyarrow.parquet.ParquetFile(str(sink.path))
+        self.assertEqual(parquet_file.num_row_groups, 2)
+        table = parquet_file.read()
+        self.assertEqual(table.column("price_cents").to_pylist(), [99, 199, 299])
+
+    @unittest.skipIf(HAS_PYARROW, "pyarrow is installed")
+    def test_parquet_needs_pyarrow(self):
+        with self.assertRaisesRegex(ImportError, "pip install pyarrow"):
+            ParquetSink(f"{self.tmp.name}/results.parquet")
+
+    def test_sink_for_path(self):
+        self.assertIsInstance(sink_for_path("results.CSV"), CsvSink)
+        self.assertIsInstance(sink_for_path("results.db"), SqliteSink)
+        with self.assertRaises(ValueError):
+            sink_for_path("results.xlsx")
+
+    def test_pipeline_batches(self):
+        sink = CsvSink(f"{self.tmp.name}/results.csv")
+        with ResultPipeline(sink, ITEMS, batch_size=2, flush_interval=60) as pipeline:
+            for shop_name, count, result in self.results:
+                pipeline.put(shop_name, count, result)
+                # Written again, or not at all.
+                pipeline.put(shop_name, count, result)
+                pipeline.put("Game", count, None)
+        self.assertEqual((pipeline.results, pipeline.calls), (3, 2))
+        self.assertEqual(len(read_csv(sink.path)), 3)
+
+
+class ExportTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server = MockStoreServer().__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        self.tmp.cleanup()
+
+    def price_updater(self, price_updater):
+        price_updater.fetcher = HttpFetcher(ids=self.server.ids(IDS))
+        price_updater._search_with_browser = skip_browser
+        self.addCleanup(price_updater.close)
+        return price_updater
+
+    def test_export_without_a_spreadsheet(self):
+        price_updater = self.price_updater(PriceUpdater.offline())
+        sinks = [
+            CsvSink(f"{self.tmp.name}/results.csv"),
+            SqliteSink(f"{self.tmp.name}/results.db"),
+        ]
+        price_updater.export_results(["jungle oats 1kg", "nothing here"], sinks)
+
+        rows = read_csv(sinks[0].path)
+        makro = [row for row in rows if row["store"] == "Makro"]
+        self.assertEqual(
+            [(row["item"], row["price_cents"]) for row in makro],
+            [("jungle oats 1kg", "4999")],
+        )
+        self.assertEqual(sinks[1].results, len(rows))
+
+    def test_spreadsheet_and_export(self):
+        sheet = FakeWorksheet.shopping_list(["jungle oats 1kg"])
+        price_updater = self.price_updater(PriceUpdater.from_worksheet(sheet))
+        sink = CsvSink(f"{self.tmp.name}/results.csv")
+        price_updater.process_item_list(sinks=[sink])
+
+        self.assertEqual(sheet.value(5, 4), "49.99")
+        rows = read_csv(sink.path)
+        self.assertIn(
+            ("Makro", "jungle oats 1kg", "4999"),
+            [(row["store"], row["item"], row["price_cents"]) for row in rows],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
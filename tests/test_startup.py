@@ -0,0 +1,41 @@
+import importlib
+import importlib.util
+import pathlib
+import unittest
+
+import shopping_list_bot
+
+BENCHMARK = pathlib.Path(__file__).parents[1] / "benchmarks" / "bench_startup.py"
+
+spec = importlib.util.spec_from_file_location("bench_startup", str(BENCHMARK))
+bench_startup = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(bench_startup)
+
+
+class LazyImportTest(unittest.TestCase):
+    def test_startup_skips_heavy_dependencies(self):
+        for name, command in bench_startup.COMMANDS.items():
+            with self.subTest(command=name):
+                modules = bench_startup.imported_modules(command)
+                self.assertIn("shopping_list_bot", modules)
+                self.assertEqual(modules & set(bench_startup.HEAVY_MODULES), set())
+
+    def test_every_public_name_is_exported(self):
+        for module, names in shopping_list_bot._SUBMODULES.items():
+            with self.subTest(module=module):
+                submodule = importlib.import_module(f"shopping_list_bot.{module}")
+                self.assertLessEqual(
+                    set(submodule.__all__), set(shopping_list_bot.__all__)
+                )
+                for name in names:
+                    self.assertIs(
+                        getattr(shopping_list_bot, name), getattr(submodule, name)
+                    )
+
+    def test_unknown_name(self):
+        with self.assertRaises(AttributeError):
+            shopping_list_bot.NoSuchThing
+
+
+if __name__ == "__main__":
+    unittest.main()
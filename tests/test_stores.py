@@ -0,0 +1,65 @@
+import unittest
+
+from shopping_list_bot import (
+    IDS,
+    StoreAdapter,
+    UnknownStore,
+    clean_price,
+    get_adapter,
+    register_store,
+    store_key,
+)
+from shopping_list_bot.stores import ADAPTERS
+
+
+class StoreAdaptersTest(unittest.TestCase):
+    def test_every_store_has_an_adapter(self):
+        for store in IDS:
+            self.assertEqual(get_adapter(store).key, store)
+
+    def test_parse_price(self):
+        # Price texts as read off the saved store pages.
+        cases = [
+            ("makro", "R 4999\nIncl. VAT", "49.99"),
+            ("makro", "4999", "49.99"),
+            ("game", "R 19900", 199.0),
+            ("pnp", "R2999", "29.99"),
+            ("woolworths", "R 34.99 ", "34.99"),
+            ("takealot", "R 104", " 104"),
+        ]
+        for store, text, price in cases:
+            with self.subTest(store=store, text=text):
+                self.assertEqual(get_adapter(store).parse_price(text), price)
+                self.assertEqual(clean_price(store, text), price)
+
+    def test_unparsable_prices(self):
+        for store in ("makro", "game", "pnp"):
+            with self.subTest(store=store), self.assertRaises(ValueError):
+                get_adapter(store).parse_price("Out of stock")
+
+    def test_unknown_store(self):
+        # Stores without an adapter used to be parsed as game prices.
+        with self.assertRaises(UnknownStore):
+            clean_price("checkers", "R 19900")
+
+    def test_register_store(self):
+        @register_store
+        class Checkers(StoreAdapter):
+            key = "checkers"
+
+            def parse_price(self, price):
+                return price.strip().lstrip("R")
+
+        try:
+            self.assertEqual(clean_price("checkers", "R21.99"), "21.99")
+        finally:
+            del ADAPTERS["checkers"]
+
+    def test_store_key(self):
+        self.assertEqual(store_key("https://www.makro.co.za/"), "makro")
+        self.assertEqual(store_key("http://www.pnp.localhost:8000/"), "pnp")
+        self.assertEqual(store_key(""), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
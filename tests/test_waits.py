@@ -0,0 +1,49 @@
+import unittest
+
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
+
+from shopping_list_bot.waits import WaitTimings, url_changed_or_stale, wait_until
+
+
+class FakeElement:
+    def __init__(self):
+        self.stale = False
+
+    def is_enabled(self):
+        if self.stale:
+            raise StaleElementReferenceException("gone")
+        return True
+
+
+class FakeDriver:
+    current_url = "https://www.makro.co.za/"
+
+
+class WaitsTest(unittest.TestCase):
+    def test_url_changed_or_stale(self):
+        driver, element = FakeDriver(), FakeElement()
+        condition = url_changed_or_stale(driver.current_url, element)
+        self.assertFalse(condition(driver))
+        element.stale = True
+        self.assertTrue(condition(driver))
+        driver.current_url = "https://www.makro.co.za/search/?text=beer"
+        self.assertTrue(url_changed_or_stale("https://www.makro.co.za/")(driver))
+
+    def test_wait_until_records_timings(self):
+        timings = WaitTimings()
+        self.assertEqual(
+            wait_until(FakeDriver(), lambda driver: "ready", 1, "page_ready", timings),
+            "ready",
+        )
+        with self.assertRaises(TimeoutException):
+            wait_until(FakeDriver(), lambda driver: False, 0.2, "price", timings)
+
+        report = {row["wait"]: row for row in timings.report()}
+        self.assertEqual(report["page_ready"]["timeouts"], 0)
+        self.assertEqual(report["price"]["timeouts"], 1)
+        self.assertGreaterEqual(report["price"]["max"], 0.2)
+        self.assertIn("page_ready", timings.format_report())
+
+
+if __name__ == "__main__":
+    unittest.main()